@@ -1,12 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from .config.config import settings
 from app.api.router import api_router
+from app.services.iaclient import get_chatgpt_client, close_chatgpt_client
+from app.services.code_runner import get_code_runner, close_code_runner
+from app.config.log import logger
+from app.db import init_db
+from app.db.base import SessionLocal, dispose_async_engine
+from app.repositories.statements import get_statement_registry
+
+def _init_db():
+    db = SessionLocal()
+    try:
+        init_db(db)
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_STARTUP_CHECK:
+        try:
+            await run_in_threadpool(_init_db)
+        except Exception as e:
+            # La API puede arrancar aunque la base de datos aún no responda
+            logger.warning("No se pudo verificar la base de datos al iniciar: %s", e)
+    # Un solo cliente de OpenAI por proceso, con su pool de conexiones
+    app.state.chatgpt_client = get_chatgpt_client()
+    # Procesos de ejecución listos antes de la primera petición
+    await get_code_runner().start()
+    yield
+    report = get_statement_registry().report()
+    if report:
+        logger.info("Procedimientos más costosos:\n%s", report)
+    await close_chatgpt_client()
+    await close_code_runner()
+    await dispose_async_engine()
 
 app = FastAPI(
     title="EtlAs",
     description="API automatizar procesos ETL con IA",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 def create_app():
@@ -1,11 +1,37 @@
-from app.db.base import SessionLocal
+from fastapi import HTTPException, status
+
+from app.db.base import SessionLocal, AsyncSessionLocal
+from app.db.unit_of_work import unit_of_work, async_unit_of_work
+from app.utils.pagination import decode_cursor, validate_limit, validate_total_mode
 
 def get_db():
     """
     Dependency that provides a database session for each request.
+    The request is one unit of work: writes are committed once when it ends,
+    read-only requests are never committed and errors roll everything back.
+    Declare it with Depends(get_db, scope="function") so the commit runs when the
+    path operation returns, before the response is sent: a failed commit is then
+    an error response instead of a success for data that was never saved.
     """
-    db = SessionLocal()
-    try:
+    with unit_of_work(SessionLocal) as db:
+        yield db
+
+async def get_async_db():
+    """
+    Async counterpart of get_db for async routes: an AsyncSession over asyncpg,
+    so queries never block the event loop. Same unit of work semantics.
+    """
+    async with async_unit_of_work(AsyncSessionLocal) as db:
         yield db
-    finally:
-        db.close()
+
+def validate_keyset_params(cursor: str, total_mode: str, limit=100) -> int:
+    """
+    Validates cursor pagination parameters before querying, so bad input is a 400.
+    Returns the validated page size.
+    """
+    try:
+        decode_cursor(cursor)
+        validate_total_mode(total_mode)
+        return validate_limit(limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
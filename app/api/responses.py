@@ -0,0 +1,39 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse, Response
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # pydantic-core serializa en Rust igual de rápido si orjson no está instalado
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa a JSON con orjson, o con pydantic-core si no está disponible."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON por defecto de la API: serializa con orjson / pydantic-core
+    en lugar de json.dumps, que es lo más costoso al devolver páginas grandes.
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """
+    Respuesta con un JSON ya serializado (por ejemplo, el texto que devuelve un
+    procedimiento almacenado), que se envía tal cual sin decodificarlo ni
+    validarlo contra el response_model.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return content.encode("utf-8")
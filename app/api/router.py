@@ -1,8 +1,10 @@
 from fastapi import APIRouter
-from app.api.routes import users, schemes, chats, messages
+from app.api.responses import FastJSONResponse
+from app.api.routes import users, schemes, chats, messages, attachments
 
-api_router = APIRouter()
+api_router = APIRouter(default_response_class=FastJSONResponse)
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(schemes.router, prefix="/schemes", tags=["schemes"])
 api_router.include_router(chats.router, prefix="/chats", tags=["chats"])
-api_router.include_router(messages.router, prefix="/messages", tags=["messages"])
\ No newline at end of file
+api_router.include_router(messages.router, prefix="/messages", tags=["messages"])
+api_router.include_router(attachments.router, prefix="/attachments", tags=["attachments"])
\ No newline at end of file
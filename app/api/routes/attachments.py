@@ -0,0 +1,42 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.dependencies import get_async_db
+from app.config.config import settings
+from app.models.schemas.attachment import AttachmentBase
+from app.services.dataset_profiler import DatasetProfileService
+from app.services.upload_service import UploadService, UploadError, UploadTooLargeError, attachment_digest
+
+router = APIRouter()
+upload_service = UploadService()
+dataset_profile_service = DatasetProfileService()
+
+@router.post("/", response_model=AttachmentBase)
+async def upload_attachment(request: Request, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db, scope="function")):
+    # Se rechaza antes de leer el cuerpo si ya se sabe que no cabe
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_UPLOAD_SIZE + 64 * 1024:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+
+    try:
+        attachment = await upload_service.upload_attachment(
+            db,
+            stream=request.stream(),
+            content_type=request.headers.get("content-type", ""),
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # El perfil del dataset se calcula tras responder, para tenerlo listo en el próximo mensaje
+    background_tasks.add_task(dataset_profile_service.profile, attachment_digest(attachment.url), attachment.filename)
+    return attachment
+
+@router.get("/files/{digest}")
+def download_attachment(digest: str, filename: str = None):
+    path = upload_service.find(digest)
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return FileResponse(path, filename=filename, media_type="application/octet-stream")
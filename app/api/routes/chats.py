@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
-from typing import List, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 
-from app.api.dependencies import get_db
+from app.api.dependencies import get_db, get_async_db, validate_keyset_params
+from app.api.responses import RawJSONResponse
+from app.config.config import settings
 from app.models.schemas.chat import MultiChat, ChatBase, ChatCreate, ChatUpdate
 from app.services.chat_service import ChatService
 
@@ -10,31 +13,48 @@ router = APIRouter()
 chat_service = ChatService()
 
 @router.get("/", response_model=MultiChat)
-def read_chats(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
+def read_chats(db: Session = Depends(get_db, scope="function"), skip: int = 0, limit: int = 100, cursor: Optional[str] = None, total: str = "none"):
+    # Con 'cursor' (vacío para la primera página) se pagina por cursor en lugar de por offset
+    if cursor is not None:
+        limit = validate_keyset_params(cursor, total, limit)
+        return chat_service.get_multi_keyset(db, limit=limit, cursor=cursor, total_mode=total)
+
+    # El JSON del procedimiento se envía tal cual, sin pasar por Python
+    if settings.JSON_PASSTHROUGH:
+        raw = chat_service.get_multi_raw(db, limit=limit, skip=skip)
+        if raw is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chats not found")
+        return RawJSONResponse(raw)
+
     chats = chat_service.get_multi(db, limit=limit, skip=skip)
     return chats
 
 @router.post("/by", response_model=Union[ChatBase, MultiChat])
-async def read_chat(request: Request, db: Session = Depends(get_db)):
+async def read_chat(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     
     chat_id = data.get("id")
     if chat_id:
-        chat = chat_service.get(db, id=chat_id)
+        chat = await chat_service.get_async(db, id=chat_id)
         if not chat:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
         return chat
     
     user_id = data.get("user_id")
+    if user_id and "cursor" in data:
+        cursor, total = data.get("cursor"), data.get("total", "none")
+        limit = validate_keyset_params(cursor, total, data.get("limit", 100))
+        return await chat_service.get_by_user_id_keyset_async(db, user_id=user_id, limit=limit, cursor=cursor, total_mode=total)
+
     if user_id:
-        chats = chat_service.get_by_user_id(db, user_id=user_id)
+        chats = await chat_service.get_by_user_id_async(db, user_id=user_id)
         if not chats:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chats not found")
         return chats
     
     scheme_id = data.get("scheme_id")
     if scheme_id:
-        chats = chat_service.get_by_scheme_id(db, scheme_id=scheme_id)
+        chats = await chat_service.get_by_scheme_id_async(db, scheme_id=scheme_id)
         if not chats:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chats not found")
         return chats
@@ -42,7 +62,7 @@ async def read_chat(request: Request, db: Session = Depends(get_db)):
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide 'id', 'user_id' or 'scheme_id'")
 
 @router.post("/", response_model=ChatBase)
-async def create_chat(request: Request, db: Session = Depends(get_db)):
+async def create_chat(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     name_chat = data.get("name_chat")
     user_id = data.get("user_id")
@@ -55,11 +75,11 @@ async def create_chat(request: Request, db: Session = Depends(get_db)):
                         user_id=user_id,
                         scheme_id=scheme_id)
 
-    chat = chat_service.create(db, obj_in=obj_in)
+    chat = await chat_service.create_async(db, obj_in=obj_in)
     return chat
 
 @router.put("/", response_model=ChatBase)
-async def update_chat(request: Request, db: Session = Depends(get_db)):
+async def update_chat(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     chat_id = data.get("id")
     name_chat = data.get("name_chat")
@@ -71,19 +91,17 @@ async def update_chat(request: Request, db: Session = Depends(get_db)):
     
     obj_in = ChatUpdate(id=chat_id, name_chat=name_chat)
     
-    chat = chat_service.update(db, obj_in=obj_in)
+    chat = await chat_service.update_async(db, obj_in=obj_in)
     return chat
 
 @router.delete("/", response_model=ChatBase)
-async def delete_chat(request: Request, db: Session = Depends(get_db)):
+async def delete_chat(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     chat_id = data.get("id")
 
     if not chat_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Chat ID is required")
     
-    obj_in = ChatBase(id=chat_id)
-    
-    chat = chat_service.remove(db, id=chat_id, obj_in=obj_in)
+    chat = await chat_service.remove_async(db, id=chat_id)
     return chat
 
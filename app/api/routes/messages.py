@@ -1,49 +1,71 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from app.api.dependencies import get_db
-from app.models.schemas.message import MultiMessage, MessageBase, MessageCreate, MessageUpdate
+from app.api.dependencies import get_db, get_async_db, validate_keyset_params
+from app.api.responses import RawJSONResponse
+from app.config.config import settings
+from app.db.base import AsyncSessionLocal
+from app.db.unit_of_work import async_unit_of_work
+from app.models.schemas.message import MultiMessage, MessageBase, MessageCreate, MessageUpdate, ContentAi
 from app.services.message_service import MessageService
+from app.services.resilience import CircuitOpenError
 
 router = APIRouter()
 message_service = MessageService()
 
 @router.get("/", response_model=MultiMessage)
-def read_messages(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
+def read_messages(db: Session = Depends(get_db, scope="function"), skip: int = 0, limit: int = 100, cursor: Optional[str] = None, total: str = "none"):
+    # Con 'cursor' (vacío para la primera página) se pagina por cursor en lugar de por offset
+    if cursor is not None:
+        limit = validate_keyset_params(cursor, total, limit)
+        return message_service.get_multi_keyset(db, limit=limit, cursor=cursor, total_mode=total)
+
+    # El JSON del procedimiento se envía tal cual, sin pasar por Python
+    if settings.JSON_PASSTHROUGH:
+        raw = message_service.get_multi_raw(db, limit=limit, skip=skip)
+        if raw is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Messages not found")
+        return RawJSONResponse(raw)
+
     messages = message_service.get_multi(db, limit=limit, skip=skip)
     return messages
 
 @router.post("/by", response_model=Union[MessageBase, MultiMessage])
-async def read_message(request: Request, db: Session = Depends(get_db)):
+async def read_message(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     
     message_id = data.get("id")
     if message_id:
-        message = message_service.get(db, id=message_id)
+        message = await message_service.get_async(db, id=message_id)
         if not message:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
         return message
     
     user_id = data.get("user_id")
     if user_id:
-        messages = message_service.get_by_user_id(db, user_id=user_id)
+        messages = await message_service.get_by_user_id_async(db, user_id=user_id)
         if not messages:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Messages not found")
         return messages
     
     chat_id = data.get("chat_id")
+    if chat_id and "cursor" in data:
+        cursor, total = data.get("cursor"), data.get("total", "none")
+        limit = validate_keyset_params(cursor, total, data.get("limit", 100))
+        return await message_service.get_by_chat_id_keyset_async(db, chat_id=chat_id, limit=limit, cursor=cursor, total_mode=total)
+
     if chat_id:
-        messages = message_service.get_all_with_attachments_by_chat_id(db, chat_id=chat_id)
+        messages = await message_service.get_all_with_attachments_by_chat_id_async(db, chat_id=chat_id)
         if not messages:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Messages not found")
         return messages
     
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide 'id', 'user_id' or 'chat_id'")
 
-@router.post("/", response_model=MessageBase)
-async def send_message(request: Request, db: Session = Depends(get_db)):
-    data = await request.json()
+def _message_create_from(data: dict) -> MessageCreate:
     role = data.get("role")
     content = data.get("content")
     chat_id = data.get("chat_id")
@@ -57,10 +79,53 @@ async def send_message(request: Request, db: Session = Depends(get_db)):
     if not chat_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Chat ID is required")
 
-    obj_in = MessageCreate(role=role, 
-                           content=content,
-                           chat_id=chat_id,
-                           attachments=attachments)
+    return MessageCreate(role=role, 
+                         content=content,
+                         chat_id=chat_id,
+                         attachments=attachments)
 
-    message = message_service.send_message(db, obj_in=obj_in)
+@router.post("/", response_model=MessageBase)
+async def send_message(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
+    data = await request.json()
+    obj_in = _message_create_from(data)
+
+    try:
+        message = await message_service.send_message_async(db, obj_in=obj_in)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after) + 1)},
+        )
     return message
+
+@router.post("/stream")
+async def stream_message(request: Request):
+    data = await request.json()
+    obj_in = _message_create_from(data)
+
+    async def event_stream():
+        # La sesión vive lo mismo que el stream, no lo que dura el handler
+        async with async_unit_of_work(AsyncSessionLocal) as db:
+            async for event in message_service.stream_message(db, obj_in=obj_in):
+                yield event
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/{id}/run")
+async def run_message_code(id: str, db: AsyncSession = Depends(get_async_db, scope="function")):
+    message = await message_service.get_async(db, id=id)
+    if not message:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Message not found")
+    if not isinstance(message.content, ContentAi) or not message.content.content_executable_code:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Message has no executable code")
+
+    return StreamingResponse(
+        message_service.run_executable_code(message=message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
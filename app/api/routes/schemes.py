@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Union
+from typing import List, Optional, Union
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.dependencies import get_db
+from app.api.dependencies import get_db, get_async_db, validate_keyset_params
+from app.api.responses import RawJSONResponse
+from app.config.config import settings
 from app.models.schemas.scheme import MultiScheme, SchemeBase, SchemeCreate, SchemeUpdate
 from app.services.scheme_service import SchemeService
 
@@ -11,31 +14,48 @@ from fastapi import Request
 router = APIRouter()
 scheme_service = SchemeService()
 @router.get("/", response_model=MultiScheme)
-def read_schemes(db: Session = Depends(get_db), skip: int = 0, limit: int = 100):
+def read_schemes(db: Session = Depends(get_db, scope="function"), skip: int = 0, limit: int = 100, cursor: Optional[str] = None, total: str = "none"):
+    # Con 'cursor' (vacío para la primera página) se pagina por cursor en lugar de por offset
+    if cursor is not None:
+        limit = validate_keyset_params(cursor, total, limit)
+        return scheme_service.get_multi_keyset(db, limit=limit, cursor=cursor, total_mode=total)
+
+    # El JSON del procedimiento se envía tal cual, sin pasar por Python
+    if settings.JSON_PASSTHROUGH:
+        raw = scheme_service.get_multi_raw(db, limit=limit, skip=skip)
+        if raw is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schemes not found")
+        return RawJSONResponse(raw)
+
     schemes = scheme_service.get_multi(db, limit=limit, skip=skip)
     return schemes
 
 @router.post("/by", response_model=Union[SchemeBase, MultiScheme])
-async def read_scheme(request: Request, db: Session = Depends(get_db)):
+async def read_scheme(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     
     scheme_id = data.get("id")
     if scheme_id:
-        scheme = scheme_service.get(db, id=scheme_id)
+        scheme = await scheme_service.get_async(db, id=scheme_id)
         if not scheme:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Scheme not found")
         return scheme
     
     user_id = data.get("user_id")
+    if user_id and "cursor" in data:
+        cursor, total = data.get("cursor"), data.get("total", "none")
+        limit = validate_keyset_params(cursor, total, data.get("limit", 100))
+        return await scheme_service.get_by_user_id_keyset_async(db, user_id=user_id, limit=limit, cursor=cursor, total_mode=total)
+
     if user_id:
-        schemes = scheme_service.get_by_user_id(db, user_id=user_id)
+        schemes = await scheme_service.get_by_user_id_async(db, user_id=user_id)
         if not schemes:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schemes not found")
         return schemes
     
     chat_id = data.get("chat_id")
     if chat_id:
-        schemes = scheme_service.get_by_chat_id(db, chat_id=chat_id)
+        schemes = await scheme_service.get_by_chat_id_async(db, chat_id=chat_id)
         if not schemes:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Schemes not found")
         return schemes
@@ -43,7 +63,7 @@ async def read_scheme(request: Request, db: Session = Depends(get_db)):
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide 'id' or 'name'")
 
 @router.post("/", response_model=SchemeBase)
-async def create_scheme(request: Request, db: Session = Depends(get_db)):
+async def create_scheme(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     title = data.get("title")
     content = data.get("content")
@@ -62,11 +82,11 @@ async def create_scheme(request: Request, db: Session = Depends(get_db)):
                           user_id=user_id,
                           attachment_url=attachment_url)
 
-    scheme = scheme_service.create(db, obj_in=obj_in)
+    scheme = await scheme_service.create_async(db, obj_in=obj_in)
     return scheme
 
 @router.put("/", response_model=SchemeBase)
-async def update_scheme(request: Request, db: Session = Depends(get_db)):
+async def update_scheme(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     scheme_id = data.get("id")
     title = data.get("title")
@@ -81,16 +101,16 @@ async def update_scheme(request: Request, db: Session = Depends(get_db)):
                           content=content, 
                           attachment_url=attachment_url)
 
-    scheme = scheme_service.update(db, obj_in=obj_in)
+    scheme = await scheme_service.update_async(db, obj_in=obj_in)
     return scheme
 
 @router.delete("/", response_model=SchemeBase)
-async def delete_scheme(request: Request, db: Session = Depends(get_db)):
+async def delete_scheme(request: Request, db: AsyncSession = Depends(get_async_db, scope="function")):
     data = await request.json()
     scheme_id = data.get("id")
 
     if not scheme_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Scheme ID is required")
     
-    scheme = scheme_service.remove(db, id=scheme_id)
+    scheme = await scheme_service.remove_async(db, id=scheme_id)
     return scheme
\ No newline at end of file
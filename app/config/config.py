@@ -8,11 +8,70 @@ from app.utils.singleton import singleton
 class Settings(BaseSettings):
     UPLOAD_FOLDER: str = Field(default_factory=lambda: os.getenv("UPLOAD_FOLDER", "/tmp/playground"))
     MAX_UPLOAD_SIZE: int = 1024 * 1024 * 100
+    UPLOAD_CHUNK_SIZE: int = Field(default_factory=lambda: int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024))))
     EXECUTION_TIMEOUT: int = Field(default_factory=lambda: int(os.getenv("EXECUTION_TIMEOUT", "5")))
+    EXECUTION_POOL_SIZE: int = Field(default_factory=lambda: int(os.getenv("EXECUTION_POOL_SIZE", "2")))
+    EXECUTION_MEMORY_LIMIT: int = Field(default_factory=lambda: int(os.getenv("EXECUTION_MEMORY_LIMIT", str(1024 * 1024 * 1024))))
+    EXECUTION_MAX_OUTPUT: int = Field(default_factory=lambda: int(os.getenv("EXECUTION_MAX_OUTPUT", str(1024 * 1024))))
+    EXECUTION_SANDBOX: str = Field(default_factory=lambda: os.getenv("EXECUTION_SANDBOX", "namespace"))
+    EXECUTION_MAX_PROCESSES: int = Field(default_factory=lambda: int(os.getenv("EXECUTION_MAX_PROCESSES", "32")))
+    EXECUTION_ALLOW_UNSANDBOXED: bool = Field(default_factory=lambda: os.getenv("EXECUTION_ALLOW_UNSANDBOXED", "False").lower() == "true")
+    EXECUTION_HIDDEN_PATHS: List[str] = Field(default_factory=lambda: [path for path in os.getenv("EXECUTION_HIDDEN_PATHS", "").split(",") if path])
     ALLOWED_ORIGINS: List[str] = Field(default_factory=lambda: os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,https://etlas.vercel.app").split(","))
     CLEANUP_AFTER_RUN: bool = Field(default_factory=lambda: os.getenv("CLEANUP_AFTER_RUN", "True").lower() == "true")
     OPENAI_API_KEY: str = Field(default_factory=lambda: os.getenv("OPENAI_API_KEY", ""))
     MODEL_NAME: str = Field(default_factory=lambda: os.getenv("MODEL_NAME", "o4-mini"))
+    OPENAI_MAX_CONNECTIONS: int = Field(default_factory=lambda: int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = Field(default_factory=lambda: int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")))
+    OPENAI_KEEPALIVE_EXPIRY: float = Field(default_factory=lambda: float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")))
+    OPENAI_TIMEOUT: float = Field(default_factory=lambda: float(os.getenv("OPENAI_TIMEOUT", "120")))
+    LLM_MAX_ATTEMPTS: int = Field(default_factory=lambda: int(os.getenv("LLM_MAX_ATTEMPTS", "3")))
+    LLM_RETRY_BASE_DELAY: float = Field(default_factory=lambda: float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")))
+    LLM_RETRY_MAX_DELAY: float = Field(default_factory=lambda: float(os.getenv("LLM_RETRY_MAX_DELAY", "8")))
+    LLM_ATTEMPT_TIMEOUT: float = Field(default_factory=lambda: float(os.getenv("LLM_ATTEMPT_TIMEOUT", "60")))
+    LLM_TOTAL_TIMEOUT: float = Field(default_factory=lambda: float(os.getenv("LLM_TOTAL_TIMEOUT", "150")))
+    LLM_BREAKER_FAILURE_THRESHOLD: int = Field(default_factory=lambda: int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")))
+    LLM_BREAKER_RESET_TIMEOUT: float = Field(default_factory=lambda: float(os.getenv("LLM_BREAKER_RESET_TIMEOUT", "30")))
+    COMPLETION_CACHE_ENABLED: bool = Field(default_factory=lambda: os.getenv("COMPLETION_CACHE_ENABLED", "False").lower() == "true")
+    COMPLETION_CACHE_TTL: int = Field(default_factory=lambda: int(os.getenv("COMPLETION_CACHE_TTL", "3600")))
+    COMPLETION_CACHE_MAX_ENTRIES: int = Field(default_factory=lambda: int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "1000")))
     DATABASE_URL: str = Field(default_factory=lambda: os.getenv("DATABASE_URL", "sqlite:///./app.db"))
+    ASYNC_DATABASE_URL: str = Field(default_factory=lambda: os.getenv("ASYNC_DATABASE_URL", ""))
+    DB_POOL_SIZE: int = Field(default_factory=lambda: int(os.getenv("DB_POOL_SIZE", "10")))
+    DB_MAX_OVERFLOW: int = Field(default_factory=lambda: int(os.getenv("DB_MAX_OVERFLOW", "20")))
+    DB_POOL_TIMEOUT: float = Field(default_factory=lambda: float(os.getenv("DB_POOL_TIMEOUT", "30")))
+    DB_POOL_RECYCLE: int = Field(default_factory=lambda: int(os.getenv("DB_POOL_RECYCLE", "1800")))
+    DB_STATEMENT_CACHE_SIZE: int = Field(default_factory=lambda: int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256")))
+    JSON_PASSTHROUGH: bool = Field(default_factory=lambda: os.getenv("JSON_PASSTHROUGH", "False").lower() == "true")
+    DB_STARTUP_CHECK: bool = Field(default_factory=lambda: os.getenv("DB_STARTUP_CHECK", "True").lower() == "true")
+    MESSAGE_CONTENT_INLINE: bool = Field(default_factory=lambda: os.getenv("MESSAGE_CONTENT_INLINE", "False").lower() == "true")
+    HISTORY_CACHE_MAX_CHATS: int = Field(default_factory=lambda: int(os.getenv("HISTORY_CACHE_MAX_CHATS", "1000")))
+    HISTORY_CACHE_TTL: int = Field(default_factory=lambda: int(os.getenv("HISTORY_CACHE_TTL", "300")))
+    CONTEXT_MAX_TOKENS: int = Field(default_factory=lambda: int(os.getenv("CONTEXT_MAX_TOKENS", "16000")))
+    CONTEXT_RECENT_MESSAGES: int = Field(default_factory=lambda: int(os.getenv("CONTEXT_RECENT_MESSAGES", "4")))
+    PROMPT_CACHE_SIZE: int = Field(default_factory=lambda: int(os.getenv("PROMPT_CACHE_SIZE", "512")))
+    SCHEME_DIGEST_ENABLED: bool = Field(default_factory=lambda: os.getenv("SCHEME_DIGEST_ENABLED", "True").lower() == "true")
+    SCHEME_DIGEST_CACHE_SIZE: int = Field(default_factory=lambda: int(os.getenv("SCHEME_DIGEST_CACHE_SIZE", "512")))
+    SCHEME_SLICE_MIN_TABLES: int = Field(default_factory=lambda: int(os.getenv("SCHEME_SLICE_MIN_TABLES", "30")))
+    SCHEME_SLICE_MAX_TABLES: int = Field(default_factory=lambda: int(os.getenv("SCHEME_SLICE_MAX_TABLES", "12")))
+    SCHEME_SLICE_MAX_NEIGHBOURS: int = Field(default_factory=lambda: int(os.getenv("SCHEME_SLICE_MAX_NEIGHBOURS", "10")))
+    CONTEXT_TRUNCATE_CHARS: int = Field(default_factory=lambda: int(os.getenv("CONTEXT_TRUNCATE_CHARS", "800")))
+    PROFILE_CHUNK_ROWS: int = Field(default_factory=lambda: int(os.getenv("PROFILE_CHUNK_ROWS", "50000")))
+    PROFILE_MAX_ROWS: int = Field(default_factory=lambda: int(os.getenv("PROFILE_MAX_ROWS", "1000000")))
+    PROFILE_SAMPLE_ROWS: int = Field(default_factory=lambda: int(os.getenv("PROFILE_SAMPLE_ROWS", "5")))
+    PROFILE_CACHE_SIZE: int = Field(default_factory=lambda: int(os.getenv("PROFILE_CACHE_SIZE", "128")))
+    PROFILE_MAX_DATASETS: int = Field(default_factory=lambda: int(os.getenv("PROFILE_MAX_DATASETS", "3")))
+    SERVER_HOST: str = Field(default_factory=lambda: os.getenv("SERVER_HOST", "0.0.0.0"))
+    SERVER_PORT: int = Field(default_factory=lambda: int(os.getenv("PORT", os.getenv("SERVER_PORT", "8000"))))
+    SERVER_WORKERS: int = Field(default_factory=lambda: int(os.getenv("SERVER_WORKERS", "0")))
+    SERVER_WORKERS_PER_CORE: float = Field(default_factory=lambda: float(os.getenv("SERVER_WORKERS_PER_CORE", "2")))
+    SERVER_MAX_WORKERS: int = Field(default_factory=lambda: int(os.getenv("SERVER_MAX_WORKERS", "8")))
+    SERVER_PRELOAD: bool = Field(default_factory=lambda: os.getenv("SERVER_PRELOAD", "True").lower() == "true")
+    SERVER_MAX_REQUESTS: int = Field(default_factory=lambda: int(os.getenv("SERVER_MAX_REQUESTS", "2000")))
+    SERVER_MAX_REQUESTS_JITTER: int = Field(default_factory=lambda: int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "200")))
+    SERVER_TIMEOUT: int = Field(default_factory=lambda: int(os.getenv("SERVER_TIMEOUT", "120")))
+    SERVER_GRACEFUL_TIMEOUT: int = Field(default_factory=lambda: int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30")))
+    SERVER_KEEPALIVE: int = Field(default_factory=lambda: int(os.getenv("SERVER_KEEPALIVE", "5")))
+    SERVER_BACKLOG: int = Field(default_factory=lambda: int(os.getenv("SERVER_BACKLOG", "2048")))
 
 settings:Settings = Settings()
\ No newline at end of file
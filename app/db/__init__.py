@@ -1,10 +1,46 @@
 import logging
+from typing import List
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.db.base import Base, engine
 
+# Índices que esperan los procedimientos almacenados (ver db/migrations)
+REQUIRED_INDEXES = {
+    "messages_chatid_createdat_id_idx": "messages",
+    "messages_contentid_idx": "messages",
+    "attachments_messageid_idx": "attachments",
+    "chats_userid_createdat_id_idx": "chats",
+    "chats_schemeid_createdat_id_idx": "chats",
+    "schemes_userid_createdat_id_idx": "schemes",
+    "schemes_createdat_id_idx": "schemes",
+    "chats_createdat_id_idx": "chats",
+    "messages_createdat_id_idx": "messages",
+}
+
+def missing_indexes(db: Session) -> List[str]:
+    """Devuelve los índices requeridos que no existen o quedaron inválidos"""
+    result = db.execute(
+        text(
+            "SELECT c.relname FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = 'public' AND i.indisvalid AND c.relname = ANY(:names)"
+        ),
+        {"names": list(REQUIRED_INDEXES)}
+    )
+    present = {row[0] for row in result}
+    return [name for name in REQUIRED_INDEXES if name not in present]
+
 def init_db(db: Session) -> None:
     """Inicializa la base de datos creando todas las tablas"""
     # Crea todas las tablas
     Base.metadata.create_all(bind=engine)
-    logging.info("Base de datos inicializada")
\ No newline at end of file
+
+    missing = missing_indexes(db)
+    if missing:
+        logging.warning(
+            "Faltan índices en la base de datos: %s. Ejecute 'python -m app.db.migrations'",
+            ", ".join(f"{REQUIRED_INDEXES[name]}.{name}" for name in missing)
+        )
+    logging.info("Base de datos inicializada")
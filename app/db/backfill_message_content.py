@@ -0,0 +1,61 @@
+"""
+Relleno del contenido de mensajes en línea (ver db/migrations/0003).
+
+Copia por lotes el contenido de messagesContent_user/messagesContent_ai a las
+columnas de public.messages. Cada lote se confirma por separado, así que se
+puede interrumpir y volver a ejecutar; cuando no quedan mensajes pendientes se
+puede activar MESSAGE_CONTENT_INLINE (sin vuelta atrás, ver la migración).
+
+Uso:
+    python -m app.db.backfill_message_content                  # rellena todo
+    python -m app.db.backfill_message_content --batch-size 500
+    python -m app.db.backfill_message_content --status         # mensajes pendientes
+"""
+import argparse
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.config.log import logger
+
+
+def pending(engine: Engine) -> int:
+    with engine.begin() as connection:
+        return connection.execute(text("SELECT public.pending_messages_inline_content()")).scalar()
+
+
+def backfill(engine: Engine, batch_size: int = 1000) -> int:
+    """Rellena los mensajes pendientes y devuelve cuántos se actualizaron."""
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            updated = connection.execute(
+                text("SELECT public.backfill_messages_inline_content(:batch_size)"),
+                {"batch_size": batch_size}
+            ).scalar()
+        if not updated:
+            break
+        total += updated
+        logger.info("Mensajes rellenados: %s", total)
+
+    logger.info("Relleno terminado: %s mensajes actualizados", total)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Copia el contenido de los mensajes a la tabla messages")
+    parser.add_argument("--batch-size", type=int, default=1000, help="mensajes por transacción")
+    parser.add_argument("--status", action="store_true", help="solo muestra cuántos mensajes faltan")
+    args = parser.parse_args()
+
+    from app.db.base import engine
+
+    if args.status:
+        print(f"pendientes  {pending(engine)}")
+        return
+
+    backfill(engine, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,70 @@
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.config.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True, 
-    pool_size=10,
-    max_overflow=20
+# Driver asíncrono para cada backend cuando no se define ASYNC_DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """Deriva la URL asíncrona (asyncpg) a partir de DATABASE_URL."""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+pool_options = dict(
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
 )
+
+engine = create_engine(settings.DATABASE_URL, **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Engine asíncrono, creado en el primer uso: importar la app no exige el
+    driver asíncrono (ni greenlet) si ninguna ruta asíncrona llega a usarse,
+    por ejemplo con el DATABASE_URL de SQLite por defecto sin aiosqlite.
+    """
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        # asyncpg prepara en el servidor cada sentencia distinta y la reutiliza por conexión
+        connect_args = (
+            {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+            if make_url(ASYNC_DATABASE_URL).get_driver_name() == "asyncpg" else {}
+        )
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=connect_args, **pool_options)
+        _async_session_factory = async_sessionmaker(_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Nueva AsyncSession, como SessionLocal() para el engine síncrono."""
+    get_async_engine()
+    return _async_session_factory()
+
+
+async def dispose_async_engine():
+    """Cierra las conexiones del engine asíncrono si llegó a crearse."""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_session_factory = None
+
+Base = declarative_base()
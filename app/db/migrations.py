@@ -0,0 +1,122 @@
+"""
+Migraciones versionadas de la base de datos.
+
+Cada archivo de db/migrations (NNNN_descripcion.sql) se aplica una sola vez, en
+orden, y queda registrado en la tabla schema_migrations. Un archivo que empieza
+con la marca '-- migrate: no-transaction' se ejecuta sentencia por sentencia
+fuera de una transacción (necesario para CREATE INDEX CONCURRENTLY); el resto
+se aplica dentro de una transacción junto con su registro.
+
+Uso:
+    python -m app.db.migrations           # aplica las migraciones pendientes
+    python -m app.db.migrations --status  # lista las migraciones y su estado
+"""
+import argparse
+import re
+from pathlib import Path
+from typing import List, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config.log import logger
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "db" / "migrations"
+NO_TRANSACTION_MARK = "-- migrate: no-transaction"
+
+_MIGRATION_FILE = re.compile(r"^(\d+)_.+\.sql$")
+
+
+def list_migrations(directory: Path = MIGRATIONS_DIR) -> List[Tuple[str, Path]]:
+    """Devuelve (versión, ruta) de cada migración, ordenadas por versión."""
+    migrations = []
+    for path in directory.glob("*.sql"):
+        match = _MIGRATION_FILE.match(path.name)
+        if match:
+            migrations.append((match.group(1), path))
+    return sorted(migrations)
+
+
+def _ensure_table(connection: Connection) -> None:
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS public.schema_migrations ("
+        " version text PRIMARY KEY,"
+        " name text NOT NULL,"
+        " appliedAt timestamp with time zone NOT NULL DEFAULT now()"
+        ")"
+    ))
+
+
+def applied_versions(connection: Connection) -> Set[str]:
+    _ensure_table(connection)
+    return {row[0] for row in connection.execute(text("SELECT version FROM public.schema_migrations"))}
+
+
+def _split_statements(sql: str) -> List[str]:
+    """Separa sentencias simples terminadas en ';' (sin bloques $$)."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [statement.strip() for statement in "\n".join(lines).split(";") if statement.strip()]
+
+
+def _record(connection: Connection, version: str, name: str) -> None:
+    connection.execute(
+        text("INSERT INTO public.schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": version, "name": name}
+    )
+
+
+# Sin parámetros el driver no interpreta los '%' del SQL (por ejemplo en RAISE ... '%')
+RAW_SQL = {"no_parameters": True}
+
+
+def apply_migration(engine: Engine, version: str, path: Path) -> None:
+    sql = path.read_text(encoding="utf-8")
+
+    if sql.lstrip().startswith(NO_TRANSACTION_MARK):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for statement in _split_statements(sql):
+                connection.exec_driver_sql(statement, execution_options=RAW_SQL)
+            _record(connection, version, path.name)
+    else:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(sql, execution_options=RAW_SQL)
+            _record(connection, version, path.name)
+
+
+def migrate(engine: Engine) -> List[str]:
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas."""
+    with engine.begin() as connection:
+        done = applied_versions(connection)
+
+    applied = []
+    for version, path in list_migrations():
+        if version in done:
+            continue
+        logger.info("Aplicando migración %s", path.name)
+        apply_migration(engine, version, path)
+        applied.append(version)
+
+    if not applied:
+        logger.info("La base de datos ya está al día")
+    return applied
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aplica las migraciones de db/migrations")
+    parser.add_argument("--status", action="store_true", help="solo muestra el estado de cada migración")
+    args = parser.parse_args()
+
+    from app.db.base import engine
+
+    if args.status:
+        with engine.begin() as connection:
+            done = applied_versions(connection)
+        for version, path in list_migrations():
+            print(f"{'aplicada ' if version in done else 'pendiente'}  {path.name}")
+        return
+
+    migrate(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Unidad de trabajo por petición.
+
+Los repositorios ya no confirman cada llamada: marcan la sesión con
+mark_write() cuando escriben y la unidad de trabajo confirma una sola vez al
+final de la petición. Una petición que solo lee no confirma nada; la conexión
+vuelve al pool, que descarta la transacción abierta.
+
+Los efectos que solo deben verse si los datos quedaron guardados (por ejemplo,
+actualizar la caché de historial) se registran con on_commit() y se ejecutan
+después del COMMIT; si la unidad se revierte, se descartan.
+"""
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator, Union
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config.log import logger
+
+_WRITES = "uow_writes"
+_AFTER_COMMIT = "uow_after_commit"
+
+
+def mark_write(db: Union[Session, AsyncSession]) -> None:
+    """Indica que la transacción actual tiene escrituras pendientes de confirmar."""
+    db.info[_WRITES] = True
+
+
+def has_writes(db: Union[Session, AsyncSession]) -> bool:
+    return db.info.get(_WRITES, False)
+
+
+def on_commit(db: Union[Session, AsyncSession], callback: Callable[[], None]) -> None:
+    """Ejecuta callback después del próximo COMMIT de la sesión."""
+    db.info.setdefault(_AFTER_COMMIT, []).append(callback)
+
+
+def _reset(db: Union[Session, AsyncSession]) -> list:
+    db.info[_WRITES] = False
+    return db.info.pop(_AFTER_COMMIT, [])
+
+
+def _run_after_commit(db: Union[Session, AsyncSession]) -> None:
+    for callback in _reset(db):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning("Falló un efecto posterior al commit: %s", e)
+
+
+def commit(db: Session) -> None:
+    """
+    Confirma las escrituras pendientes, si las hay. Sirve para cerrar la
+    transacción antes de una espera larga (como la llamada al modelo) sin
+    esperar al final de la petición.
+    """
+    if not has_writes(db):
+        return
+
+    db.commit()
+    _run_after_commit(db)
+
+
+async def commit_async(db: Union[Session, AsyncSession]) -> None:
+    """commit() para código asíncrono; con una Session síncrona usa el threadpool."""
+    if not isinstance(db, AsyncSession):
+        await run_in_threadpool(commit, db)
+        return
+    if not has_writes(db):
+        return
+
+    await db.commit()
+    _run_after_commit(db)
+
+
+def rollback(db: Session) -> None:
+    _reset(db)
+    db.rollback()
+
+
+async def rollback_async(db: Union[Session, AsyncSession]) -> None:
+    """rollback() para código asíncrono; con una Session síncrona usa el threadpool."""
+    if not isinstance(db, AsyncSession):
+        await run_in_threadpool(rollback, db)
+        return
+    _reset(db)
+    await db.rollback()
+
+
+@contextmanager
+def unit_of_work(session_factory: sessionmaker) -> Iterator[Session]:
+    """Abre una sesión, confirma al salir si hubo escrituras y revierte si hubo un error."""
+    db = session_factory()
+    try:
+        yield db
+        commit(db)
+    except BaseException:
+        rollback(db)
+        raise
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def async_unit_of_work(session_factory: Callable[[], AsyncSession]) -> AsyncIterator[AsyncSession]:
+    """unit_of_work() sobre una AsyncSession."""
+    db = session_factory()
+    try:
+        yield db
+        await commit_async(db)
+    except BaseException:
+        await rollback_async(db)
+        raise
+    finally:
+        await db.close()
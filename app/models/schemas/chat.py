@@ -10,10 +10,11 @@ class ChatBase(BaseModel):
 
 class MultiChat(BaseModel):
     """Modelo para la paginación de chats"""
-    total: int
+    total: Optional[int] = None
     limit: int
-    offset: int
-    pages: int 
+    offset: Optional[int] = None
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
     data: List[ChatBase]
 
 class ChatDB(ChatBase):
@@ -34,10 +34,11 @@ class MessageUpdate(BaseModel):
 
 class MultiMessage(BaseModel):
     """Modelo para la paginación de mensajes"""
-    total: int
+    total: Optional[int] = None
     limit: int
-    offset: int
-    pages: int 
+    offset: Optional[int] = None
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
     data: List[MessageBase]
 
 class DeleteMessage(BaseModel):
@@ -32,10 +32,11 @@ class SchemeUpdate(SchemeBase):
 
 class MultiScheme(BaseModel):
     """Modelo para la paginación de esquemas"""
-    total: int
+    total: Optional[int] = None
     limit: int
-    offset: int
-    pages: int 
+    offset: Optional[int] = None
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
     data: List[SchemeBase]
 
 class DeleteScheme(BaseModel):
@@ -0,0 +1,31 @@
+from typing import Any, Generic, TypeVar
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+RepositoryType = TypeVar("RepositoryType")
+
+
+class AsyncRepository(Generic[RepositoryType]):
+    """
+    Expone los métodos de un repositorio síncrono como corrutinas.
+
+    Con una AsyncSession (asyncpg) el método se ejecuta con run_sync: el mismo
+    SQL del repositorio corre sobre la conexión asíncrona sin ocupar un hilo.
+    Con una Session síncrona cada llamada se ejecuta en el threadpool para que
+    las consultas bloqueantes de psycopg2 no detengan el event loop.
+    """
+    def __init__(self, repository: RepositoryType):
+        self.repository = repository
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.repository, name)
+        if not callable(attr):
+            return attr
+
+        async def wrapper(db, *args, **kwargs):
+            if isinstance(db, AsyncSession):
+                return await db.run_sync(lambda session: attr(session, *args, **kwargs))
+            return await run_in_threadpool(attr, db, *args, **kwargs)
+
+        wrapper.__name__ = name
+        return wrapper
@@ -1,9 +1,14 @@
+import json
+from typing import Dict, List
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 
 from app.models.schemas.attachment import AttachmentCreate, AttachmentUpdate, MultiAttachment, AttachmentBase, DeleteAttachment
 from app.repositories.base import BaseRepository
+from app.repositories.history_cache import get_history_cache
+from app.db.unit_of_work import mark_write, on_commit
+from app.utils.singleton import singleton
 
+@singleton
 class AttachmentRepository(BaseRepository[AttachmentBase, AttachmentCreate, AttachmentUpdate, MultiAttachment, DeleteAttachment]):
     """
     Repositorio para operaciones específicas de adjuntos
@@ -12,14 +17,79 @@ class AttachmentRepository(BaseRepository[AttachmentBase, AttachmentCreate, Atta
         """
         Obtiene adjuntos por el ID de mensaje
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_by_message_id(:message_id)"),
-            {"message_id": message_id}
+        return self._fetch_multi(db, f"get_all_{self.__tablename__}s_by_message_id", {"message_id": message_id})
+
+    def get_by_chat_history(self, db: Session, *, chat_id: str, message_ids: List[str]) -> Dict[str, List[AttachmentBase]]:
+        """
+        Adjuntos de los mensajes del historial de un chat. Se guardan junto al
+        historial en la caché, así no se consultan en cada mensaje del chat.
+        """
+        cache = get_history_cache()
+        cached = cache.get_attachments(chat_id)
+        if cached is not None:
+            return cached
+        attachments = self.get_by_message_ids(db, message_ids=message_ids)
+        cache.set_attachments(chat_id, attachments)
+        return attachments
+
+    @staticmethod
+    def _changed(db: Session) -> None:
+        """Los adjuntos en caché dejan de valer cuando se confirma el cambio."""
+        on_commit(db, get_history_cache().invalidate_attachments)
+
+    def create(self, db: Session, *, obj_in: AttachmentCreate) -> AttachmentBase:
+        attachment = super().create(db, obj_in=obj_in)
+        self._changed(db)
+        return attachment
+
+    def create_many(self, db: Session, *, objs_in: List[AttachmentCreate]) -> List[AttachmentBase]:
+        attachments = super().create_many(db, objs_in=objs_in)
+        self._changed(db)
+        return attachments
+
+    def update(self, db: Session, *, db_obj: AttachmentBase, obj_in: AttachmentUpdate) -> AttachmentBase:
+        attachment = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        self._changed(db)
+        return attachment
+
+    def remove(self, db: Session, *, id: str) -> DeleteAttachment:
+        deleted = super().remove(db, id=id)
+        self._changed(db)
+        return deleted
+
+    def get_by_message_ids(self, db: Session, *, message_ids: List[str]) -> Dict[str, List[AttachmentBase]]:
+        """
+        Obtiene los adjuntos de varios mensajes con una sola consulta agrupada,
+        indexados por el ID de mensaje
+        """
+        if not message_ids:
+            return {}
+
+        result = self._call(db, f"get_{self.__tablename__}s_by_message_ids", {"message_ids": [str(message_id) for message_id in message_ids]}, casts={"message_ids": "uuid[]"})
+        records = result.scalar() or {}
+        return {
+            message_id: self.list_adapter.validate_python(attachments)
+            for message_id, attachments in records.items()
+        }
+
+    def create_for_message(self, db: Session, *, message_id: str, obj_in: List[AttachmentCreate]) -> List[AttachmentBase]:
+        """
+        Crea todos los adjuntos de un mensaje con un único INSERT de varias filas
+        """
+        if not obj_in:
+            return []
+
+        result = self._call(
+            db, f"create_{self.__tablename__}s_for_message",
+            {
+                "message_id": str(message_id),
+                "attachments": json.dumps([{"url": a.url, "filename": a.filename} for a in obj_in]),
+            },
+            casts={"attachments": "json"}
         )
         records = result.scalar()
+        mark_write(db)
+        self._changed(db)
         if not records:
-            return None
-        return self.multi_validator(records)
-    
-    
-    
\ No newline at end of file
+            raise Exception("Error creating attachments")
+        return self.list_adapter.validate_python(records)
@@ -1,8 +1,13 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union, Callable
+import json
+from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union, Callable, get_args, get_origin
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel, UUID4
+from pydantic import BaseModel, TypeAdapter, UUID4
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import Result
+
+from app.db.unit_of_work import mark_write
+from app.repositories.statements import get_statement_registry
+from app.utils.pagination import decode_cursor, encode_cursor
 
 ModelType = TypeVar("ModelType", bound=BaseModel)
 MultiSchemaType = TypeVar("MultiSchemaType", bound=BaseModel)
@@ -15,27 +20,81 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType, Mult
     """
     Repositorio CRUD base con operaciones por defecto
     """
-    def __init__(self):
-        self.__tablename__ = self.__orig_bases__[0].__args__[0].__tablename__
-        self.base_validator: Callable[[Any], ModelType] = self.__orig_bases__[0].__args__[0].model_validate
-        self.multi_validator: Callable[[Any], MultiSchemaType] = self.__orig_bases__[0].__args__[3].model_validate
-        self.delete_validator: Callable[[Any], DeleteSchemaType] = self.__orig_bases__[0].__args__[4].model_validate
+    __tablename__: str
+    model_type: Type[BaseModel]
+    list_adapter: TypeAdapter
+    statements: Dict[str, str]
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Resuelve una sola vez por subclase el nombre de la tabla, los validadores
+        y los procedimientos de las operaciones por defecto, a partir de los
+        argumentos de BaseRepository[...]
+        """
+        super().__init_subclass__(**kwargs)
+        args = next((get_args(base) for base in getattr(cls, "__orig_bases__", ()) if get_origin(base) is BaseRepository), None)
+        if not args:
+            return
+
+        model, create_schema, update_schema, multi_schema, delete_schema = args
+        cls.__tablename__ = model.__tablename__
+        cls.model_type = model
+        cls.base_validator = staticmethod(model.model_validate)
+        cls.multi_validator = staticmethod(multi_schema.model_validate)
+        cls.delete_validator = staticmethod(delete_schema.model_validate)
+        cls.base_json_validator = staticmethod(model.model_validate_json)
+        cls.multi_json_validator = staticmethod(multi_schema.model_validate_json)
+        cls.list_adapter = TypeAdapter(List[model])
+        cls.statements = {
+            "get": f"get_{cls.__tablename__}_by_id",
+            "get_multi": f"get_all_{cls.__tablename__}s",
+            "create": f"create_{cls.__tablename__}",
+            "create_many": f"create_{cls.__tablename__}s_many",
+            "update": f"update_{cls.__tablename__}",
+            "remove": f"delete_{cls.__tablename__}",
+        }
+
+        # Compila las llamadas de las operaciones CRUD por defecto
+        registry = get_statement_registry()
+        registry.statement(cls.statements["get"], ["id"])
+        registry.statement(cls.statements["get_multi"], ["limit", "skip"])
+        registry.statement(cls.statements["remove"], ["id"])
+        for operation, schema in (("create", create_schema), ("update", update_schema)):
+            ordered_params = schema.model_fields.get("ordered_params")
+            if ordered_params is not None:
+                registry.statement(cls.statements[operation], ordered_params.default)
+
+    def _call(self, db: Session, function: str, params: Dict[str, Any], casts: Optional[Dict[str, str]] = None) -> Result:
+        """
+        Ejecuta un procedimiento almacenado con la sentencia compilada del registro.
+        Los parámetros se pasan en el orden del diccionario.
+        """
+        return get_statement_registry().execute(db, function, params, casts)
+
+    def _call_raw(self, db: Session, function: str, params: Dict[str, Any], casts: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """
+        Ejecuta el procedimiento y devuelve su JSON como texto, sin que el driver
+        lo decodifique: se valida directamente con model_validate_json o se envía
+        tal cual en la respuesta
+        """
+        return get_statement_registry().execute(db, function, params, casts, raw=True).scalar()
+
+    def _fetch_multi(self, db: Session, function: str, params: Dict[str, Any]) -> Optional[MultiSchemaType]:
+        """Ejecuta un procedimiento de listado y valida su JSON en una sola pasada"""
+        raw = self._call_raw(db, function, params)
+        if not raw:
+            return None
+        return self.multi_json_validator(raw)
     
     def get(self, db: Session, id: UUID4) -> ModelType:
         """
         Obtiene un registro por su ID usando un procedimiento almacenado
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_{self.__tablename__}_by_id(:id)"),
-            {"id": id}
-        )
-        db.commit()
-        record = result.scalar()
-
-        if not record:
+        raw = self._call_raw(db, self.statements["get"], {"id": id})
+        if not raw:
             return None
     
-        return self.base_validator(record)
+        return self.base_json_validator(raw)
 
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 10
@@ -43,14 +102,43 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType, Mult
         """
         Obtiene múltiples registros con paginación usando un procedimiento almacenado
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s(:limit, :skip)"),
-            {"limit": limit, "skip": skip} 
-        )
-        db.commit()
+        return self.multi_json_validator(self.get_multi_raw(db, skip=skip, limit=limit))
 
-        records = result.scalar()
+    def get_multi_raw(self, db: Session, *, skip: int = 0, limit: int = 10) -> Optional[str]:
+        """
+        Igual que get_multi pero devuelve el JSON del procedimiento sin validar,
+        para enviarlo directamente en la respuesta
+        """
+        return self._call_raw(db, self.statements["get_multi"], {"limit": limit, "skip": skip})
+
+    def get_multi_keyset(
+        self, db: Session, *, limit: int = 10, cursor: Optional[str] = None, total_mode: str = "none"
+    ) -> MultiSchemaType:
+        """
+        Obtiene múltiples registros con paginación por cursor sobre (created_at, id)
+        """
+        return self._get_keyset_page(db, f"get_all_{self.__tablename__}s_keyset", {}, limit=limit, cursor=cursor, total_mode=total_mode)
 
+    def _get_keyset_page(
+        self, db: Session, function: str, params: Dict[str, Any], *, limit: int, cursor: Optional[str], total_mode: str
+    ) -> MultiSchemaType:
+        """
+        Ejecuta un procedimiento de paginación por cursor. Los parámetros propios
+        del procedimiento van antes que los de paginación.
+        """
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        params = {
+            **params,
+            "limit": limit,
+            "cursor_created_at": cursor_created_at,
+            "cursor_id": cursor_id,
+            "total_mode": total_mode,
+        }
+        result = self._call(db, function, params)
+
+        records = result.scalar()
+        next_key = records.pop("next", None)
+        records["next_cursor"] = encode_cursor(next_key["created_at"], next_key["id"]) if next_key else None
         return self.multi_validator(records)
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
@@ -63,14 +151,8 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType, Mult
         params = {k: v for k, v in obj_in_data.items() if v is not None}
         order_params = {k: params[k] if k in params else None for k in obj_in_data["ordered_params"]}
         
-        # Construir la llamada al procedimiento
-        param_names = ", ".join([f":{k}" for k in order_params.keys()])
-        
-        result = db.execute(
-            text(f"SELECT * FROM create_{self.__tablename__}({param_names})"),
-            order_params
-        )
-        db.commit()
+        result = self._call(db, self.statements["create"], order_params)
+        mark_write(db)
         
         # El procedimiento debería devolver el registro creado
         record = result.scalar()
@@ -82,6 +164,31 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType, Mult
         obj_in_data["created_at"] = record["created_at"]
         return self.base_validator(obj_in_data)
 
+    def create_many(self, db: Session, *, objs_in: List[CreateSchemaType]) -> List[ModelType]:
+        """
+        Crea varios registros con un solo INSERT usando el procedimiento
+        create_<tabla>s_many, que devuelve los registros en el mismo orden
+        """
+        if not objs_in:
+            return []
+
+        objs_in_data = [jsonable_encoder(obj_in) for obj_in in objs_in]
+        rows = [{k: data.get(k) for k in data["ordered_params"]} for data in objs_in_data]
+
+        result = self._call(db, self.statements["create_many"], {"rows": json.dumps(rows)}, casts={"rows": "json"})
+        mark_write(db)
+
+        records = result.scalar()
+        if not records or len(records) != len(objs_in_data):
+            raise Exception("Error creating records")
+
+        created = []
+        for data, record in zip(objs_in_data, records):
+            data["id"] = record["id"]
+            data["created_at"] = record["created_at"]
+            created.append(self.base_validator(data))
+        return created
+
     def update(
         self, db: Session, *, db_obj: ModelType, obj_in: UpdateSchemaType
     ) -> ModelType:
@@ -95,16 +202,10 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType, Mult
         params.update({k: v for k, v in update_data.items() if v is not None})
         # Ordernar los parámetros según el esquema
         params = {k: params[k] if k in params else None for k in update_data["ordered_params"]}
-        
-        # Construir la llamada al procedimiento
-        param_names = ", ".join([f":{k}" for k in params.keys()])
 
         try:
-            result = db.execute(
-                text(f"SELECT * FROM update_{self.__tablename__}({param_names})"),
-                params
-            )
-            db.commit()
+            result = self._call(db, self.statements["update"], params)
+            mark_write(db)
             
             # El procedimiento debería devolver el registro actualizado
             record = result.scalar()
@@ -122,7 +223,7 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType, Mult
             
             return self.base_validator(updated_obj)
         except Exception as e:
-            db.rollback()
+            # La unidad de trabajo revierte la transacción al propagarse el error
             raise Exception(f"Error updating record: {e}")
         
 
@@ -131,11 +232,8 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType, Mult
         """
         Elimina un registro usando un procedimiento almacenado
         """
-        result = db.execute(
-            text(f"SELECT * FROM delete_{self.__tablename__}(:id)"),
-            {"id": id}
-        )
-        db.commit()
+        result = self._call(db, self.statements["remove"], {"id": id})
+        mark_write(db)
         
         # El procedimiento debería devolver el registro eliminado
         record = result.scalar()
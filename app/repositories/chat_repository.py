@@ -1,62 +1,54 @@
+from typing import Optional
+
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 
 from app.models.schemas.chat import ChatCreate, ChatUpdate, MultiChat, ChatBase, DeleteChat
 from app.repositories.base import BaseRepository
+from app.repositories.history_cache import get_history_cache
+from app.db.unit_of_work import on_commit
+from app.utils.singleton import singleton
 
+@singleton
 class ChatRepository(BaseRepository[ChatBase, ChatCreate, ChatUpdate, MultiChat, DeleteChat]):
     """
     Repositorio para operaciones específicas de chats
     """    
+    def remove(self, db: Session, *, id: str) -> DeleteChat:
+        deleted = super().remove(db, id=id)
+        # Como en MessageRepository: si la transacción se revierte la caché no cambia
+        on_commit(db, lambda: get_history_cache().invalidate(id))
+        return deleted
+
     def get_by_user_id(self, db: Session, *, user_id: str) -> MultiChat:
         """
         Obtiene chats por el ID de usuario
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_by_user_id(:user_id)"),
-            {"user_id": user_id}
-        )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
+        return self._fetch_multi(db, f"get_all_{self.__tablename__}s_by_user_id", {"user_id": user_id})
     
+    def get_by_user_id_keyset(self, db: Session, *, user_id: str, limit: int = 10, cursor: Optional[str] = None, total_mode: str = "none") -> MultiChat:
+        """
+        Obtiene chats por el ID de usuario con paginación por cursor
+        """
+        return self._get_keyset_page(
+            db, f"get_all_{self.__tablename__}s_by_user_id_keyset", {"user_id": user_id},
+            limit=limit, cursor=cursor, total_mode=total_mode
+        )
+
     def get_by_scheme_id(self, db: Session, *, scheme_id: str) -> MultiChat:
         """
         Obtiene chats por el ID de esquema
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_{self.__tablename__}_by_scheme_id(:scheme_id)"),
-            {"scheme_id": scheme_id}
-        )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
+        return self._fetch_multi(db, f"get_{self.__tablename__}_by_scheme_id", {"scheme_id": scheme_id})
     
     def get_all_chats_by_user_id(self, db: Session, *, user_id: str, skip: int = 0, limit: int = 10) -> MultiChat:
         """
         Obtiene todos los chats por el ID de usuario
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_by_user_id(:user_id, :limit, :skip)"),
-            {"user_id": user_id, "limit": limit, "skip": skip}
-        )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
+        return self._fetch_multi(db, f"get_all_{self.__tablename__}s_by_user_id", {"user_id": user_id, "limit": limit, "skip": skip})
     
     def get_all_chats_by_scheme_id(self, db: Session, *, scheme_id: str, skip: int = 0, limit: int = 10) -> MultiChat:
         """
         Obtiene todos los chats por el ID de esquema
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_by_scheme_id(:scheme_id, :limit, :skip)"),
-            {"scheme_id": scheme_id, "limit": limit, "skip": skip}
-        )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
+        return self._fetch_multi(db, f"get_all_{self.__tablename__}s_by_scheme_id", {"scheme_id": scheme_id, "limit": limit, "skip": skip})
     
@@ -0,0 +1,164 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.config.config import settings
+from app.models.schemas.attachment import AttachmentBase
+from app.models.schemas.message import UnitMessage
+
+
+class HistoryCache(ABC):
+    """
+    Interfaz para la caché del historial de conversación por chat.
+
+    Permite cambiar la implementación en memoria por otra compartida entre
+    procesos (por ejemplo Redis) sin tocar el repositorio de mensajes.
+    """
+    @abstractmethod
+    def get(self, chat_id: str) -> Optional[List[UnitMessage]]:
+        """Devuelve el historial en orden cronológico o None si no está en caché."""
+
+    @abstractmethod
+    def set(self, chat_id: str, messages: List[UnitMessage]) -> None:
+        """Guarda el historial completo de un chat."""
+
+    @abstractmethod
+    def append(self, chat_id: str, message: UnitMessage, attachments: Optional[List[AttachmentBase]] = None) -> None:
+        """Agrega un mensaje nuevo (y sus adjuntos) al historial, solo si el chat ya está en caché."""
+
+    @abstractmethod
+    def get_attachments(self, chat_id: str) -> Optional[Dict[str, List[AttachmentBase]]]:
+        """Adjuntos de los mensajes del historial por ID de mensaje, o None si no están en caché."""
+
+    @abstractmethod
+    def set_attachments(self, chat_id: str, attachments: Dict[str, List[AttachmentBase]]) -> None:
+        """Guarda los adjuntos del historial, solo si el chat ya está en caché."""
+
+    @abstractmethod
+    def invalidate_attachments(self) -> None:
+        """Descarta los adjuntos guardados de todos los chats (el historial se conserva)."""
+
+    @abstractmethod
+    def invalidate(self, chat_id: str) -> None:
+        """Descarta el historial de un chat."""
+
+    @abstractmethod
+    def invalidate_message(self, message_id: str) -> None:
+        """Descarta el historial del chat al que pertenece un mensaje."""
+
+
+@dataclass
+class _Entry:
+    expires_at: float
+    messages: List[UnitMessage]
+    attachments: Optional[Dict[str, List[AttachmentBase]]] = None
+
+
+class LRUHistoryCache(HistoryCache):
+    """
+    Caché en memoria del proceso con expulsión LRU y expiración por TTL.
+
+    El TTL acota la desactualización cuando varios workers escriben en el mismo
+    chat, ya que cada proceso tiene su propia copia.
+    """
+    def __init__(self, max_chats: int = 1000, ttl: float = 300):
+        self.max_chats = max_chats
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._message_chat: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: str) -> Optional[List[UnitMessage]]:
+        key = str(chat_id)
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            # Copia para que quien la use pueda agregar mensajes sin alterar la caché
+            return list(entry.messages)
+
+    def set(self, chat_id: str, messages: List[UnitMessage]) -> None:
+        if self.max_chats <= 0:
+            return
+        key = str(chat_id)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = _Entry(expires_at=time.monotonic() + self.ttl, messages=list(messages))
+            for message in messages:
+                self._message_chat[str(message.id)] = key
+            while len(self._entries) > self.max_chats:
+                self._drop(next(iter(self._entries)))
+
+    def append(self, chat_id: str, message: UnitMessage, attachments: Optional[List[AttachmentBase]] = None) -> None:
+        key = str(chat_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.messages.append(message)
+            self._message_chat[str(message.id)] = key
+            if attachments and entry.attachments is not None:
+                entry.attachments[str(message.id)] = list(attachments)
+
+    def get_attachments(self, chat_id: str) -> Optional[Dict[str, List[AttachmentBase]]]:
+        with self._lock:
+            entry = self._live(str(chat_id))
+            if entry is None or entry.attachments is None:
+                return None
+            return {message_id: list(attachments) for message_id, attachments in entry.attachments.items()}
+
+    def set_attachments(self, chat_id: str, attachments: Dict[str, List[AttachmentBase]]) -> None:
+        with self._lock:
+            entry = self._live(str(chat_id))
+            if entry is not None:
+                entry.attachments = {str(message_id): list(items) for message_id, items in attachments.items()}
+
+    def invalidate_attachments(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                entry.attachments = None
+
+    def invalidate(self, chat_id: str) -> None:
+        with self._lock:
+            self._drop(str(chat_id))
+
+    def invalidate_message(self, message_id: str) -> None:
+        with self._lock:
+            chat_id = self._message_chat.get(str(message_id))
+            if chat_id is not None:
+                self._drop(chat_id)
+
+    def _live(self, key: str) -> Optional[_Entry]:
+        """Entrada del chat si existe y no expiró (las expiradas se descartan)."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        return entry
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for message in entry.messages:
+            self._message_chat.pop(str(message.id), None)
+
+
+_history_cache: HistoryCache = LRUHistoryCache(
+    max_chats=settings.HISTORY_CACHE_MAX_CHATS,
+    ttl=settings.HISTORY_CACHE_TTL,
+)
+
+
+def get_history_cache() -> HistoryCache:
+    return _history_cache
+
+
+def set_history_cache(cache: HistoryCache) -> None:
+    """Reemplaza la implementación de la caché (por ejemplo por una compartida)."""
+    global _history_cache
+    _history_cache = cache
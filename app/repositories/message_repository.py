@@ -1,106 +1,171 @@
-from typing import Any, List
+import json
+from typing import Any, List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import Result, text
+from sqlalchemy import Result
 
-from app.models.schemas.message import MessageCreate, MessageUpdate, MultiMessage, MessageBase, DeleteMessage, ContentAi, ContentUser, ListMessage, UnitMessage
+from app.models.schemas.message import MessageCreate, MessageUpdate, MultiMessage, MessageBase, DeleteMessage, ContentAi, ContentUser, ListMessage, UnitMessage, MessageWithAttachment
 from app.repositories.base import BaseRepository
+from app.repositories.history_cache import get_history_cache
+from app.db.unit_of_work import mark_write, on_commit
+from app.config.config import settings
 
 from fastapi.encoders import jsonable_encoder
+from app.utils.singleton import singleton
 
+# Campos del contenido que get_message_by_id devuelve al mismo nivel que el mensaje
+LEGACY_CONTENT_FIELDS = {
+    "user": ("content",),
+    "ai": ("content_analysis", "content_comment", "content_code", "content_executable_code"),
+}
+
+@singleton
 class MessageRepository(BaseRepository[MessageBase, MessageCreate, MessageUpdate, MultiMessage, DeleteMessage]):
     """
     Repositorio para operaciones específicas de mensajes
     """    
-    def get_multi(self, db, *, skip = 0, limit = 10):
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_whit_content(:limit, :skip)"),
-            {"limit": limit, "skip": skip} 
-        )
-        db.commit()
+    def _function(self, name: str) -> str:
+        """
+        Nombre del procedimiento según el almacenamiento del contenido: con
+        MESSAGE_CONTENT_INLINE se usan las variantes *_inline, que leen y escriben
+        el contenido directamente en la tabla messages
+        """
+        return f"{name}_inline" if settings.MESSAGE_CONTENT_INLINE else name
 
-        records = result.scalar()
-        return self.multi_validator(records)
+    def get(self, db: Session, id: str) -> MessageBase:
+        raw = self._call_raw(db, self._function(f"get_{self.__tablename__}_by_id"), {"id": id})
+        if not raw:
+            return None
+        if settings.MESSAGE_CONTENT_INLINE:
+            return self.base_json_validator(raw)
+        return self.base_validator(self._nest_legacy_content(json.loads(raw)))
 
-    def create(self, db, *, obj_in):
+    @staticmethod
+    def _nest_legacy_content(record: dict) -> dict:
+        """
+        Adapta la respuesta de get_message_by_id, con el contenido en campos
+        sueltos y sin adjuntos, a la forma de MessageBase
+        """
+        fields = LEGACY_CONTENT_FIELDS.get(record.get("role"), ())
+        record["content"] = {field: record.pop(field, None) for field in fields}
+        record.setdefault("attachments", None)
+        return record
+
+    def get_multi(self, db, *, skip = 0, limit = 10):
+        return self.multi_json_validator(self.get_multi_raw(db, skip=skip, limit=limit))
 
-        result: Result[Any] = None
+    def get_multi_raw(self, db: Session, *, skip: int = 0, limit: int = 10) -> Optional[str]:
+        function = f"get_all_{self.__tablename__}s_with_content_inline" if settings.MESSAGE_CONTENT_INLINE else f"get_all_{self.__tablename__}s_whit_content"
+        return self._call_raw(db, function, {"limit": limit, "skip": skip})
 
+    def create(self, db, *, obj_in):
+        """
+        Crea el mensaje y, si los trae, todos sus adjuntos con una sola llamada
+        a create_message_with_attachments
+        """
         if isinstance(obj_in.content, ContentAi):
-            result = db.execute(
-                text(f"SELECT * FROM create_{self.__tablename__}(:chat_id, :role, :content, :content_analysis, :content_comment, :content_code, :content_executable_code)"),
-                {
-                    "chat_id": obj_in.chat_id,
-                    "role": obj_in.role,
-                    "content": None,
-                    "content_analysis": obj_in.content.content_analysis,
-                    "content_comment": obj_in.content.content_comment,
-                    "content_code": obj_in.content.content_code,
-                    "content_executable_code": obj_in.content.content_executable_code,
-                }
-            )
+            params = {
+                "chat_id": obj_in.chat_id,
+                "role": obj_in.role,
+                "content": None,
+                "content_analysis": obj_in.content.content_analysis,
+                "content_comment": obj_in.content.content_comment,
+                "content_code": obj_in.content.content_code,
+                "content_executable_code": obj_in.content.content_executable_code,
+            }
         elif isinstance(obj_in.content, ContentUser):
-            result = db.execute(
-                text(f"SELECT * FROM create_{self.__tablename__}(:chat_id, :role, :content)"),
-                {
-                    "chat_id": obj_in.chat_id,
-                    "role": obj_in.role,
-                    "content": obj_in.content.content,
-                }
-            )
+            params = {
+                "chat_id": obj_in.chat_id,
+                "role": obj_in.role,
+                "content": obj_in.content.content,
+                "content_analysis": None,
+                "content_comment": None,
+                "content_code": None,
+                "content_executable_code": None,
+            }
         else:
             raise ValueError("Invalid content type")
 
-        
+        function = f"create_{self.__tablename__}"
+        if obj_in.attachments:
+            function = f"create_{self.__tablename__}_with_attachments"
+            params["attachments"] = json.dumps([{"url": a.url, "filename": a.filename} for a in obj_in.attachments])
+
+        result: Result[Any] = self._call(db, self._function(function), params)
+
         record = result.scalar()
-        db.commit()
+        mark_write(db)
         if not record:
             return None
         
         obj_in_data = jsonable_encoder(obj_in)
         obj_in_data["id"] = record["id"]
         obj_in_data["created_at"] = record["created_at"]
+        obj_in_data["attachments"] = record.get("attachments")
+
+        message = self.base_validator(obj_in_data)
+        # La caché solo ve el mensaje cuando la transacción se confirma
+        on_commit(db, lambda: get_history_cache().append(
+            obj_in.chat_id,
+            UnitMessage(id=message.id, created_at=message.created_at, role=message.role, content=message.content),
+            attachments=message.attachments,
+        ))
+        if message.attachments is not None:
+            return MessageWithAttachment(**message.model_dump())
+        return message
 
-        return self.base_validator(obj_in_data)
+    def remove(self, db: Session, *, id: str) -> DeleteMessage:
+        deleted = super().remove(db, id=id)
+        on_commit(db, lambda: get_history_cache().invalidate_message(id))
+        return deleted
     
+    def get_multi_keyset(self, db: Session, *, limit: int = 10, cursor: Optional[str] = None, total_mode: str = "none") -> MultiMessage:
+        return self._get_keyset_page(
+            db, self._function(f"get_all_{self.__tablename__}s_keyset"), {},
+            limit=limit, cursor=cursor, total_mode=total_mode
+        )
+
     def get_by_user_id(self, db: Session, *, user_id: str) -> MultiMessage:
         """
         Obtiene mensajes por el ID de usuario
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_by_user_id(:user_id)"),
-            {"user_id": user_id}
-        )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
+        return self._fetch_multi(db, f"get_all_{self.__tablename__}s_by_user_id", {"user_id": user_id})
     
     def update(self):
         pass
 
     def get_all_with_attachments_by_chat_id(self, db: Session, *, chat_id: str,  skip: int = 0, limit: int = 10) -> MultiMessage:
         """
-        Obtiene mensajes por el ID de chat
+        Obtiene mensajes con adjuntos por el ID de chat. El procedimiento elige
+        primero la página de mensajes y trae sus adjuntos en una sola agregación
+        """
+        return self._fetch_multi(db, self._function(f"get_all_{self.__tablename__}s_with_content_attachment_by_chatId"), {"chat_id": chat_id, "limit": limit, "skip": skip})
+
+    def get_by_chat_id_keyset(self, db: Session, *, chat_id: str, limit: int = 10, cursor: Optional[str] = None, total_mode: str = "none") -> MultiMessage:
+        """
+        Obtiene mensajes con adjuntos por el ID de chat con paginación por cursor,
+        del más reciente al más antiguo
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_with_content_attachment_by_chatId(:chat_id, :limit, :skip)"),
-            {"chat_id": chat_id, "limit": limit, "skip": skip}
+        return self._get_keyset_page(
+            db, self._function(f"get_all_{self.__tablename__}s_by_chat_id_keyset"), {"chat_id": chat_id},
+            limit=limit, cursor=cursor, total_mode=total_mode
         )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
 
     def get_full_messages_by_chat_id(self, db: Session, *, chat_id: str) -> ListMessage:
         """
-        Obtiene mensajes por el ID de chat
+        Obtiene el historial completo del chat en orden cronológico.
+        Se sirve desde la caché de historial cuando está disponible.
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_full_{self.__tablename__}s_with_content_by_chatId(:chat_id)"),
-            {"chat_id": chat_id}
-        )
-        records = result.scalar()
-        if not records:
+        cache = get_history_cache()
+        cached = cache.get(chat_id)
+        if cached is not None:
+            return ListMessage.model_construct(data=cached)
+
+        raw = self._call_raw(db, self._function(f"get_full_{self.__tablename__}s_with_content_by_chatId"), {"chat_id": chat_id})
+        if not raw:
             return None
 
-        return ListMessage.model_validate(records)
\ No newline at end of file
+        history = ListMessage.model_validate_json(raw)
+        # El procedimiento agrega los mensajes del más reciente al más antiguo
+        history.data.sort(key=lambda message: message.created_at)
+        cache.set(chat_id, history.data)
+        return history
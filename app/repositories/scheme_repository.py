@@ -1,11 +1,13 @@
 from typing import Any, Dict, Optional, Union
 
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 
 from app.models.schemas.scheme import SchemeCreate, SchemeUpdate, MultiScheme, SchemeBase, DeleteScheme
 from app.repositories.base import BaseRepository
+from app.db.unit_of_work import mark_write
+from app.utils.singleton import singleton
 
+@singleton
 class SchemeRepository(BaseRepository[SchemeBase, SchemeCreate, SchemeUpdate, MultiScheme, DeleteScheme]):
     """
     Repositorio para operaciones específicas de esquemas
@@ -14,32 +16,32 @@ class SchemeRepository(BaseRepository[SchemeBase, SchemeCreate, SchemeUpdate, Mu
         """
         Obtiene esquemas por el ID de usuario
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_by_user_id(:user_id)"),
-            {"user_id": user_id}
-        )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
+        return self._fetch_multi(db, f"get_all_{self.__tablename__}s_by_user_id", {"user_id": user_id})
     
-    def get_by_chat_id(self, db: Session, *, chat_id: str,  skip: int = 0, limit: int = 10) -> MultiScheme:
+    def get_by_user_id_keyset(self, db: Session, *, user_id: str, limit: int = 10, cursor: Optional[str] = None, total_mode: str = "none") -> MultiScheme:
         """
-        Obtiene esquemas por el ID de chat
+        Obtiene esquemas por el ID de usuario con paginación por cursor
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_all_{self.__tablename__}s_by_chat_id(:chat_id, :limit, :skip)"),
-            {"chat_id": chat_id, "limit": limit, "skip": skip}
+        return self._get_keyset_page(
+            db, f"get_all_{self.__tablename__}s_by_user_id_keyset", {"user_id": user_id},
+            limit=limit, cursor=cursor, total_mode=total_mode
         )
-        records = result.scalar()
-        if not records:
-            return None
-        return self.multi_validator(records)
-    
-
-    
-
-
 
+    def get_by_chat_id(self, db: Session, *, chat_id: str,  skip: int = 0, limit: int = 10) -> MultiScheme:
+        """
+        Obtiene esquemas por el ID de chat
+        """
+        return self._fetch_multi(db, f"get_all_{self.__tablename__}s_by_chat_id", {"chat_id": chat_id, "limit": limit, "skip": skip})
 
+    def get_digest(self, db: Session, *, id: str) -> Optional[str]:
+        """
+        Obtiene el resumen estructurado guardado del esquema, como JSON en texto
+        """
+        return self._call_raw(db, f"get_{self.__tablename__}_digest", {"id": str(id)})
 
+    def set_digest(self, db: Session, *, id: str, digest: Optional[str]) -> None:
+        """
+        Guarda el resumen estructurado del esquema (None lo borra)
+        """
+        self._call(db, f"set_{self.__tablename__}_digest", {"id": str(id), "digest": digest}, casts={"digest": "json"})
+        mark_write(db)
@@ -0,0 +1,93 @@
+"""
+Registro de llamadas a procedimientos almacenados.
+
+Cada llamada (procedimiento + nombres de parámetros) se compila una sola vez a
+un TextClause y se reutiliza: el texto SQL es siempre idéntico, así que
+SQLAlchemy reutiliza su forma compilada y asyncpg su sentencia preparada en el
+servidor (una por conexión, ver DB_STATEMENT_CACHE_SIZE).
+
+El registro además mide cada ejecución para saber qué procedimientos son los
+más llamados y los más costosos.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import Result, TextClause, text
+from sqlalchemy.orm import Session
+
+
+@dataclass
+class ProcedureStats:
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+class StatementRegistry:
+    def __init__(self):
+        self._statements: Dict[Tuple[str, Tuple[str, ...], Tuple[Tuple[str, str], ...], bool], TextClause] = {}
+        self._stats: Dict[str, ProcedureStats] = {}
+        self._lock = threading.Lock()
+
+    def statement(self, function: str, params: Sequence[str], casts: Optional[Mapping[str, str]] = None, raw: bool = False) -> TextClause:
+        """
+        Devuelve la sentencia 'SELECT * FROM function(:p1, :p2, ...)' compilada una
+        sola vez. casts indica los parámetros que se convierten con CAST(:p AS tipo).
+        Con raw el resultado se pide como texto ('SELECT function(...)::text') para
+        que el driver no decodifique el JSON.
+        """
+        casts = casts or {}
+        key = (function, tuple(params), tuple(sorted(casts.items())), raw)
+        statement = self._statements.get(key)
+        if statement is None:
+            args = ", ".join(f"CAST(:{p} AS {casts[p]})" if p in casts else f":{p}" for p in params)
+            statement = text(f"SELECT {function}({args})::text" if raw else f"SELECT * FROM {function}({args})")
+            with self._lock:
+                statement = self._statements.setdefault(key, statement)
+        return statement
+
+    def execute(self, db: Session, function: str, params: Dict[str, Any], casts: Optional[Mapping[str, str]] = None, raw: bool = False) -> Result:
+        """Ejecuta el procedimiento con los parámetros en el orden del diccionario."""
+        statement = self.statement(function, list(params.keys()), casts, raw)
+        start = time.perf_counter()
+        try:
+            return db.execute(statement, params)
+        finally:
+            self._record(function, time.perf_counter() - start)
+
+    def _record(self, function: str, elapsed: float) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(function, ProcedureStats())
+            stats.calls += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+
+    def hot(self, limit: int = 10) -> List[Tuple[str, ProcedureStats]]:
+        """Procedimientos ordenados por tiempo total acumulado."""
+        with self._lock:
+            ranked = sorted(self._stats.items(), key=lambda item: item[1].total_time, reverse=True)
+        return ranked[:limit]
+
+    def report(self, limit: int = 10) -> str:
+        lines = [
+            f"{function}: {stats.calls} llamadas, {stats.total_time * 1000:.1f} ms en total, "
+            f"{stats.avg_time * 1000:.2f} ms de media, {stats.max_time * 1000:.1f} ms máx."
+            for function, stats in self.hot(limit)
+        ]
+        return "\n".join(lines)
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+
+_statement_registry = StatementRegistry()
+
+
+def get_statement_registry() -> StatementRegistry:
+    return _statement_registry
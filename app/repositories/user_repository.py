@@ -1,12 +1,13 @@
 from typing import Any, Dict, Optional, Union
 
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 
 from app.models.schemas.user import UserCreate, UserUpdate, MultiUser, UserBase, UserDelete
 from app.repositories.base import BaseRepository
+from app.utils.singleton import singleton
 
 
+@singleton
 class UserRepository(BaseRepository[UserBase, UserCreate, UserUpdate, MultiUser, UserDelete]):
     """
     Repositorio para operaciones específicas de usuarios
@@ -15,16 +16,10 @@ class UserRepository(BaseRepository[UserBase, UserCreate, UserUpdate, MultiUser,
         """
         Obtiene un usuario por su correo electrónico
         """
-        result = db.execute(
-            text(f"SELECT * FROM get_{self.__tablename__}_by_email(:email)"),
-            {"email": email}
-        )
-        db.commit()
-
-        record = result.scalar()
-        if not record:
+        raw = self._call_raw(db, f"get_{self.__tablename__}_by_email", {"email": email})
+        if not raw:
             return None
-        return self.base_validator(record)
+        return self.base_json_validator(raw)
 
 
     def create(self, db, *, obj_in):
@@ -0,0 +1,121 @@
+"""
+Servidor de producción: python -m app.serve
+
+Levanta varios workers uvicorn bajo gunicorn para aprovechar todos los núcleos
+(la validación con pydantic y la serialización JSON consumen CPU). La app se
+importa una sola vez en el proceso maestro (preload) y los workers se reciclan
+tras SERVER_MAX_REQUESTS peticiones, terminando antes las que tengan en curso.
+Si gunicorn no está instalado se usa el modo multiproceso de uvicorn.
+
+La caché del historial de conversación es de cada proceso: con más de un worker
+se desactiva, porque un mensaje guardado por un worker no aparecería en el
+historial que otro tiene en caché (salvo que se instale una caché compartida
+con set_history_cache).
+
+Toda la configuración sale de Settings (variables SERVER_*).
+"""
+import os
+
+from app.config.config import settings
+from app.config.log import logger
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # Por ejemplo en Windows; uvicorn también gestiona varios workers
+    BaseApplication = None
+
+
+def available_cpus() -> int:
+    """Núcleos que puede usar el proceso (respeta la afinidad del contenedor)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    """SERVER_WORKERS si se define; si no, SERVER_WORKERS_PER_CORE por núcleo, hasta SERVER_MAX_WORKERS."""
+    if settings.SERVER_WORKERS > 0:
+        return settings.SERVER_WORKERS
+    workers = int(available_cpus() * settings.SERVER_WORKERS_PER_CORE)
+    return max(1, min(workers, settings.SERVER_MAX_WORKERS))
+
+
+def disable_process_history_cache() -> None:
+    """
+    Desactiva la caché de historial en memoria antes de que se importe la app.
+    Se ajustan tanto la configuración ya cargada (workers de gunicorn, que se
+    crean con fork) como el entorno (workers de uvicorn, que la vuelven a leer).
+    """
+    os.environ["HISTORY_CACHE_MAX_CHATS"] = "0"
+    settings.HISTORY_CACHE_MAX_CHATS = 0
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el maestro no se comparten entre procesos
+    from app.db.base import engine
+    engine.dispose(close=False)
+
+
+def gunicorn_options() -> dict:
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": worker_count(),
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "preload_app": settings.SERVER_PRELOAD,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "timeout": settings.SERVER_TIMEOUT,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "backlog": settings.SERVER_BACKLOG,
+        "post_fork": post_fork,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+
+
+if BaseApplication is not None:
+    class GunicornApplication(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from app import create_app
+            return create_app()
+
+
+def run_uvicorn() -> None:
+    import uvicorn
+    uvicorn.run(
+        "run:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=worker_count(),
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        limit_max_requests=settings.SERVER_MAX_REQUESTS or None,
+    )
+
+
+def main() -> None:
+    if worker_count() > 1 and settings.HISTORY_CACHE_MAX_CHATS > 0:
+        logger.info("Caché de historial en memoria desactivada: no se comparte entre %s workers", worker_count())
+        disable_process_history_cache()
+    if BaseApplication is None:
+        logger.warning("gunicorn no está instalado, se usa uvicorn con %s workers", worker_count())
+        run_uvicorn()
+        return
+    options = gunicorn_options()
+    logger.info("Iniciando gunicorn en %s con %s workers", options["bind"], options["workers"])
+    GunicornApplication(options).run()
+
+
+if __name__ == "__main__":
+    main()
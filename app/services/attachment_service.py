@@ -1,10 +1,15 @@
+from typing import Dict, List
 from sqlalchemy.orm import Session
 from app.models.schemas.attachment import AttachmentCreate, AttachmentUpdate, MultiAttachment, AttachmentBase, DeleteAttachment
 from app.repositories.attachment_repository import AttachmentRepository
+from app.repositories.async_base import AsyncRepository
+from app.utils.singleton import singleton
 
+@singleton
 class AttachmentService:
     def __init__(self):
         self.repository = AttachmentRepository()
+        self.async_repository = AsyncRepository(self.repository)
     
     def get(self, db: Session, *, id: int) -> AttachmentBase:
         return self.repository.get(db, id=id)
@@ -12,11 +17,32 @@ class AttachmentService:
     def get_all_by_message_id(self, db: Session, *, message_id: str) -> MultiAttachment:
         return self.repository.get_all_by_message_id(db, message_id=message_id)
     
+    def get_by_message_ids(self, db: Session, *, message_ids: List[str]) -> Dict[str, List[AttachmentBase]]:
+        return self.repository.get_by_message_ids(db, message_ids=message_ids)
+    
+    async def get_by_message_ids_async(self, db: Session, *, message_ids: List[str]) -> Dict[str, List[AttachmentBase]]:
+        return await self.async_repository.get_by_message_ids(db, message_ids=message_ids)
+
+    async def get_by_chat_history_async(self, db: Session, *, chat_id: str, message_ids: List[str]) -> Dict[str, List[AttachmentBase]]:
+        return await self.async_repository.get_by_chat_history(db, chat_id=chat_id, message_ids=message_ids)
+    
     def get_multi(self, db: Session, *, limit = 100, skip = 0) -> MultiAttachment:
         return self.repository.get_multi(db, limit=limit, skip=skip)
     
     def create(self, db: Session, *, obj_in) -> AttachmentBase:
         return self.repository.create(db, obj_in=obj_in)
+
+    async def create_async(self, db: Session, *, obj_in) -> AttachmentBase:
+        return await self.async_repository.create(db, obj_in=obj_in)
+
+    def create_many(self, db: Session, *, objs_in: List[AttachmentCreate]) -> List[AttachmentBase]:
+        return self.repository.create_many(db, objs_in=objs_in)
+
+    def create_for_message(self, db: Session, *, message_id: str, obj_in: List[AttachmentCreate]) -> List[AttachmentBase]:
+        return self.repository.create_for_message(db, message_id=message_id, obj_in=obj_in)
+
+    async def create_for_message_async(self, db: Session, *, message_id: str, obj_in: List[AttachmentCreate]) -> List[AttachmentBase]:
+        return await self.async_repository.create_for_message(db, message_id=message_id, obj_in=obj_in)
     
     def update(self, db: Session, *, obj_in: AttachmentUpdate) -> AttachmentBase:
         db_obj = self.get(db, id=obj_in.id)
@@ -1,35 +1,75 @@
+from typing import Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas.chat import MultiChat, ChatBase, ChatUpdate, DeleteChat
 from app.repositories.chat_repository import ChatRepository
+from app.repositories.async_base import AsyncRepository
+from app.utils.singleton import singleton
 
+@singleton
 class ChatService:
     def __init__(self):
         self.repository = ChatRepository()
+        self.async_repository = AsyncRepository(self.repository)
     
     def create(self, db: Session, *, obj_in: ChatBase) -> ChatBase:
         return self.repository.create(db, obj_in=obj_in)
 
+    async def create_async(self, db: AsyncSession, *, obj_in: ChatBase) -> ChatBase:
+        return await self.async_repository.create(db, obj_in=obj_in)
+
     def update(self, db: Session, *, obj_in: ChatUpdate) -> ChatBase:
         db_obj = self.repository.get(db, id=obj_in.id)
         if not db_obj:
             raise Exception("Chat not found")
         
         return self.repository.update(db, db_obj=db_obj, obj_in=obj_in)
+
+    async def update_async(self, db: Session, *, obj_in: ChatUpdate) -> ChatBase:
+        db_obj = await self.async_repository.get(db, id=obj_in.id)
+        if not db_obj:
+            raise Exception("Chat not found")
+        
+        return await self.async_repository.update(db, db_obj=db_obj, obj_in=obj_in)
     
     def remove(self, db: Session, *, id: int) -> DeleteChat:
         return self.repository.remove(db, id=id)
 
+    async def remove_async(self, db: AsyncSession, *, id: int) -> DeleteChat:
+        return await self.async_repository.remove(db, id=id)
+
     def get(self, db: Session, *, id: int) -> ChatBase:
         return self.repository.get(db, id=id)
 
+    async def get_async(self, db: AsyncSession, *, id: int) -> ChatBase:
+        return await self.async_repository.get(db, id=id)
+
     def get_multi(self, db: Session, *, limit: int = 100, skip: int = 0) -> MultiChat:
         return self.repository.get_multi(db, limit=limit, skip=skip)
 
+    def get_multi_raw(self, db: Session, *, limit: int = 100, skip: int = 0) -> str:
+        return self.repository.get_multi_raw(db, limit=limit, skip=skip)
+
+    def get_multi_keyset(self, db: Session, *, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiChat:
+        return self.repository.get_multi_keyset(db, limit=limit, cursor=cursor, total_mode=total_mode)
+
     def get_by_user_id(self, db: Session, *, user_id: str) -> MultiChat:
         return self.repository.get_by_user_id(db, user_id=user_id)
+
+    async def get_by_user_id_async(self, db: AsyncSession, *, user_id: str) -> MultiChat:
+        return await self.async_repository.get_by_user_id(db, user_id=user_id)
+
+    def get_by_user_id_keyset(self, db: Session, *, user_id: str, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiChat:
+        return self.repository.get_by_user_id_keyset(db, user_id=user_id, limit=limit, cursor=cursor, total_mode=total_mode)
+
+    async def get_by_user_id_keyset_async(self, db: AsyncSession, *, user_id: str, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiChat:
+        return await self.async_repository.get_by_user_id_keyset(db, user_id=user_id, limit=limit, cursor=cursor, total_mode=total_mode)
     
     def get_by_scheme_id(self, db: Session, *, scheme_id: str) -> MultiChat:
         return self.repository.get_by_scheme_id(db, scheme_id=scheme_id)
+
+    async def get_by_scheme_id_async(self, db: AsyncSession, *, scheme_id: str) -> MultiChat:
+        return await self.async_repository.get_by_scheme_id(db, scheme_id=scheme_id)
     
     def get_all_chats_by_user_id(self, db: Session, *, user_id: str, skip: int = 0, limit: int = 10) -> MultiChat:
         return self.repository.get_all_chats_by_user_id(db, user_id=user_id, skip=skip, limit=limit)
@@ -0,0 +1,348 @@
+"""
+Ejecución del código ejecutable de los mensajes en procesos aislados.
+
+Se mantiene un pool de procesos ya lanzados (sandbox_worker.py) con pandas
+importado y esperando el código, así la ejecución no paga el arranque del
+intérprete ni el import. Cada proceso se usa una sola vez: al tomarlo se lanza
+otro en segundo plano para reponerlo.
+
+Con EXECUTION_SANDBOX=namespace (por defecto) cada proceso corre en namespaces
+propios de usuario, montaje, red y procesos (unshare de util-linux): sin red,
+sin ver los procesos ni el entorno de la API, con el código de la API y los
+adjuntos ocultos (EXECUTION_HIDDEN_PATHS) y sin capabilities. Requiere que el
+kernel (y el perfil seccomp del contenedor) permitan namespaces de usuario sin
+privilegios. EXECUTION_SANDBOX=none solo aplica los límites de recursos: el
+código corre con el usuario de la API y puede leer su entorno (la clave de
+OpenAI, las credenciales de la base de datos), así que solo se acepta para
+desarrollo local y con EXECUTION_ALLOW_UNSANDBOXED=true.
+
+En ambos casos cada proceso trabaja en su propio directorio bajo
+UPLOAD_FOLDER/runs, con un entorno mínimo (sin credenciales), límites de CPU,
+memoria, tamaño de archivos y procesos, y en su propia sesión: al terminar, o
+si supera EXECUTION_TIMEOUT, se mata el grupo de procesos completo.
+"""
+import asyncio
+import codecs
+import json
+import os
+import shutil
+import signal
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from app.config.config import settings
+from app.config.log import logger
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+# Directorio raíz del código de la API, que el sandbox no debe poder leer
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SANDBOX_MODES = ("namespace", "none")
+
+# Bytes que se leen de cada tubería por iteración
+READ_CHUNK_SIZE = 4096
+
+# Segundos que se espera a que termine un proceso después de matar su grupo
+KILL_GRACE_PERIOD = 1
+
+
+@dataclass
+class WarmProcess:
+    process: asyncio.subprocess.Process
+    workdir: str
+
+
+class SandboxUnavailableError(RuntimeError):
+    """El sandbox no está disponible (o no está permitido): no se ejecuta código sin aislar."""
+
+
+class CodeRunner:
+    def __init__(
+        self, root: str, pool_size: int, timeout: float, memory_limit: int, file_size_limit: int, max_output: int,
+        cleanup: bool, sandbox: str = "namespace", max_processes: int = 0, hidden_paths: Sequence[str] = (),
+        allow_unsandboxed: bool = False,
+    ):
+        """
+        Args:
+            root: Directorio bajo el que se crea el directorio de cada ejecución
+            pool_size: Procesos que se mantienen listos
+            timeout: Segundos de CPU y de reloj que puede durar una ejecución
+            memory_limit: Límite de memoria virtual por proceso, en bytes (0 sin límite)
+            file_size_limit: Tamaño máximo de cada archivo escrito, en bytes
+            max_output: Bytes de salida que se envían antes de detener la ejecución
+            cleanup: Si se borra el directorio de trabajo al terminar
+            sandbox: 'namespace' para aislar cada proceso con namespaces, 'none' para solo limitarlo
+            max_processes: Procesos e hilos que puede crear cada ejecución (0 sin límite)
+            hidden_paths: Directorios que el código no puede ver en el modo 'namespace'
+            allow_unsandboxed: Si se acepta el modo 'none'
+        """
+        if sandbox not in SANDBOX_MODES:
+            raise ValueError(f"Unknown sandbox mode '{sandbox}', expected one of {SANDBOX_MODES}")
+        if pool_size < 1:
+            # Sin procesos en el pool run() esperaría para siempre
+            raise ValueError(f"Execution pool size must be at least 1, got {pool_size}")
+        self.root = root
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.file_size_limit = file_size_limit
+        self.max_output = max_output
+        self.cleanup = cleanup
+        self.sandbox = sandbox
+        self.max_processes = max_processes
+        self.hidden_paths = sorted({os.path.abspath(path) for path in hidden_paths if path})
+        self.allow_unsandboxed = allow_unsandboxed
+        self._available = False
+        self._tools: Dict[str, str] = {}
+        self._idle: Optional[asyncio.Queue] = None
+        self._spawning: set = set()
+
+    async def start(self) -> None:
+        """Lanza los procesos del pool (se llama al iniciar la aplicación)."""
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        os.makedirs(self.root, exist_ok=True)
+        if self.sandbox == "namespace":
+            self._tools = {name: shutil.which(name) for name in ("unshare", "setpriv", "mount")}
+            missing = [name for name, path in self._tools.items() if not path]
+            if missing:
+                logger.error("Sandbox de ejecución no disponible, faltan: %s", ", ".join(missing))
+                return
+            if any(sys.prefix == path or sys.prefix.startswith(path + os.sep) for path in self.hidden_paths):
+                logger.warning("El entorno de Python (%s) está dentro de un directorio oculto al sandbox", sys.prefix)
+        elif not self.allow_unsandboxed:
+            logger.error("EXECUTION_SANDBOX=none requiere EXECUTION_ALLOW_UNSANDBOXED=true: no se ejecutará código")
+            return
+        else:
+            logger.warning("EXECUTION_SANDBOX=none: el código de los mensajes se ejecuta sin aislar")
+        self._available = True
+        for _ in range(self.pool_size):
+            self._replenish()
+
+    def _replenish(self) -> None:
+        task = asyncio.create_task(self._spawn())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+    async def _spawn(self) -> None:
+        workdir = os.path.join(self.root, uuid.uuid4().hex)
+        os.makedirs(workdir)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self._command(workdir),
+                cwd=workdir,
+                env=self._environment(workdir),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                # Sesión propia: el grupo de procesos se mata entero al terminar
+                start_new_session=True,
+            )
+        except Exception as e:
+            logger.error("No se pudo lanzar un proceso de ejecución: %s", e)
+            shutil.rmtree(workdir, ignore_errors=True)
+            return
+        await self._idle.put(WarmProcess(process=process, workdir=workdir))
+
+    def _command(self, workdir: str) -> List[str]:
+        limits = [str(int(self.timeout)), str(self.memory_limit), str(self.file_size_limit), str(self.max_processes)]
+        if self.sandbox == "none":
+            return [sys.executable, "-I", "-u", WORKER_SCRIPT, "run", *limits, "-1"]
+        config = {
+            "workdir": workdir,
+            "hidden": self.hidden_paths,
+            "mount": self._tools["mount"],
+            "setpriv": self._tools["setpriv"],
+            "limits": limits,
+        }
+        return [
+            self._tools["unshare"], "--user", "--map-root-user", "--mount", "--net", "--pid", "--ipc", "--uts",
+            "--fork", "--kill-child", "--mount-proc",
+            sys.executable, "-I", "-u", WORKER_SCRIPT, "isolate", json.dumps(config),
+        ]
+
+    @staticmethod
+    def _environment(workdir: str) -> dict:
+        return {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": workdir,
+            "TMPDIR": workdir,
+            "OMP_NUM_THREADS": "1",
+            "OPENBLAS_NUM_THREADS": "1",
+            "MKL_NUM_THREADS": "1",
+            "MPLBACKEND": "Agg",
+        }
+
+    @staticmethod
+    def _kill(process: asyncio.subprocess.Process) -> None:
+        """Mata el grupo de procesos de la ejecución, incluidos los que lanzó el código."""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            # El grupo ya no tiene procesos
+            pass
+
+    async def _terminate(self, process: asyncio.subprocess.Process) -> None:
+        """Mata el grupo de procesos y espera a que termine (con un plazo, por si algo escapó del grupo)."""
+        self._kill(process)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            logger.warning("El proceso de ejecución %s no terminó tras matar su grupo", process.pid)
+
+    async def _acquire(self) -> WarmProcess:
+        await self.start()
+        if not self._available:
+            raise SandboxUnavailableError("Code execution sandbox is not available")
+        while True:
+            warm = await self._idle.get()
+            # Se repone en cuanto se toma, para que la siguiente petición lo encuentre listo
+            self._replenish()
+            if warm.process.returncode is None:
+                return warm
+            shutil.rmtree(warm.workdir, ignore_errors=True)
+
+    async def run(self, code: str) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Ejecuta el código y emite la salida a medida que se produce.
+
+        Emite eventos ('stdout' | 'stderr', {"data": texto}) y al terminar un evento
+        ('exit', {...}) con el código de salida, si se agotó el tiempo o se truncó
+        la salida, la duración y los archivos que dejó en su directorio.
+        """
+        warm = await self._acquire()
+        process = warm.process
+        events: asyncio.Queue = asyncio.Queue()
+        readers = [
+            asyncio.create_task(self._read(process.stdout, "stdout", events)),
+            asyncio.create_task(self._read(process.stderr, "stderr", events)),
+        ]
+        started = time.monotonic()
+        deadline = started + self.timeout
+        timed_out = truncated = False
+        output_size = 0
+        open_streams = len(readers)
+
+        try:
+            process.stdin.write(code.encode("utf-8"))
+            await process.stdin.drain()
+            process.stdin.close()
+
+            while open_streams:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    break
+                if event is None:
+                    open_streams -= 1
+                    continue
+                output_size += len(event[1])
+                if output_size > self.max_output:
+                    truncated = True
+                    break
+                yield event[0], {"data": event[1]}
+
+            if timed_out or truncated:
+                self._kill(process)
+            # process.wait() también espera a que se cierren las tuberías: en el
+            # modo namespace el kernel mata lo que el código dejó en segundo plano
+            # cuando termina el proceso; si algo las mantiene abiertas, se agota
+            # el tiempo y se mata el grupo
+            try:
+                returncode = await asyncio.wait_for(process.wait(), timeout=max(deadline - time.monotonic(), KILL_GRACE_PERIOD))
+            except asyncio.TimeoutError:
+                timed_out = True
+                await self._terminate(process)
+                returncode = process.returncode
+
+            yield "exit", {
+                "returncode": returncode,
+                "timed_out": timed_out or (not truncated and self._killed_by_cpu_limit(returncode)),
+                "truncated": truncated,
+                "duration": round(time.monotonic() - started, 3),
+                "files": await asyncio.to_thread(self._list_files, warm.workdir),
+            }
+        finally:
+            # Si el cliente se desconecta el generador se cierra y no debe quedar nada vivo
+            await self._terminate(process)
+            for reader in readers:
+                reader.cancel()
+            if self.cleanup:
+                await asyncio.to_thread(shutil.rmtree, warm.workdir, True)
+
+    @staticmethod
+    async def _read(stream: asyncio.StreamReader, name: str, events: asyncio.Queue) -> None:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            chunk = await stream.read(READ_CHUNK_SIZE)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                await events.put((name, text))
+            if not chunk:
+                break
+        await events.put(None)
+
+    @staticmethod
+    def _killed_by_cpu_limit(returncode: int) -> bool:
+        # SIGXCPU al superar el límite blando y SIGKILL al llegar al duro
+        return returncode in (-24, -9)
+
+    @staticmethod
+    def _list_files(workdir: str) -> List[str]:
+        files = []
+        for path, _, names in os.walk(workdir):
+            files.extend(os.path.relpath(os.path.join(path, name), workdir) for name in names)
+        return sorted(files)
+
+    async def close(self) -> None:
+        """Termina los procesos que quedan en el pool."""
+        for task in list(self._spawning):
+            task.cancel()
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            warm = self._idle.get_nowait()
+            await self._terminate(warm.process)
+            shutil.rmtree(warm.workdir, ignore_errors=True)
+        self._idle = None
+
+
+_code_runner: Optional[CodeRunner] = None
+
+
+def get_code_runner() -> CodeRunner:
+    """Devuelve el pool de ejecución del proceso, creándolo si todavía no existe."""
+    global _code_runner
+    if _code_runner is None:
+        _code_runner = CodeRunner(
+            root=os.path.join(settings.UPLOAD_FOLDER, "runs"),
+            pool_size=settings.EXECUTION_POOL_SIZE,
+            timeout=settings.EXECUTION_TIMEOUT,
+            memory_limit=settings.EXECUTION_MEMORY_LIMIT,
+            file_size_limit=settings.MAX_UPLOAD_SIZE,
+            max_output=settings.EXECUTION_MAX_OUTPUT,
+            cleanup=settings.CLEANUP_AFTER_RUN,
+            sandbox=settings.EXECUTION_SANDBOX,
+            max_processes=settings.EXECUTION_MAX_PROCESSES,
+            hidden_paths=[APP_ROOT, settings.UPLOAD_FOLDER, *settings.EXECUTION_HIDDEN_PATHS],
+            allow_unsandboxed=settings.EXECUTION_ALLOW_UNSANDBOXED,
+        )
+    return _code_runner
+
+
+async def close_code_runner():
+    """Termina el pool al apagar la aplicación."""
+    global _code_runner
+    if _code_runner is not None:
+        await _code_runner.close()
+        _code_runner = None
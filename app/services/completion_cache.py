@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from app.config.config import settings
+
+
+def _normalize(text: str) -> str:
+    """Ignora diferencias de espacios que no cambian la pregunta."""
+    return " ".join(text.split())
+
+
+def _message_fields(message: Union[Dict, BaseModel]) -> List[str]:
+    if isinstance(message, BaseModel):
+        message = message.model_dump()
+    return [message["role"], _normalize(message["content"] or "")]
+
+
+def completion_key(model: str, history: List[Union[Dict, BaseModel]]) -> str:
+    """
+    Clave de la respuesta para un modelo y un historial completo.
+
+    El historial ya incluye el prompt del sistema compilado (con el esquema) y
+    el mensaje actual del usuario, por lo que la clave cambia si cambia
+    cualquiera de ellos.
+    """
+    payload = [model] + [_message_fields(message) for message in history]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class CompletionCache(ABC):
+    """
+    Interfaz para la caché de respuestas del modelo.
+
+    Guarda el texto crudo devuelto por el modelo, de modo que sirve tanto para
+    las respuestas completas como para las transmitidas por stream.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la respuesta guardada o None si no está en caché."""
+
+    @abstractmethod
+    def set(self, key: str, response: str) -> None:
+        """Guarda la respuesta del modelo."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Descarta todas las respuestas."""
+
+
+class LRUCompletionCache(CompletionCache):
+    """Caché en memoria del proceso con expulsión LRU y expiración por TTL."""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def set(self, key: str, response: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_completion_cache: Optional[CompletionCache] = None
+if settings.COMPLETION_CACHE_ENABLED:
+    _completion_cache = LRUCompletionCache(
+        max_entries=settings.COMPLETION_CACHE_MAX_ENTRIES,
+        ttl=settings.COMPLETION_CACHE_TTL,
+    )
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """Devuelve la caché de respuestas, o None si está deshabilitada."""
+    return _completion_cache
+
+
+def set_completion_cache(cache: Optional[CompletionCache]) -> None:
+    """Reemplaza la implementación de la caché (por ejemplo por una compartida) o la deshabilita con None."""
+    global _completion_cache
+    _completion_cache = cache
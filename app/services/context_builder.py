@@ -0,0 +1,105 @@
+from typing import List, Optional
+
+from app.config.log import logger
+from app.models.schemas.message import UnitMessage
+from app.utils.utils import content_ai_to_string, content_ai_to_summary, truncate_text
+from .iaclient import ApiMessage
+
+try:
+    import tiktoken
+except ImportError:  # El conteo aproximado basta si tiktoken no está instalado
+    tiktoken = None
+
+# Tokens que la API agrega por cada mensaje (rol y separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    """Cuenta tokens localmente, con tiktoken si está disponible o por aproximación."""
+
+    def __init__(self, model: str):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self.encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # tiktoken descarga la codificación la primera vez: sin red (o sin
+                # caché) se usa la aproximación en vez de impedir que la API arranque
+                logger.warning("No se pudo cargar la codificación de tiktoken, se cuentan tokens por aproximación: %s", e)
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        # Aproximación habitual: ~4 caracteres por token
+        return len(text) // 4 + 1
+
+
+class ContextWindowBuilder:
+    """
+    Arma el historial que se envía al modelo dentro de un presupuesto de tokens.
+
+    Los mensajes más recientes se envían completos; los anteriores se compactan
+    (se recortan el análisis, el comentario y el código, y se omite el código
+    ejecutable) y, cuando ya no caben en el presupuesto, se descartan.
+    """
+    def __init__(self, counter: TokenCounter, max_tokens: int, recent_messages: int, truncate_chars: int):
+        """
+        Args:
+            counter: Contador de tokens del modelo
+            max_tokens: Presupuesto total de tokens para el prompt
+            recent_messages: Cantidad de mensajes recientes que se envían completos
+            truncate_chars: Longitud máxima de cada campo en los mensajes compactados
+        """
+        self.counter = counter
+        self.max_tokens = max_tokens
+        self.recent_messages = recent_messages
+        self.truncate_chars = truncate_chars
+
+    def build(self, messages: List[UnitMessage], reserved_tokens: int = 0) -> List[ApiMessage]:
+        """
+        Selecciona y compacta el historial.
+
+        Args:
+            messages: Historial en orden cronológico
+            reserved_tokens: Tokens ya ocupados por el prompt del sistema y el mensaje actual
+
+        Returns:
+            Mensajes para la API en orden cronológico
+        """
+        budget = self.max_tokens - reserved_tokens
+        selected: List[ApiMessage] = []
+
+        for position, message in enumerate(reversed(messages)):
+            api_message = self._render(message, compact=position >= self.recent_messages)
+            cost = self.counter.count(api_message.content) + MESSAGE_OVERHEAD_TOKENS
+
+            if cost > budget and position < self.recent_messages:
+                api_message = self._render(message, compact=True)
+                cost = self.counter.count(api_message.content) + MESSAGE_OVERHEAD_TOKENS
+
+            if cost > budget:
+                break
+
+            budget -= cost
+            selected.append(api_message)
+
+        selected.reverse()
+        return selected
+
+    def _render(self, message: UnitMessage, compact: bool) -> ApiMessage:
+        if message.role == "user":
+            content = message.content.content or ""
+            if compact:
+                content = truncate_text(content, self.truncate_chars)
+            return ApiMessage(role="user", content=content)
+
+        if compact:
+            content = content_ai_to_summary(message.content, self.truncate_chars)
+        else:
+            content = content_ai_to_string(message.content)
+        return ApiMessage(role="assistant", content=content)
@@ -0,0 +1,294 @@
+"""
+Perfil compacto de los datasets adjuntos (CSV / Parquet) para el prompt.
+
+El archivo se recorre por bloques (read_csv con chunksize, o iter_batches de
+pyarrow sobre el archivo mapeado en memoria), nunca completo: por columna se
+acumulan el tipo, los nulos, el mínimo y el máximo y un sketch KMV (k valores
+mínimos de hash) que estima la cardinalidad con memoria fija. El perfil se
+guarda por hash del archivo en memoria y junto a los adjuntos, así cada archivo
+se analiza una sola vez.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from app.config.config import settings
+from app.config.log import logger
+from app.utils.singleton import singleton
+from .upload_service import UploadService, attachment_digest
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # Sin pandas no se perfilan los adjuntos
+    np = pd = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Sin pyarrow solo se perfilan archivos CSV
+    pq = None
+
+# Valores de hash que guarda el sketch de cardinalidad de cada columna
+SKETCH_SIZE = 1024
+
+# Longitud máxima de los valores que se muestran en el prompt
+MAX_VALUE_CHARS = 40
+
+CSV_SEPARATORS = {".csv": ",", ".tsv": "\t", ".txt": ","}
+PARQUET_EXTENSIONS = {".parquet", ".pq"}
+
+
+class ColumnProfile(BaseModel):
+    name: str
+    dtype: str
+    nulls: int = 0
+    distinct: int = 0
+    distinct_exact: bool = True
+    min: Optional[str] = None
+    max: Optional[str] = None
+
+
+class DatasetProfile(BaseModel):
+    filename: str
+    format: str
+    rows: int
+    # False si el CSV se cortó en PROFILE_MAX_ROWS: rows es solo un mínimo
+    rows_exact: bool = True
+    scanned_rows: int
+    columns: List[ColumnProfile]
+    sample: List[List[str]]
+
+    def to_prompt(self) -> str:
+        """Texto compacto del perfil para el prompt del sistema."""
+        scanned = "" if self.rows_exact and self.scanned_rows >= self.rows else f" (perfil sobre las primeras {self.scanned_rows} filas)"
+        rows = f"{self.rows}" if self.rows_exact else f"≥ {self.rows}"
+        lines = [f"Archivo {self.filename} ({self.format}): {rows} filas, {len(self.columns)} columnas{scanned}"]
+        for column in self.columns:
+            parts = [f"- {column.name}: {column.dtype}"]
+            if self.scanned_rows:
+                parts.append(f"nulos {column.nulls / self.scanned_rows:.1%}")
+            parts.append(f"{'' if column.distinct_exact else '~'}{column.distinct} distintos")
+            if column.min is not None:
+                parts.append(f"min {column.min}")
+                parts.append(f"max {column.max}")
+            lines.append(" | ".join(parts))
+        if self.sample:
+            lines.append("Filas de ejemplo:")
+            lines.append(",".join(column.name for column in self.columns))
+            lines.extend(",".join(row) for row in self.sample)
+        return "\n".join(lines)
+
+
+def _short(value) -> str:
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_CHARS else text[:MAX_VALUE_CHARS] + "…"
+
+
+def _merge_dtype(current: Optional[str], new: str) -> str:
+    """Tipo común cuando distintos bloques infieren tipos distintos."""
+    if current is None or current == new:
+        return new
+    numeric = ("int", "float", "uint")
+    if current.startswith(numeric) and new.startswith(numeric):
+        return "float64"
+    return "object"
+
+
+class ColumnAccumulator:
+    """Estadísticas de una columna acumuladas bloque a bloque."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.dtype: Optional[str] = None
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self._ranged = True
+        self._sketch = np.empty(0, dtype=np.uint64)
+
+    def update(self, series: "pd.Series") -> None:
+        self.dtype = _merge_dtype(self.dtype, str(series.dtype))
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+
+        if self._ranged and not pd.api.types.is_bool_dtype(values):
+            try:
+                low, high = values.min(), values.max()
+                self.min = low if self.min is None else min(self.min, low)
+                self.max = high if self.max is None else max(self.max, high)
+            except TypeError:
+                # Tipos mezclados en la columna: no tiene rango
+                self._ranged = False
+                self.min = self.max = None
+
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        self._sketch = np.unique(np.concatenate([self._sketch, np.unique(hashes)[:SKETCH_SIZE]]))[:SKETCH_SIZE]
+
+    def distinct(self) -> Tuple[int, bool]:
+        """Cantidad de valores distintos: exacta si caben en el sketch, estimada si no."""
+        if len(self._sketch) < SKETCH_SIZE:
+            return len(self._sketch), True
+        kth = float(self._sketch[SKETCH_SIZE - 1]) + 1
+        return int((SKETCH_SIZE - 1) * (2.0 ** 64) / kth), False
+
+    def profile(self) -> ColumnProfile:
+        distinct, exact = self.distinct()
+        return ColumnProfile(
+            name=str(self.name),
+            dtype=self.dtype or "object",
+            nulls=self.nulls,
+            distinct=distinct,
+            distinct_exact=exact,
+            min=_short(self.min) if self.min is not None else None,
+            max=_short(self.max) if self.max is not None else None,
+        )
+
+
+class DatasetProfiler:
+    def __init__(self, chunk_rows: int, max_rows: int, sample_rows: int):
+        """
+        Args:
+            chunk_rows: Filas por bloque leído
+            max_rows: Filas máximas que se recorren por archivo
+            sample_rows: Filas de ejemplo que se incluyen en el perfil
+        """
+        self.chunk_rows = chunk_rows
+        self.max_rows = max_rows
+        self.sample_rows = sample_rows
+
+    @staticmethod
+    def supports(filename: str) -> bool:
+        extension = os.path.splitext(filename)[1].lower()
+        return pd is not None and (extension in CSV_SEPARATORS or (extension in PARQUET_EXTENSIONS and pq is not None))
+
+    def profile(self, path: str, filename: str) -> DatasetProfile:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in PARQUET_EXTENSIONS:
+            parquet = pq.ParquetFile(path, memory_map=True)
+            total_rows = parquet.metadata.num_rows
+            chunks = (batch.to_pandas() for batch in parquet.iter_batches(batch_size=self.chunk_rows))
+            file_format = "parquet"
+        else:
+            total_rows = None
+            chunks = pd.read_csv(
+                path, sep=CSV_SEPARATORS[extension], chunksize=self.chunk_rows,
+                low_memory=True, encoding_errors="replace", on_bad_lines="skip",
+            )
+            file_format = "csv"
+
+        columns, sample, scanned = self._scan(chunks)
+        return DatasetProfile(
+            filename=filename,
+            format=file_format,
+            rows=total_rows if total_rows is not None else scanned,
+            # Sin metadatos, un CSV recorrido hasta max_rows puede tener más filas
+            rows_exact=total_rows is not None or scanned < self.max_rows,
+            scanned_rows=scanned,
+            columns=[column.profile() for column in columns],
+            sample=sample,
+        )
+
+    def _scan(self, chunks: Iterator["pd.DataFrame"]) -> Tuple[List[ColumnAccumulator], List[List[str]], int]:
+        columns: List[ColumnAccumulator] = []
+        sample: List[List[str]] = []
+        scanned = 0
+        try:
+            for chunk in chunks:
+                if scanned + len(chunk) > self.max_rows:
+                    chunk = chunk.iloc[:self.max_rows - scanned]
+                if not columns:
+                    columns = [ColumnAccumulator(name) for name in chunk.columns]
+                    sample = [[_short(value) for value in row] for row in chunk.head(self.sample_rows).itertuples(index=False)]
+                for column in columns:
+                    if column.name in chunk:
+                        column.update(chunk[column.name])
+                scanned += len(chunk)
+                if scanned >= self.max_rows:
+                    break
+        finally:
+            # Cierra el lector de CSV si se cortó antes del final
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+        return columns, sample, scanned
+
+
+@singleton
+class DatasetProfileService:
+    """
+    Perfiles de los adjuntos, guardados por hash del archivo: en memoria (LRU)
+    y en UPLOAD_FOLDER/attachments/profiles para que los compartan los workers.
+    """
+    def __init__(self):
+        self.profiler = DatasetProfiler(
+            chunk_rows=settings.PROFILE_CHUNK_ROWS,
+            max_rows=settings.PROFILE_MAX_ROWS,
+            sample_rows=settings.PROFILE_SAMPLE_ROWS,
+        )
+        self.upload_service = UploadService()
+        self.profile_dir = os.path.join(self.upload_service.storage.root, "profiles")
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self._cache: "OrderedDict[str, DatasetProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def profile(self, digest: str, filename: str) -> Optional[DatasetProfile]:
+        """Perfil del adjunto con ese hash, o None si no es un dataset soportado."""
+        if not DatasetProfiler.supports(filename):
+            return None
+
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None:
+                self._cache.move_to_end(digest)
+                return cached
+
+        profile_path = os.path.join(self.profile_dir, f"{digest}.json")
+        if os.path.exists(profile_path):
+            with open(profile_path, "r", encoding="utf-8") as file:
+                profile = DatasetProfile.model_validate_json(file.read())
+        else:
+            path = self.upload_service.find(digest)
+            if not path:
+                return None
+            try:
+                profile = self.profiler.profile(path, filename)
+            except Exception as e:
+                logger.warning("No se pudo perfilar el adjunto %s: %s", filename, e)
+                return None
+            temp_path = f"{profile_path}.{threading.get_ident()}"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                file.write(profile.model_dump_json())
+            os.replace(temp_path, profile_path)
+
+        with self._lock:
+            self._cache[digest] = profile
+            while len(self._cache) > settings.PROFILE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return profile
+
+    async def build_context(self, attachments: Sequence) -> Optional[str]:
+        """
+        Texto con los perfiles de los adjuntos (los primeros PROFILE_MAX_DATASETS
+        distintos), o None si ninguno es un dataset.
+        """
+        seen = set()
+        targets = []
+        for attachment in attachments:
+            digest = attachment_digest(attachment.url)
+            if digest and digest not in seen and DatasetProfiler.supports(attachment.filename):
+                seen.add(digest)
+                targets.append((digest, attachment.filename))
+            if len(targets) >= settings.PROFILE_MAX_DATASETS:
+                break
+        if not targets:
+            return None
+
+        profiles = await asyncio.gather(*(asyncio.to_thread(self.profile, digest, filename) for digest, filename in targets))
+        sections = [profile.to_prompt() for profile in profiles if profile is not None]
+        return "\n\n".join(sections) if sections else None
@@ -1,8 +1,12 @@
 from .prompt_sys_manager import PromptSysManager
 from pydantic import BaseModel
-from typing import Dict, Optional, List
-from openai import OpenAI
-import time
+from typing import AsyncIterator, Dict, Hashable, Optional, List
+from openai import AsyncOpenAI
+from app.config.config import settings
+from .resilience import CircuitBreaker, RetryPolicy, call_with_retry
+from .completion_cache import completion_key, get_completion_cache
+import asyncio
+import httpx
 import json
 
 class ApiMessage(BaseModel):
@@ -19,109 +23,259 @@ class ApiResponse(BaseModel):
     title: Optional[str] = None
 
 
-class ChatGPTClient:
-    """Cliente para interactuar con la API de ChatGPT para generar sentencias ETL."""
-    
-    def __init__(self, api_key: str, model: str = "o4-mini", prompt_template_path: Optional[str] = None, conversion_history: List[ApiMessage] = [], base_prompt_json: Optional[Dict] = None, max_retries: int = 3, retry_delay: int = 2):
+class Conversation:
+    """Estado de una conversación: prompt del sistema e historial de mensajes."""
+
+    def __init__(self, history: Optional[List[ApiMessage]] = None, prompt_template_path: Optional[str] = None, base_prompt_json: Optional[Dict] = None):
         """
-        Inicializa el cliente de ChatGPT.
-        
+        Inicializa la conversación.
+
         Args:
-            api_key: La clave API de OpenAI
-            model: El modelo de OpenAI a utilizar (por defecto: gpt-4)
+            history: Historial previo de la conversación
             prompt_template_path: Ruta opcional al archivo de plantilla de prompt
+            base_prompt_json: Plantilla de prompt personalizada en memoria (opcional)
         """
-        self.client = OpenAI(api_key=api_key)
-        self.model = model
-        self.conversation_history = conversion_history
+        self.history: List = list(history) if history else []
         self.prompt_template_path = prompt_template_path
-        self.base_prompt_json = base_prompt_json 
-        self.max_retries = max_retries
-        self.retry_delay = retry_delay
-        
-    def initialize_conversation(self, scheme: str = None):
+        self.base_prompt_json = base_prompt_json
+
+    def initialize(self, scheme: str = None, scheme_id: Optional[str] = None, scheme_version: Optional[Hashable] = None, datasets: Optional[str] = None):
         """
-        Inicializa la conversación con el prompt del sistema y ejemplos.
-        
+        Inicializa la conversación con el prompt del sistema.
+
         Args:
-            schema: Esquema de base de datos analizado (opcional)
+            scheme: Esquema de base de datos (opcional)
+            scheme_id: Identificador del esquema, usado para reutilizar el prompt compilado
+            scheme_version: Versión del texto del esquema (opcional), ver PromptSysManager.get_system_prompt
+            datasets: Perfil de los datasets adjuntos (opcional), se agrega tras el esquema
         """
+        if self.base_prompt_json:
+            # Plantilla personalizada en memoria: se arma en el momento
+            system_prompt = PromptSysManager.json_to_system_prompt(self.base_prompt_json)
+            if scheme:
+                system_prompt += f"\n\nEsquema de base de datos:\n{scheme}"
+        else:
+            system_prompt = PromptSysManager.get_system_prompt(
+                scheme=scheme,
+                scheme_id=scheme_id,
+                scheme_version=scheme_version,
+                template_path=self.prompt_template_path
+            )
 
-        if not self.base_prompt_json:
-            raise ValueError("There is no prompt template loaded.")
+        # Fuera del prompt compilado: los adjuntos cambian en cada chat
+        if datasets:
+            system_prompt += f"\n\nDatos adjuntos:\n{datasets}"
 
-        # Personaliza el prompt si hay un esquema
-        prompt_json = self.base_prompt_json
-
-        # Convierte el JSON a texto para el prompt del sistema
-        system_prompt = PromptSysManager.json_to_system_prompt(prompt_json)
-
-        if scheme:
-            # Si se proporciona un esquema, lo agrega al prompt
-            system_prompt += f"\n\nEsquema de base de datos:\n{scheme}"
-        
-        
         # Agrega el prompt del sistema
-        self.conversation_history.insert(0, {
+        self.history.insert(0, {
             "role": "system",
             "content": system_prompt
         })
 
-        return self.conversation_history
-        
-    def send_message(self, message: ApiMessage, title: bool) -> ApiResponse:
+        return self.history
+
+    def add_user_message(self, message: ApiMessage, title: bool):
+        """Agrega el mensaje del usuario al historial, pidiendo un título si corresponde."""
+        content = message.content
+        if title:
+            content += f"\nAl formato de respuesta agrega el campo 'title', cuyo valor sera una frase muy corta que defina el contexto de la conversacion."
+
+        self.history.append({"role": "user", "content": content })
+
+    def add_assistant_message(self, content: str):
+        """Agrega la respuesta del modelo al historial."""
+        self.history.append({"role": "assistant", "content": content})
+
+    def clear(self):
+        """Limpia el historial de la conversación."""
+        self.history = []
+
+
+class ChatGPTClient:
+    """
+    Cliente para interactuar con la API de ChatGPT para generar sentencias ETL.
+
+    Se crea una sola vez por proceso y comparte su pool de conexiones HTTP entre
+    todas las conversaciones; el estado de cada conversación vive en Conversation.
+    """
+
+    def __init__(self, api_key: str, model: str = "o4-mini", retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None, max_connections: int = 100, max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0, timeout: float = 120.0):
+        """
+        Inicializa el cliente de ChatGPT.
+
+        Args:
+            api_key: La clave API de OpenAI
+            model: El modelo de OpenAI a utilizar (por defecto: o4-mini)
+            retry_policy: Política de reintentos y plazos de cada llamada
+            circuit_breaker: Circuito compartido que corta las llamadas si el proveedor falla
+            max_connections: Conexiones simultáneas máximas del pool HTTP
+            max_keepalive_connections: Conexiones ociosas que se mantienen abiertas
+            keepalive_expiry: Segundos que una conexión ociosa se mantiene abierta
+            timeout: Tiempo máximo en segundos de cada solicitud
+        """
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=timeout,
+        )
+        # Los reintentos los gestiona call_with_retry, no el SDK
+        self.async_client = AsyncOpenAI(api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.model = model
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+    async def send_message(self, conversation: Conversation, message: ApiMessage, title: bool) -> ApiResponse:
         """
         Envía un mensaje a ChatGPT y obtiene la respuesta.
-        
+
         Args:
+            conversation: Conversación a la que pertenece el mensaje
             message: El mensaje para enviar a ChatGPT
-            schema: Esquema de base de datos analizado (opcional)
-            
+            title: Si se debe solicitar un título para la conversación
+
         Returns:
             La respuesta generada por ChatGPT
-        """        
-        # Agrega el mensaje del usuario a la conversación
-        
-        content = message.content
-        if title:
-            content += f"\nAl formato de respuesta agrega el campo 'title', cuyo valor sera una frase muy corta que defina el contexto de la conversacion."
-        
-        self.conversation_history.append({"role": "user", "content": content })
-                
-        for attempt in range(self.max_retries):
+        """
+        conversation.add_user_message(message, title)
+
+        cache = get_completion_cache()
+        cache_key = completion_key(self.model, conversation.history) if cache else None
+        cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            conversation.add_assistant_message(cached)
+            return self.parse_response(cached)
+
+        response = await call_with_retry(
+            lambda: self.async_client.chat.completions.create(
+                model=self.model,
+                messages=conversation.history,
+            ),
+            self.retry_policy,
+            self.circuit_breaker,
+        )
+
+        assistant_response = response.choices[0].message.content
+        conversation.add_assistant_message(assistant_response)
+        parsed = self.parse_response(assistant_response)
+        if cache:
+            # Solo se guardan respuestas que se pudieron interpretar
+            cache.set(cache_key, assistant_response)
+        return parsed
+
+    async def stream_message(self, conversation: Conversation, message: ApiMessage, title: bool) -> AsyncIterator[str]:
+        """
+        Envía un mensaje a ChatGPT y devuelve los tokens a medida que se generan.
+
+        Args:
+            conversation: Conversación a la que pertenece el mensaje
+            message: El mensaje para enviar a ChatGPT
+            title: Si se debe solicitar un título para la conversación
+
+        Yields:
+            Fragmentos de texto de la respuesta del modelo
+        """
+        conversation.add_user_message(message, title)
+
+        cache = get_completion_cache()
+        cache_key = completion_key(self.model, conversation.history) if cache else None
+        cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            conversation.add_assistant_message(cached)
+            yield cached
+            return
+
+        # Solo se reintenta la apertura del stream; una vez emitidos tokens no se pueden repetir
+        stream = await call_with_retry(
+            lambda: self.async_client.chat.completions.create(
+                model=self.model,
+                messages=conversation.history,
+                stream=True,
+            ),
+            self.retry_policy,
+            self.circuit_breaker,
+        )
+
+        parts: List[str] = []
+        chunks = stream.__aiter__()
+        while True:
             try:
-                # Usa la biblioteca de OpenAI para hacer la solicitud
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=self.conversation_history,
-                )
-                
-                # Obtiene la respuesta
-                assistant_response = response.choices[0].message.content
-                
-                # Agrega la respuesta al historial
-                self.conversation_history.append({"role": "assistant", "content": assistant_response})
-
-
-                response_json = json.loads(assistant_response)
-
-                return ApiResponse(
-                    content_analysis=response_json.get("analysis"),
-                    content_comment=response_json.get("comment"),
-                    content_code=response_json.get("code"),
-                    content_executable_code=response_json.get("executable_code"),
-                    title=response_json.get("title")
-                )
-                
-            except Exception as e:
-                if attempt == self.max_retries - 1:
-                    raise Exception(f"Error al comunicarse con la API después de {self.max_retries} intentos: {str(e)}")
-                
-                # Espera con backoff exponencial
-                time.sleep(self.retry_delay * (2 ** attempt))
-    
-    def clear_conversation(self):
-        """Limpia el historial de la conversación."""
-        self.conversation_history = []
-    
+                # Un stream que deja de enviar tokens no debe retener el worker indefinidamente
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.retry_policy.attempt_timeout)
+            except StopAsyncIteration:
+                break
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        assistant_response = "".join(parts)
+        conversation.add_assistant_message(assistant_response)
+        if cache and self._is_valid_response(assistant_response):
+            cache.set(cache_key, assistant_response)
+
+    @staticmethod
+    def _is_valid_response(assistant_response: str) -> bool:
+        try:
+            json.loads(assistant_response)
+        except ValueError:
+            return False
+        return True
+
+    @staticmethod
+    def parse_response(assistant_response: str) -> ApiResponse:
+        """Convierte el json_string devuelto por el modelo en ApiResponse."""
+        response_json = json.loads(assistant_response)
+
+        return ApiResponse(
+            content_analysis=response_json.get("analysis"),
+            content_comment=response_json.get("comment"),
+            content_code=response_json.get("code"),
+            content_executable_code=response_json.get("executable_code"),
+            title=response_json.get("title")
+        )
+
+    async def close(self):
+        """Cierra el pool de conexiones HTTP."""
+        await self.async_client.close()
+
+
+_chatgpt_client: Optional[ChatGPTClient] = None
+
+
+def get_chatgpt_client() -> ChatGPTClient:
+    """Devuelve el cliente compartido del proceso, creándolo si todavía no existe."""
+    global _chatgpt_client
+    if _chatgpt_client is None:
+        _chatgpt_client = ChatGPTClient(
+            api_key=settings.OPENAI_API_KEY,
+            model=settings.MODEL_NAME,
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+            timeout=settings.OPENAI_TIMEOUT,
+            retry_policy=RetryPolicy(
+                max_attempts=settings.LLM_MAX_ATTEMPTS,
+                base_delay=settings.LLM_RETRY_BASE_DELAY,
+                max_delay=settings.LLM_RETRY_MAX_DELAY,
+                attempt_timeout=settings.LLM_ATTEMPT_TIMEOUT,
+                total_timeout=settings.LLM_TOTAL_TIMEOUT,
+            ),
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.LLM_BREAKER_RESET_TIMEOUT,
+            ),
+        )
+    return _chatgpt_client
+
 
+async def close_chatgpt_client():
+    """Cierra el cliente compartido al apagar la aplicación."""
+    global _chatgpt_client
+    if _chatgpt_client is not None:
+        await _chatgpt_client.close()
+        _chatgpt_client = None
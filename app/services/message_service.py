@@ -1,57 +1,102 @@
-from typing import Union, List
+from typing import AsyncIterator, Optional, Tuple, Union, List
 from sqlalchemy.orm import Session
-from app.models.schemas.message import MessageCreate, MessageUpdate, MultiMessage, MessageBase, DeleteMessage, MessageWithAttachment, ListMessage, ContentAi
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.schemas.message import MessageCreate, MessageUpdate, MultiMessage, MessageBase, DeleteMessage, MessageWithAttachment, ContentAi, ContentUser
 from app.models.schemas.chat import ChatUpdate
 from app.repositories.message_repository import MessageRepository
+from app.repositories.async_base import AsyncRepository
 from .attachment_service import AttachmentService
 from .scheme_service import SchemeService
 from .chat_service import ChatService
-from .prompt_sys_manager import PromptSysManager
-from .iaclient import ChatGPTClient, ApiMessage
+from .resilience import CircuitOpenError
+from .iaclient import ChatGPTClient, ApiMessage, ApiResponse, Conversation, get_chatgpt_client
+from .context_builder import ContextWindowBuilder, TokenCounter
+from .code_runner import get_code_runner
+from .dataset_profiler import DatasetProfileService
 from app.config.config import settings
-from app.utils.utils import content_ai_to_string
+from app.db.unit_of_work import commit_async, rollback_async
+from app.utils.utils import sse_event
+from app.utils.json_stream import JsonFieldStreamParser
+from app.utils.singleton import singleton
 
+# Campos del json_string del modelo que se emiten durante el streaming
+STREAM_FIELDS = {
+    "analysis": "content_analysis",
+    "comment": "content_comment",
+    "code": "content_code",
+    "executable_code": "content_executable_code",
+    "title": "title",
+}
 
+# Mensajes previos del historial que se suman al mensaje actual para elegir las tablas del esquema
+SCHEMA_QUERY_HISTORY = 2
+
+
+@singleton
 class MessageService:
     def __init__(self):
         self.repository = MessageRepository()
+        self.async_repository = AsyncRepository(self.repository)
         self.scheme_service = SchemeService()
         self.attachment_service = AttachmentService()
         self.chat_service = ChatService()
+        self.dataset_profile_service = DatasetProfileService()
+        self.context_builder = ContextWindowBuilder(
+            counter=TokenCounter(settings.MODEL_NAME),
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            recent_messages=settings.CONTEXT_RECENT_MESSAGES,
+            truncate_chars=settings.CONTEXT_TRUNCATE_CHARS,
+        )
     
     def get(self, db: Session, *, id: int) -> MessageBase:
         return self.repository.get(db, id=id)
     
+    async def get_async(self, db: AsyncSession, *, id: int) -> MessageBase:
+        return await self.async_repository.get(db, id=id)
+    
     def get_by_user_id(self, db: Session, *, user_id: str) -> MultiMessage:
         return self.repository.get_by_user_id(db, user_id=user_id)
+
+    async def get_by_user_id_async(self, db: AsyncSession, *, user_id: str) -> MultiMessage:
+        return await self.async_repository.get_by_user_id(db, user_id=user_id)
     
     def get_by_chat_id(self, db: Session, *, chat_id: str, limit: int = 10, skip: int = 0) -> MultiMessage:
         return self.repository.get_by_chat_id(db, chat_id=chat_id, limit=limit, skip=skip)
     
     def get_multi(self, db: Session, *, limit = 100, skip = 0) -> MultiMessage:
         return self.repository.get_multi(db, limit=limit, skip=skip)
+
+    def get_multi_raw(self, db: Session, *, limit: int = 100, skip: int = 0) -> str:
+        return self.repository.get_multi_raw(db, limit=limit, skip=skip)
+
+    def get_multi_keyset(self, db: Session, *, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiMessage:
+        return self.repository.get_multi_keyset(db, limit=limit, cursor=cursor, total_mode=total_mode)
     
-    def get_all_with_attachments_by_chat_id(self, db: Session, *, chat_id: str) -> MultiMessage:
-        return self.repository.get_all_with_attachments_by_chat_id(db, chat_id=chat_id)
+    def get_all_with_attachments_by_chat_id(self, db: Session, *, chat_id: str, limit: int = 10, skip: int = 0) -> MultiMessage:
+        return self.repository.get_all_with_attachments_by_chat_id(db, chat_id=chat_id, limit=limit, skip=skip)
+
+    async def get_all_with_attachments_by_chat_id_async(self, db: AsyncSession, *, chat_id: str, limit: int = 10, skip: int = 0) -> MultiMessage:
+        return await self.async_repository.get_all_with_attachments_by_chat_id(db, chat_id=chat_id, limit=limit, skip=skip)
+
+    def get_by_chat_id_keyset(self, db: Session, *, chat_id: str, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiMessage:
+        return self.repository.get_by_chat_id_keyset(db, chat_id=chat_id, limit=limit, cursor=cursor, total_mode=total_mode)
+
+    async def get_by_chat_id_keyset_async(self, db: AsyncSession, *, chat_id: str, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiMessage:
+        return await self.async_repository.get_by_chat_id_keyset(db, chat_id=chat_id, limit=limit, cursor=cursor, total_mode=total_mode)
     
     def create(self, db: Session, *, obj_in: MessageCreate) -> Union[MessageBase, MessageWithAttachment]:
 
+        # El mensaje y sus adjuntos se insertan en una sola llamada
         new_message = self.repository.create(db, obj_in=obj_in)
         if not new_message:
             raise Exception("Message not created")
-        
-        if (obj_in.attachments and len(obj_in.attachments) > 0):
-            # Validate attachments
-            new_message.attachments = []
+        return new_message
 
-            for attachment in obj_in.attachments:
-                new_attachment = self.attachment_service.create(db, obj_in=attachment)
-                if not new_attachment:
-                    raise Exception("Attachment not created")
-                new_message.attachments.append(new_attachment)
+    async def create_async(self, db: Session, *, obj_in: MessageCreate) -> Union[MessageBase, MessageWithAttachment]:
 
-            return MessageWithAttachment(**new_message.model_dump(), attachments=new_message.attachments)
-        
+        new_message = await self.async_repository.create(db, obj_in=obj_in)
+        if not new_message:
+            raise Exception("Message not created")
         return new_message
     
     def update(self, db: Session, *, obj_in: MessageUpdate) -> MessageBase:
@@ -62,33 +107,104 @@ class MessageService:
         # Update the fields of db_obj with the values from obj_in
         return self.repository.update(db, db_obj=db_obj, obj_in=obj_in)
 
-    def send_message(self, db: Session, *, obj_in: MessageCreate) -> MessageBase:
-
-        history_data = self.repository.get_full_messages_by_chat_id(db, chat_id=obj_in.chat_id)
-        history: List[ApiMessage] = []
-        print("History Data:", history_data.data)
-        for message in history_data.data:
-            history.append(
-                ApiMessage(
-                    role="assistant" if message.role == "ai"  else message.role,
-                    content=message.content.content if message.role == "user" else content_ai_to_string(message.content),
-                )
-            )
+    async def send_message_async(self, db: Session, *, obj_in: MessageCreate) -> MessageBase:
+        """
+        Envía el mensaje al modelo y guarda la respuesta: las consultas se ejecutan
+        en el threadpool y la llamada al modelo se espera sin bloquear el event loop.
+        """
+        conversation, title = await self._prepare_conversation_async(db, obj_in=obj_in)
 
-        aiclient = ChatGPTClient(
-            api_key=settings.OPENAI_API_KEY,
-            model=settings.MODEL_NAME,
-            conversion_history=history,
-            base_prompt_json=PromptSysManager.load_prompt_template()
+        ai_response = await get_chatgpt_client().send_message(
+            conversation=conversation,
+            message=ApiMessage(
+                role="user",
+                content=obj_in.content.content,
+            ),
+            title=title
         )
 
-        scheme = self.scheme_service.get_by_chat_id(db, chat_id=obj_in.chat_id).data[0]  
-        if scheme:
-            history = aiclient.initialize_conversation(scheme=scheme.content)
+        return await self._persist_ai_response_async(db, chat_id=obj_in.chat_id, ai_response=ai_response)
+
+    async def stream_message(self, db: Session, *, obj_in: MessageCreate) -> AsyncIterator[str]:
+        """
+        Envía el mensaje al modelo y emite la respuesta como eventos SSE.
+
+        Emite eventos 'delta' con el texto decodificado de cada campo a medida que
+        se genera, un evento 'message' con el mensaje guardado al terminar y un
+        evento 'error' si algo falla. El evento 'message' se emite después del
+        COMMIT; si algo falla se revierte lo que no se confirmó (el título del
+        chat no queda guardado sin la respuesta).
+        """
+        try:
+            conversation, title = await self._prepare_conversation_async(db, obj_in=obj_in)
+
+            parser = JsonFieldStreamParser(STREAM_FIELDS)
+            parts: List[str] = []
+            async for token in get_chatgpt_client().stream_message(
+                conversation=conversation,
+                message=ApiMessage(
+                    role="user",
+                    content=obj_in.content.content,
+                ),
+                title=title
+            ):
+                parts.append(token)
+                for field, delta in parser.feed(token):
+                    yield sse_event("delta", {"field": field, "delta": delta})
+
+            try:
+                ai_response = ChatGPTClient.parse_response("".join(parts))
+            except ValueError:
+                # Respuesta incompleta o mal formada: se guarda lo que se pudo decodificar
+                ai_response = ApiResponse(**parser.values)
+
+            ai_message = await self._persist_ai_response_async(db, chat_id=obj_in.chat_id, ai_response=ai_response)
+            await commit_async(db)
+            yield sse_event("message", ai_message.model_dump(mode="json"))
+        except CircuitOpenError as e:
+            await rollback_async(db)
+            yield sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            await rollback_async(db)
+            yield sse_event("error", {"detail": str(e)})
+
+    async def run_executable_code(self, *, message: MessageBase) -> AsyncIterator[str]:
+        """
+        Ejecuta el código ejecutable del mensaje en el pool aislado y emite la
+        salida como eventos SSE: 'stdout' y 'stderr' a medida que se produce y
+        'exit' al terminar.
+        """
+        try:
+            async for event, data in get_code_runner().run(message.content.content_executable_code):
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    async def _prepare_conversation_async(self, db: Session, *, obj_in: MessageCreate) -> Tuple[Conversation, bool]:
+        """
+        Carga el historial y el esquema del chat, guarda el mensaje del usuario y
+        devuelve la conversación lista junto con si se debe pedir un título.
+        """
+        history_data = await self.async_repository.get_full_messages_by_chat_id(db, chat_id=obj_in.chat_id)
+        messages = history_data.data if history_data else []
+
+        conversation = Conversation()
+
+        schemes = await self.scheme_service.get_by_chat_id_async(db, chat_id=obj_in.chat_id)
+        datasets = await self._dataset_context_async(db, messages=messages, obj_in=obj_in)
+        if schemes and schemes.data:
+            scheme = schemes.data[0]
+            scheme_text, scheme_version = await self.scheme_service.prompt_text_async(db, scheme=scheme, query=self._schema_query(obj_in, messages))
+            system = conversation.initialize(scheme=scheme_text, scheme_id=scheme.id, scheme_version=scheme_version, datasets=datasets)
         else:
-            history = aiclient.initialize_conversation()
-        
-        self.create(
+            system = conversation.initialize(datasets=datasets)
+
+        # Solo se envía la parte del historial que entra en el presupuesto de tokens
+        counter = self.context_builder.counter
+        reserved_tokens = counter.count(system[0]["content"]) + counter.count(obj_in.content.content)
+        conversation.history.extend(self.context_builder.build(messages, reserved_tokens=reserved_tokens))
+
+        await self.create_async(
             db=db,
             obj_in=MessageCreate(
                 chat_id=obj_in.chat_id,
@@ -96,28 +212,57 @@ class MessageService:
                 content=obj_in.content,
             )
         )
+        # El mensaje del usuario queda guardado aunque la llamada al modelo falle,
+        # y la transacción no queda abierta mientras se espera la respuesta
+        await commit_async(db)
 
-        ai_response = aiclient.send_message(
-            message=ApiMessage(
-                role="user",
-                content=obj_in.content.content,
-            ),
-            title= len(history) == 1
-        )
+        return conversation, len(messages) == 0
+
+    @staticmethod
+    def _schema_query(obj_in: MessageCreate, messages: List) -> str:
+        """
+        Texto con el que se eligen las tablas del esquema: el mensaje actual y los
+        últimos del historial (del modelo, su código), para que las preguntas de
+        seguimiento conserven las tablas de las que se venía hablando.
+        """
+        parts = [obj_in.content.content or ""]
+        for message in sorted(messages, key=lambda message: message.created_at)[-SCHEMA_QUERY_HISTORY:]:
+            content = message.content
+            parts.append((content.content if isinstance(content, ContentUser) else content.content_code) or "")
+        return "\n".join(parts)
 
+    async def _dataset_context_async(self, db: Session, *, messages: List, obj_in: MessageCreate) -> Optional[str]:
+        """
+        Perfil de los datasets adjuntos al chat, empezando por los del mensaje
+        actual y siguiendo por los más recientes del historial (cuyos adjuntos
+        se guardan en la caché junto al historial).
+        """
+        attachments = list(obj_in.attachments or [])
+        if messages:
+            by_message = await self.attachment_service.get_by_chat_history_async(
+                db, chat_id=obj_in.chat_id, message_ids=[message.id for message in messages]
+            )
+            for message in sorted(messages, key=lambda message: message.created_at, reverse=True):
+                attachments.extend(by_message.get(str(message.id), []))
+        if not attachments:
+            return None
+        return await self.dataset_profile_service.build_context(attachments)
+
+    async def _persist_ai_response_async(self, db: Session, *, chat_id: str, ai_response: ApiResponse) -> MessageBase:
+        """Actualiza el título del chat si llegó uno y guarda la respuesta del modelo."""
         if ai_response.title:
-            self.chat_service.update(
+            await self.chat_service.update_async(
                 db=db,
                 obj_in=ChatUpdate(
-                    id=obj_in.chat_id,
+                    id=chat_id,
                     name_chat=ai_response.title
                 )
             )
 
-        ai_message = self.create(
+        return await self.create_async(
             db=db,
             obj_in=MessageCreate(
-                chat_id=obj_in.chat_id,
+                chat_id=chat_id,
                 role="ai",
                 content=ContentAi(
                     content_analysis=ai_response.content_analysis,
@@ -127,7 +272,3 @@ class MessageService:
                 )
             )
         )
-
-        return ai_message
-
-    
\ No newline at end of file
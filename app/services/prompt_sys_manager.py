@@ -1,7 +1,73 @@
-from typing import Dict, Optional
+from typing import Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import copy
+import hashlib
 import json
+import os
+import threading
 from pathlib import Path
 
+from app.config.config import settings
+
+# Prompt predeterminado estructurado en formato JSON
+DEFAULT_PROMPT_TEMPLATE: Dict = {
+    "role": "etl_assistant",
+    "description": "Asistente especializado en ETL (Extract, Transform, Load) para bases de datos",
+    "capabilities": [
+        "Analizar esquemas de bases de datos",
+        "Diseñar flujos ETL eficientes",
+        "Generar código SQL, Python o herramientas ETL específicas",
+        "Optimizar procesos de carga y transformación",
+        "Resolver problemas comunes en ETL"
+    ],
+    "guidelines": {
+        "schema_analysis": [
+            "Identifica tablas principales y sus relaciones",
+            "Detecta tablas de hechos y dimensiones si aplica",
+            "Analiza tipos de datos y posibles transformaciones necesarias",
+            "Considera la integridad referencial",
+            "Identifica campos clave para uniones y agregaciones"
+        ],
+        "code_generation": [
+            "Prioriza optimización de rendimiento y recursos",
+            "Incluye manejo de errores y validación de datos",
+            "Considera volúmenes de datos y escalabilidad",
+            "Documenta cada paso del proceso ETL",
+            "Genera código limpio, mantenible y bien comentado",
+            "El proceso ETL puede ser en SQL, Python o herramientas ETL como Airflow, Talend, etc.",
+            "El codigo debe tener solo al inicio un tag que indique el lenguaje de programación, por ejemplo: %sql%, %python%, etc.",
+        ]
+    },
+    "response_format": {
+        "description": "Estructura tus respuestas en un json_string con analysis, comment, code; en caso se requiera, genera un campo adicional title",
+        "keys": [
+            {"key": "analysis", "value": "Comprensión del problema o esquema"},
+            {"key": "comment", "value": "Comentarios sobre la resolución propuesta"},
+            {"key": "code", "value": "Implementación en SQL/Python/etc. "},
+            {"key": "title", "value": "Título opcional sobre la conversación presente"}
+        ]
+    },
+    "constraints": [
+        "No asumas información que no esté en el esquema o la solicitud",
+        "Si falta información crítica, haz preguntas específicas",
+        "Sigue las mejores prácticas según el motor de base de datos mencionado",
+        "Considera siempre la seguridad y la calidad de los datos",
+        "No generes código que pueda causar pérdida de datos o corrupción",
+        "No generes código que no sea seguro o que pueda causar problemas de rendimiento",
+        "No generes código que escriba o elimine datos del sistema de archivos",
+    ],
+    "etl_tools": [
+        "SQL", "Python", "Airflow", "Talend", "SSIS", "Informatica", 
+        "dbt", "Spark", "AWS Glue", "Azure Data Factory"
+    ]
+}
+
+# Prompts compilados por (plantilla, esquema, versión del texto del esquema) -> prompt
+_compiled_prompts: "OrderedDict[Tuple, str]" = OrderedDict()
+# Plantillas leídas de disco por ruta -> (mtime, plantilla)
+_template_files: Dict[str, Tuple[int, Dict]] = {}
+_lock = threading.Lock()
+
 class PromptSysManager:
     """Gestiona los prompts para el asistente ETL."""
     
@@ -17,61 +83,9 @@ class PromptSysManager:
             Diccionario con la estructura del prompt
         """
         if template_path and Path(template_path).exists():
-            with open(template_path, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        
-        # Prompt predeterminado estructurado en formato JSON
-        return {
-            "role": "etl_assistant",
-            "description": "Asistente especializado en ETL (Extract, Transform, Load) para bases de datos",
-            "capabilities": [
-                "Analizar esquemas de bases de datos",
-                "Diseñar flujos ETL eficientes",
-                "Generar código SQL, Python o herramientas ETL específicas",
-                "Optimizar procesos de carga y transformación",
-                "Resolver problemas comunes en ETL"
-            ],
-            "guidelines": {
-                "schema_analysis": [
-                    "Identifica tablas principales y sus relaciones",
-                    "Detecta tablas de hechos y dimensiones si aplica",
-                    "Analiza tipos de datos y posibles transformaciones necesarias",
-                    "Considera la integridad referencial",
-                    "Identifica campos clave para uniones y agregaciones"
-                ],
-                "code_generation": [
-                    "Prioriza optimización de rendimiento y recursos",
-                    "Incluye manejo de errores y validación de datos",
-                    "Considera volúmenes de datos y escalabilidad",
-                    "Documenta cada paso del proceso ETL",
-                    "Genera código limpio, mantenible y bien comentado",
-                    "El proceso ETL puede ser en SQL, Python o herramientas ETL como Airflow, Talend, etc.",
-                    "El codigo debe tener solo al inicio un tag que indique el lenguaje de programación, por ejemplo: %sql%, %python%, etc.",
-                ]
-            },
-            "response_format": {
-                "description": "Estructura tus respuestas en un json_string con analysis, comment, code; en caso se requiera, genera un campo adicional title",
-                "keys": [
-                    {"key": "analysis", "value": "Comprensión del problema o esquema"},
-                    {"key": "comment", "value": "Comentarios sobre la resolución propuesta"},
-                    {"key": "code", "value": "Implementación en SQL/Python/etc. "},
-                    {"key": "title", "value": "Título opcional sobre la conversación presente"}
-                ]
-            },
-            "constraints": [
-                "No asumas información que no esté en el esquema o la solicitud",
-                "Si falta información crítica, haz preguntas específicas",
-                "Sigue las mejores prácticas según el motor de base de datos mencionado",
-                "Considera siempre la seguridad y la calidad de los datos",
-                "No generes código que pueda causar pérdida de datos o corrupción",
-                "No generes código que no sea seguro o que pueda causar problemas de rendimiento",
-                "No generes código que escriba o elimine datos del sistema de archivos",
-            ],
-            "etl_tools": [
-                "SQL", "Python", "Airflow", "Talend", "SSIS", "Informatica", 
-                "dbt", "Spark", "AWS Glue", "Azure Data Factory"
-            ]
-        }
+            return copy.deepcopy(PromptSysManager._load_template_file(template_path))
+
+        return copy.deepcopy(DEFAULT_PROMPT_TEMPLATE)
     
     @staticmethod
     def json_to_system_prompt(prompt_json: Dict) -> str:
@@ -84,41 +98,113 @@ class PromptSysManager:
         Returns:
             Texto del prompt formateado
         """
-        prompt_text = f"# {prompt_json['role'].upper()}\n"
-        prompt_text += f"{prompt_json['description']}\n\n"
-        
-        # Capacidades
-        prompt_text += "## Capacidades\n"
-        for capability in prompt_json['capabilities']:
-            prompt_text += f"- {capability}\n"
-        prompt_text += "\n"
-        
-        # Directrices para análisis de esquemas
-        prompt_text += "## Directrices para Análisis de Esquemas\n"
-        for guideline in prompt_json['guidelines']['schema_analysis']:
-            prompt_text += f"- {guideline}\n"
-        prompt_text += "\n"
-        
-        # Directrices para generación de código
-        prompt_text += "## Directrices para Generación de Código\n"
-        for guideline in prompt_json['guidelines']['code_generation']:
-            prompt_text += f"- {guideline}\n"
-        prompt_text += "\n"
-        
-        # Formato de respuestas
-        prompt_text += "## Formato de Respuestas\n"
-        prompt_text += prompt_json['response_format']['description'] + "\n"
-        for section in prompt_json['response_format']['keys']:
-            prompt_text += f"- **{section['key']}**: {section['value']}\n"
-        prompt_text += "\n"
-        
-        # Restricciones
-        prompt_text += "## Restricciones\n"
-        for constraint in prompt_json['constraints']:
-            prompt_text += f"- {constraint}\n"
-        prompt_text += "\n"
+        lines = [
+            f"# {prompt_json['role'].upper()}",
+            prompt_json['description'],
+            "",
+            # Capacidades
+            "## Capacidades",
+            *(f"- {capability}" for capability in prompt_json['capabilities']),
+            "",
+            # Directrices para análisis de esquemas
+            "## Directrices para Análisis de Esquemas",
+            *(f"- {guideline}" for guideline in prompt_json['guidelines']['schema_analysis']),
+            "",
+            # Directrices para generación de código
+            "## Directrices para Generación de Código",
+            *(f"- {guideline}" for guideline in prompt_json['guidelines']['code_generation']),
+            "",
+            # Formato de respuestas
+            "## Formato de Respuestas",
+            prompt_json['response_format']['description'],
+            *(f"- **{section['key']}**: {section['value']}" for section in prompt_json['response_format']['keys']),
+            "",
+            # Restricciones
+            "## Restricciones",
+            *(f"- {constraint}" for constraint in prompt_json['constraints']),
+            "",
+            "## Herramientas ETL Soportadas",
+            ", ".join(prompt_json['etl_tools']),
+        ]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _load_template_file(template_path: str) -> Dict:
+        """Lee y parsea el archivo de plantilla solo si cambió desde la última lectura."""
+        mtime = os.stat(template_path).st_mtime_ns
+        with _lock:
+            cached = _template_files.get(template_path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        with open(template_path, 'r', encoding='utf-8') as file:
+            template = json.load(file)
+
+        with _lock:
+            _template_files[template_path] = (mtime, template)
+        return template
+
+    @staticmethod
+    def get_system_prompt(
+        scheme: Optional[str] = None, scheme_id: Optional[Hashable] = None, template_path: Optional[str] = None,
+        scheme_version: Optional[Hashable] = None,
+    ) -> str:
+        """
+        Devuelve el prompt del sistema ya compilado para la plantilla y el esquema.
         
-        prompt_text += "## Herramientas ETL Soportadas\n"
-        prompt_text += ", ".join(prompt_json['etl_tools']) + "\n"
+        El resultado se guarda por identidad de plantilla (ruta y fecha de
+        modificación), por esquema y por versión del texto del esquema, de modo
+        que en cada mensaje solo se arma el prompt si alguno cambió. Cada recorte
+        del esquema (las tablas elegidas para la consulta) tiene su propia entrada.
         
-        return prompt_text
+        Args:
+            scheme: Contenido del esquema de base de datos (opcional)
+            scheme_id: Identificador del esquema usado como clave de caché
+            template_path: Ruta opcional al archivo de plantilla
+            scheme_version: Identifica el texto de scheme (por ejemplo, hash del
+                esquema y tablas elegidas); si no se indica se usa una huella del texto
+            
+        Returns:
+            Texto del prompt del sistema
+        """
+        if template_path and Path(template_path).exists():
+            template_key = (template_path, os.stat(template_path).st_mtime_ns)
+        else:
+            template_path = None
+            template_key = None
+
+        if scheme_version is None and scheme:
+            # Sin versión, la huella detecta esquemas actualizados en otros procesos o sin id
+            scheme_version = hashlib.sha1(scheme.encode("utf-8")).digest()
+        key = (template_key, str(scheme_id) if scheme_id is not None else None, scheme_version)
+
+        with _lock:
+            cached = _compiled_prompts.get(key)
+            if cached is not None:
+                _compiled_prompts.move_to_end(key)
+                return cached
+
+        if template_path:
+            template = PromptSysManager._load_template_file(template_path)
+        else:
+            template = DEFAULT_PROMPT_TEMPLATE
+
+        system_prompt = PromptSysManager.json_to_system_prompt(template)
+        if scheme:
+            system_prompt += f"\n\nEsquema de base de datos:\n{scheme}"
+
+        with _lock:
+            _compiled_prompts[key] = system_prompt
+            _compiled_prompts.move_to_end(key)
+            while len(_compiled_prompts) > settings.PROMPT_CACHE_SIZE:
+                _compiled_prompts.popitem(last=False)
+
+        return system_prompt
+
+    @staticmethod
+    def invalidate_scheme(scheme_id: Hashable):
+        """Descarta los prompts compilados para un esquema actualizado o eliminado."""
+        scheme_key = str(scheme_id)
+        with _lock:
+            for key in [key for key in _compiled_prompts if key[1] == scheme_key]:
+                del _compiled_prompts[key]
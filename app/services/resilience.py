@@ -0,0 +1,173 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import openai
+
+from app.config.log import logger
+
+T = TypeVar("T")
+
+# Códigos HTTP que indican un problema transitorio del proveedor
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Se lanza cuando el circuito está abierto y la llamada se rechaza sin intentarla."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"El servicio del modelo no está disponible, reintente en {retry_after:.0f} segundos")
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """Parámetros de reintento y plazos para las llamadas al modelo."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0, attempt_timeout: float = 60.0, total_timeout: float = 150.0):
+        """
+        Args:
+            max_attempts: Cantidad máxima de intentos
+            base_delay: Espera base en segundos del backoff exponencial
+            max_delay: Espera máxima en segundos entre intentos
+            attempt_timeout: Tiempo máximo en segundos de cada intento
+            total_timeout: Tiempo máximo en segundos de la llamada incluyendo reintentos
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+
+    def backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter completo."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Circuito que deja de llamar al proveedor tras varios fallos seguidos.
+
+    Mientras está abierto las llamadas fallan al instante; pasado el tiempo de
+    espera se deja pasar una sola llamada de prueba que decide si se cierra.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self):
+        if self._opened_at is None:
+            return
+        remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+        if remaining > 0 or self._probe_in_flight:
+            raise CircuitOpenError(max(remaining, 1.0))
+        # Semiabierto: esta llamada es la prueba
+        self._probe_in_flight = True
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("Circuito del modelo cerrado")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def release_probe(self):
+        """Libera la llamada de prueba si se canceló antes de terminar."""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._probe_in_flight or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._probe_in_flight:
+                logger.warning("Circuito del modelo abierto tras %s fallos", self._failures)
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Indica si el error es transitorio y tiene sentido reintentar."""
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Lee la espera sugerida por el proveedor en las cabeceras Retry-After."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+async def call_with_retry(operation: Callable[[], Awaitable[T]], policy: RetryPolicy, breaker: CircuitBreaker) -> T:
+    """
+    Ejecuta la operación con plazos por intento y total, reintentos con jitter
+    solo para errores transitorios y protección del circuito.
+
+    Raises:
+        CircuitOpenError: Si el circuito está abierto
+        asyncio.TimeoutError: Si se agota el plazo total
+        Exception: El último error si no es reintentable o se agotan los intentos
+    """
+    deadline = time.monotonic() + policy.total_timeout
+
+    for attempt in range(policy.max_attempts):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Se agotó el tiempo total para la llamada al modelo")
+
+        breaker.before_call()
+        try:
+            result = await asyncio.wait_for(operation(), timeout=min(policy.attempt_timeout, remaining))
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                # El proveedor respondió: el error es de la solicitud, no del servicio
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+
+            if attempt == policy.max_attempts - 1:
+                raise
+            delay = retry_after(e)
+            if delay is None:
+                delay = policy.backoff(attempt)
+            if delay >= deadline - time.monotonic():
+                raise
+            logger.warning("Intento %s de llamada al modelo falló (%s), reintentando en %.2fs", attempt + 1, e, delay)
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,130 @@
+"""
+Proceso aislado que ejecuta el código ejecutable de un mensaje.
+
+CodeRunner lo lanza por ruta antes de que llegue la petición. Con el sandbox de
+namespaces (el modo por defecto) arranca dentro de namespaces nuevos de
+usuario, montaje, red, procesos, IPC y hostname (unshare) y pasa por dos etapas:
+
+- isolate: como root del namespace de usuario (sin privilegios fuera de él)
+  tapa con un tmpfs de solo lectura los directorios ocultos (el código de la
+  API, UPLOAD_FOLDER...), vuelve a montar encima solo el directorio de trabajo
+  de la ejecución y se reemplaza por la etapa run sin ninguna capability
+  (setpriv), así el código no puede desmontar lo que se ocultó.
+- run: importa pandas y numpy, aplica los límites de recursos y queda bloqueado
+  leyendo el código por stdin. Cada proceso ejecuta un solo código y termina.
+
+Dentro del namespace de red no hay más interfaz que loopback (apagada) y en el
+de procesos el /proc solo muestra el sandbox: ni el entorno ni los archivos
+abiertos de la API son visibles. Al terminar el primer proceso del namespace
+el kernel mata al resto, así nada queda vivo tras la ejecución.
+
+No debe importar nada del paquete app: el proceso no recibe la configuración
+ni las credenciales de la API.
+"""
+import json
+import os
+import subprocess
+import sys
+
+try:
+    import resource
+except ImportError:  # Fuera de POSIX solo se aplica el tiempo límite del proceso padre
+    resource = None
+
+
+def _set_limit(kind: int, soft: int, hard: int = None) -> None:
+    """Fija el límite blando y el duro, sin superar el duro actual (el código no puede volver a subirlos)."""
+    _, current = resource.getrlimit(kind)
+    hard = soft if hard is None else hard
+    if current != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current), min(hard, current)
+    resource.setrlimit(kind, (soft, hard))
+
+
+def apply_limits(cpu_seconds: int, memory_bytes: int, file_bytes: int, max_processes: int) -> None:
+    """
+    Límites del proceso. El de CPU se cuenta desde ahora: el tiempo usado en los
+    imports no se descuenta del código del usuario.
+    """
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_limit = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    # SIGXCPU al llegar al blando y SIGKILL un segundo después
+    _set_limit(resource.RLIMIT_CPU, cpu_limit, cpu_limit + 1)
+    if memory_bytes > 0:
+        _set_limit(resource.RLIMIT_AS, memory_bytes)
+    if file_bytes > 0:
+        _set_limit(resource.RLIMIT_FSIZE, file_bytes)
+    if max_processes > 0:
+        # En el namespace de usuario propio solo cuenta los procesos e hilos del sandbox
+        _set_limit(resource.RLIMIT_NPROC, max_processes)
+    # Sin volcados de memoria en el directorio de trabajo
+    _set_limit(resource.RLIMIT_CORE, 0)
+
+
+def _mount(mount: str, *args: str, pass_fds=()) -> None:
+    subprocess.run([mount, "--no-canonicalize", *args], check=True, pass_fds=pass_fds)
+
+
+def isolate(config: dict) -> None:
+    """
+    Etapa isolate: oculta los directorios de config["hidden"], deja visible
+    config["workdir"] y ejecuta la etapa run con setpriv, sin capabilities.
+    """
+    mount = config["mount"]
+    workdir = config["workdir"]
+    # Se abren antes de ocultarlos: el script para la etapa run y el directorio
+    # de trabajo para montarlo de nuevo encima del tmpfs
+    script_fd = os.open(os.path.abspath(__file__), os.O_RDONLY)
+    workdir_fd = os.open(workdir, os.O_RDONLY | os.O_DIRECTORY)
+
+    hidden = []
+    # Primero los directorios más externos: los que quedan dentro de otro ya no existen
+    for path in sorted(config["hidden"], key=len):
+        if os.path.isdir(path):
+            _mount(mount, "-t", "tmpfs", "-o", "mode=0755,size=64k", "tmpfs", path)
+            hidden.append(path)
+    os.makedirs(workdir, exist_ok=True)
+    _mount(mount, "--bind", f"/proc/self/fd/{workdir_fd}", workdir, pass_fds=(workdir_fd,))
+    for path in hidden:
+        _mount(mount, "-o", "remount,bind,ro", path)
+
+    os.chdir(workdir)
+    os.close(workdir_fd)
+    os.set_inheritable(script_fd, True)
+    os.execv(config["setpriv"], [
+        config["setpriv"], "--no-new-privs", "--inh-caps=-all", "--bounding-set=-all", "--",
+        sys.executable, "-I", "-u", f"/dev/fd/{script_fd}", "run", *config["limits"], str(script_fd),
+    ])
+
+
+def run(cpu_seconds: int, memory_bytes: int, file_bytes: int, max_processes: int, script_fd: int) -> None:
+    """Etapa run: espera el código por stdin y lo ejecuta con pd y np disponibles."""
+    if script_fd >= 0:
+        os.close(script_fd)
+    try:
+        import numpy as np
+        import pandas as pd
+    except ImportError:
+        np = pd = None
+
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+    sys.stderr.reconfigure(encoding="utf-8", errors="replace")
+
+    code = sys.stdin.buffer.read().decode("utf-8", errors="replace")
+    apply_limits(cpu_seconds, memory_bytes, file_bytes, max_processes)
+
+    namespace = {"__name__": "__main__", "pd": pd, "np": np}
+    exec(compile(code, "<executable_code>", "exec"), namespace)
+
+
+def main() -> None:
+    if sys.argv[1] == "isolate":
+        isolate(json.loads(sys.argv[2]))
+    else:
+        run(*(int(arg) for arg in sys.argv[2:7]))
+
+
+if __name__ == "__main__":
+    main()
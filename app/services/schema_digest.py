@@ -0,0 +1,466 @@
+"""
+Resumen estructurado de los esquemas para el prompt.
+
+El DDL de un esquema se analiza una sola vez, al crearlo o actualizarlo: se
+extraen tablas, columnas, claves primarias, únicas y foráneas (también las de
+ALTER TABLE ... ADD CONSTRAINT) y se guarda el resultado en schemes.digest. En
+el prompt se envía ese resumen, de una línea por tabla, en lugar del DDL. Lo
+que el resumen no descompone se conserva tal cual: las restricciones CHECK de
+cada tabla y las sentencias CREATE TYPE (enums), CREATE DOMAIN y CREATE VIEW.
+
+Cada resumen lleva el SHA-256 del contenido del que se obtuvo (source_hash):
+si el esquema cambió sin pasar por la API, el resumen guardado se descarta. Lo
+mismo si se guardó con otra versión del formato (DIGEST_VERSION).
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.config.log import logger
+from app.models.schemas.scheme import SchemeBase
+from app.repositories.async_base import AsyncRepository
+from app.repositories.scheme_repository import SchemeRepository
+from app.utils.singleton import singleton
+
+if TYPE_CHECKING:
+    from .schema_index import SchemeIndex
+
+# Se incrementa cuando cambia lo que se extrae del DDL: los resúmenes guardados
+# con otra versión se vuelven a calcular
+DIGEST_VERSION = 2
+
+
+class SchemeColumn(BaseModel):
+    name: str
+    type: str
+    nullable: bool = True
+    unique: bool = False
+
+
+class SchemeTable(BaseModel):
+    name: str
+    columns: List[SchemeColumn] = Field(default_factory=list)
+    primary_key: List[str] = Field(default_factory=list)
+    unique: List[List[str]] = Field(default_factory=list)
+    # Restricciones CHECK tal como aparecen en el DDL
+    checks: List[str] = Field(default_factory=list)
+
+
+class SchemeRelationship(BaseModel):
+    table: str
+    columns: List[str]
+    ref_table: str
+    ref_columns: List[str] = Field(default_factory=list)
+
+
+class SchemeDigest(BaseModel):
+    source_hash: str
+    version: int = 1
+    tables: List[SchemeTable]
+    relationships: List[SchemeRelationship] = Field(default_factory=list)
+    # Tipos, dominios y vistas: se envían siempre y sin resumir
+    statements: List[str] = Field(default_factory=list)
+
+    def to_prompt(self, tables: Optional[Sequence[str]] = None) -> str:
+        """
+        Una línea por tabla: columnas con su tipo, claves, referencias y
+        restricciones CHECK. Con tables solo se detallan esas tablas y del resto
+        se listan los nombres. Los tipos, dominios y vistas van al final, tal cual.
+        """
+        references: Dict[Tuple[str, str], str] = {}
+        composite: Dict[str, List[str]] = {}
+        for relation in self.relationships:
+            target = f"{relation.ref_table}({', '.join(relation.ref_columns)})" if relation.ref_columns else relation.ref_table
+            if len(relation.columns) == 1:
+                ref = f"{relation.ref_table}.{relation.ref_columns[0]}" if len(relation.ref_columns) == 1 else target
+                references[(relation.table, relation.columns[0])] = ref
+            else:
+                composite.setdefault(relation.table, []).append(f"FK ({', '.join(relation.columns)}) -> {target}")
+
+        selected = set(tables) if tables is not None else None
+        lines = [f"Tablas ({len(self.tables)}):"]
+        for table in self.tables:
+            if selected is not None and table.name not in selected:
+                continue
+            primary_key = set(table.primary_key) if len(table.primary_key) == 1 else set()
+            columns = []
+            for column in table.columns:
+                parts = [column.name, column.type]
+                if column.name in primary_key:
+                    parts.append("PK")
+                elif not column.nullable:
+                    parts.append("not null")
+                if column.unique:
+                    parts.append("unique")
+                reference = references.get((table.name, column.name))
+                if reference:
+                    parts.append(f"-> {reference}")
+                columns.append(" ".join(parts))
+            if len(table.primary_key) > 1:
+                columns.append(f"PK ({', '.join(table.primary_key)})")
+            columns.extend(composite.get(table.name, []))
+            columns.extend(table.checks)
+            lines.append(f"- {table.name}({', '.join(columns)})")
+        if selected is not None:
+            omitted = [table.name for table in self.tables if table.name not in selected]
+            if omitted:
+                lines.append(f"Otras tablas del esquema (sin detalle): {', '.join(omitted)}")
+        if self.statements:
+            lines.append("Tipos y vistas:")
+            lines.extend(f"{statement};" for statement in self.statements)
+        return "\n".join(lines)
+
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_CREATE_TABLE = re.compile(
+    r"^CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:GLOBAL|LOCAL)\s+)?(?:TEMP(?:ORARY)?\s+|UNLOGGED\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?",
+    re.I,
+)
+_ALTER_TABLE = re.compile(r"^ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?(?P<name>\S+)\s+(?P<actions>.*)$", re.I | re.S)
+_PRIMARY_KEY = re.compile(r"PRIMARY\s+KEY\s*\((?P<columns>[^)]*)\)", re.I)
+_UNIQUE = re.compile(r"UNIQUE\s*(?:KEY|INDEX)?\s*(?:[^\s(]+\s*)?\((?P<columns>[^)]*)\)", re.I)
+_FOREIGN_KEY = re.compile(
+    r"FOREIGN\s+KEY\s*(?:[^\s(]+\s*)?\((?P<columns>[^)]*)\)\s*REFERENCES\s+(?P<table>[^\s(]+)\s*(?:\((?P<ref_columns>[^)]*)\))?",
+    re.I,
+)
+_INDEX = re.compile(r"^(?:KEY|INDEX)\s+(?:\S+\s+)?\(", re.I)
+_CHECK = re.compile(r"\bCHECK\s*\(", re.I)
+_CONSTRAINT_NAME = re.compile(r"^CONSTRAINT\s+\S+\s+", re.I)
+# Sentencias que no se resumen y se conservan completas
+_VERBATIM = re.compile(
+    r"^CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:TEMP(?:ORARY)?|RECURSIVE|MATERIALIZED)\s+)*(?:TYPE|DOMAIN|VIEW)\b",
+    re.I,
+)
+_REFERENCES = re.compile(r"REFERENCES\s+(?P<table>[^\s(]+)\s*(?:\((?P<ref_columns>[^)]*)\))?", re.I)
+
+# Palabras con las que empiezan las restricciones de una columna (el tipo termina antes)
+_COLUMN_CONSTRAINTS = {
+    "NOT", "NULL", "DEFAULT", "PRIMARY", "REFERENCES", "UNIQUE", "CHECK", "CONSTRAINT",
+    "GENERATED", "COLLATE", "AUTO_INCREMENT", "AUTOINCREMENT", "IDENTITY", "COMMENT", "ON",
+}
+# Palabras con las que empiezan las restricciones de tabla
+_TABLE_CONSTRAINTS = {"CONSTRAINT", "PRIMARY", "FOREIGN", "UNIQUE", "CHECK", "KEY", "INDEX", "EXCLUDE", "LIKE", "FULLTEXT", "SPATIAL"}
+
+_QUOTES = {'"': '"', "`": "`", "[": "]", "'": "'"}
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """Separa por el carácter indicado fuera de paréntesis, comillas y bloques $$."""
+    parts: List[str] = []
+    current: List[str] = []
+    depth = 0
+    quote: Optional[str] = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            current.append(char)
+            if text.startswith(quote, i):
+                if len(quote) > 1:
+                    current.append(text[i + 1:i + len(quote)])
+                    i += len(quote) - 1
+                quote = None
+        elif char == "$" and (match := re.match(r"\$\w*\$", text[i:])):
+            quote = match.group(0)
+            current.append(quote)
+            i += len(quote) - 1
+        elif char in _QUOTES:
+            quote = _QUOTES[char]
+            current.append(char)
+        elif char == "(":
+            depth += 1
+            current.append(char)
+        elif char == ")":
+            depth -= 1
+            current.append(char)
+        elif char == separator and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _identifier(raw: str) -> str:
+    """Nombre sin comillas y sin el esquema public."""
+    names = [name.strip().strip('`"[]') for name in raw.strip().split(".")]
+    if len(names) > 1 and names[0].lower() == "public":
+        names = names[1:]
+    return ".".join(names)
+
+
+def _identifiers(raw: Optional[str]) -> List[str]:
+    return [_identifier(name) for name in raw.split(",") if name.strip()] if raw else []
+
+
+def _matching_parenthesis(text: str, start: int) -> int:
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def _checks(definition: str) -> List[str]:
+    """Restricciones CHECK (...) de una definición, con su expresión completa."""
+    checks = []
+    for match in _CHECK.finditer(definition):
+        end = _matching_parenthesis(definition, match.end() - 1)
+        if end != -1:
+            checks.append(f"CHECK {' '.join(definition[match.end() - 1:end + 1].split())}")
+    return checks
+
+
+def _parse_column(definition: str, table: SchemeTable, relationships: List[SchemeRelationship]) -> None:
+    tokens = _split_top_level(" ".join(definition.split()), " ")
+    if len(tokens) < 2:
+        return
+    name = _identifier(tokens[0])
+    type_parts = []
+    for token in tokens[1:]:
+        if token.upper() in _COLUMN_CONSTRAINTS:
+            break
+        type_parts.append(token)
+    column_type = " ".join(type_parts).lower().replace(" (", "(")
+
+    upper = definition.upper()
+    column = SchemeColumn(
+        name=name,
+        type=column_type or "?",
+        nullable="NOT NULL" not in upper and "PRIMARY KEY" not in upper,
+        unique=bool(re.search(r"\bUNIQUE\b", upper)),
+    )
+    table.columns.append(column)
+    table.checks.extend(_checks(definition))
+    if "PRIMARY KEY" in upper:
+        table.primary_key = [name]
+    reference = _REFERENCES.search(definition)
+    if reference:
+        relationships.append(SchemeRelationship(
+            table=table.name,
+            columns=[name],
+            ref_table=_identifier(reference.group("table")),
+            ref_columns=_identifiers(reference.group("ref_columns")),
+        ))
+
+
+def _parse_constraint(definition: str, table: SchemeTable, relationships: List[SchemeRelationship]) -> None:
+    if _CHECK.match(_CONSTRAINT_NAME.sub("", definition)):
+        table.checks.extend(_checks(definition))
+        return
+    foreign_key = _FOREIGN_KEY.search(definition)
+    if foreign_key:
+        relationships.append(SchemeRelationship(
+            table=table.name,
+            columns=_identifiers(foreign_key.group("columns")),
+            ref_table=_identifier(foreign_key.group("table")),
+            ref_columns=_identifiers(foreign_key.group("ref_columns")),
+        ))
+        return
+    primary_key = _PRIMARY_KEY.search(definition)
+    if primary_key:
+        table.primary_key = _identifiers(primary_key.group("columns"))
+        return
+    unique = _UNIQUE.search(definition)
+    if unique:
+        columns = _identifiers(unique.group("columns"))
+        if len(columns) == 1:
+            for column in table.columns:
+                if column.name == columns[0]:
+                    column.unique = True
+        else:
+            table.unique.append(columns)
+
+
+def _is_table_constraint(definition: str) -> bool:
+    first_word = definition.split(None, 1)[0].upper()
+    if first_word in ("KEY", "INDEX"):
+        # Índice de MySQL (KEY nombre (columnas)) o una columna llamada key / index
+        return bool(_INDEX.match(definition))
+    return first_word in _TABLE_CONSTRAINTS
+
+
+def _parse_create_table(statement: str, header_end: int, relationships: List[SchemeRelationship]) -> Optional[SchemeTable]:
+    start = statement.find("(", header_end)
+    end = _matching_parenthesis(statement, start) if start != -1 else -1
+    if end == -1:
+        return None
+    table = SchemeTable(name=_identifier(statement[header_end:start]))
+    for definition in _split_top_level(statement[start + 1:end], ","):
+        if _is_table_constraint(definition):
+            _parse_constraint(definition, table, relationships)
+        else:
+            _parse_column(definition, table, relationships)
+    return table if table.columns else None
+
+
+def parse_schema(ddl: str) -> Optional[SchemeDigest]:
+    """
+    Analiza el DDL de un esquema. Devuelve None si no contiene ninguna tabla
+    (por ejemplo, si el esquema está descrito en texto libre).
+    """
+    tables: Dict[str, SchemeTable] = {}
+    relationships: List[SchemeRelationship] = []
+    statements: List[str] = []
+
+    for statement in _split_top_level(_COMMENTS.sub(" ", ddl), ";"):
+        if _VERBATIM.match(statement):
+            statements.append(statement)
+            continue
+
+        create = _CREATE_TABLE.match(statement)
+        if create:
+            table = _parse_create_table(statement, create.end(), relationships)
+            if table:
+                tables[table.name] = table
+            continue
+
+        alter = _ALTER_TABLE.match(statement)
+        if alter:
+            table = tables.get(_identifier(alter.group("name")))
+            if table is None:
+                continue
+            for action in _split_top_level(alter.group("actions"), ","):
+                if re.match(r"ADD\s+(CONSTRAINT|PRIMARY|FOREIGN|UNIQUE|CHECK)", action, re.I):
+                    _parse_constraint(re.sub(r"^ADD\s+", "", action, flags=re.I), table, relationships)
+
+    if not tables:
+        return None
+    return SchemeDigest(
+        source_hash=content_hash(ddl),
+        version=DIGEST_VERSION,
+        tables=list(tables.values()),
+        relationships=relationships,
+        statements=statements,
+    )
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@singleton
+class SchemaDigestService:
+    """
+    Resúmenes de esquemas: se calculan y guardan al crear o actualizar el
+    esquema, y se sirven desde una caché en memoria por id de esquema.
+    """
+    def __init__(self):
+        self.repository = SchemeRepository()
+        self.async_repository = AsyncRepository(self.repository)
+        # scheme_id -> (source_hash, resumen o None si el contenido no es DDL)
+        self._cache: "OrderedDict[str, Tuple[str, Optional[SchemeDigest]]]" = OrderedDict()
+        # scheme_id -> (source_hash, índice de tablas)
+        self._indexes: "OrderedDict[str, Tuple[str, SchemeIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _parse(self, content: str) -> Optional[SchemeDigest]:
+        try:
+            return parse_schema(content)
+        except Exception as e:
+            logger.warning("No se pudo analizar el esquema: %s", e)
+            return None
+
+    def _remember(self, scheme_id, source_hash: str, digest: Optional[SchemeDigest]) -> None:
+        with self._lock:
+            self._cache[str(scheme_id)] = (source_hash, digest)
+            self._cache.move_to_end(str(scheme_id))
+            while len(self._cache) > settings.SCHEME_DIGEST_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _cached(self, scheme_id, source_hash: str) -> Tuple[bool, Optional[SchemeDigest]]:
+        with self._lock:
+            cached = self._cache.get(str(scheme_id))
+            if cached and cached[0] == source_hash:
+                self._cache.move_to_end(str(scheme_id))
+                return True, cached[1]
+        return False, None
+
+    def refresh(self, db: Session, *, scheme_id, content: str) -> Optional[SchemeDigest]:
+        """Analiza el contenido del esquema y guarda su resumen."""
+        digest = self._parse(content)
+        self.repository.set_digest(db, id=scheme_id, digest=digest.model_dump_json() if digest else None)
+        self._remember(scheme_id, content_hash(content), digest)
+        return digest
+
+    async def refresh_async(self, db: Session, *, scheme_id, content: str) -> Optional[SchemeDigest]:
+        digest = self._parse(content)
+        await self.async_repository.set_digest(db, id=scheme_id, digest=digest.model_dump_json() if digest else None)
+        self._remember(scheme_id, content_hash(content), digest)
+        return digest
+
+    def invalidate(self, scheme_id) -> None:
+        with self._lock:
+            self._cache.pop(str(scheme_id), None)
+            self._indexes.pop(str(scheme_id), None)
+
+    def index_for(self, scheme_id, digest: SchemeDigest) -> "SchemeIndex":
+        """Índice de tablas del esquema, construido una vez por versión del resumen."""
+        from .schema_index import SchemeIndex
+
+        with self._lock:
+            cached = self._indexes.get(str(scheme_id))
+            if cached and cached[0] == digest.source_hash:
+                self._indexes.move_to_end(str(scheme_id))
+                return cached[1]
+
+        index = SchemeIndex(digest)
+        with self._lock:
+            self._indexes[str(scheme_id)] = (digest.source_hash, index)
+            self._indexes.move_to_end(str(scheme_id))
+            while len(self._indexes) > settings.SCHEME_DIGEST_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+    async def get_async(self, db: Session, *, scheme: SchemeBase) -> Optional[SchemeDigest]:
+        """
+        Resumen del esquema: de la caché, de schemes.digest o, para esquemas
+        guardados antes de existir el resumen, analizando el contenido.
+        """
+        source_hash = content_hash(scheme.content)
+        found, digest = self._cached(scheme.id, source_hash)
+        if found:
+            return digest
+
+        raw = await self.async_repository.get_digest(db, id=scheme.id)
+        digest = SchemeDigest.model_validate_json(raw) if raw else None
+        if digest is None or digest.source_hash != source_hash or digest.version != DIGEST_VERSION:
+            digest = self._parse(scheme.content)
+        self._remember(scheme.id, source_hash, digest)
+        return digest
+
+    async def prompt_text_async(self, db: Session, *, scheme: SchemeBase, query: Optional[str] = None) -> Tuple[str, Hashable]:
+        """
+        Texto del esquema para el prompt: el resumen si el DDL se pudo analizar,
+        si no el contenido. En esquemas de más de SCHEME_SLICE_MIN_TABLES tablas
+        solo se detallan las relevantes para query y sus vecinas por clave foránea.
+
+        Devuelve también la versión del texto (hash del esquema y tablas
+        elegidas), con la que se guarda el prompt compilado sin volver a
+        calcular el hash del texto.
+        """
+        if not settings.SCHEME_DIGEST_ENABLED:
+            return scheme.content, content_hash(scheme.content)
+        digest = await self.get_async(db, scheme=scheme)
+        if digest is None:
+            return scheme.content, content_hash(scheme.content)
+        if query and len(digest.tables) > settings.SCHEME_SLICE_MIN_TABLES:
+            tables = self.index_for(scheme.id, digest).select(
+                query,
+                max_tables=settings.SCHEME_SLICE_MAX_TABLES,
+                max_neighbours=settings.SCHEME_SLICE_MAX_NEIGHBOURS,
+            )
+            return digest.to_prompt(tables), (digest.source_hash, tuple(tables))
+        return digest.to_prompt(), (digest.source_hash, None)
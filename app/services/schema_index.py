@@ -0,0 +1,156 @@
+"""
+Índice local de las tablas de un esquema para elegir las relevantes a cada mensaje.
+
+Cada tabla es un documento con los términos de su nombre (con más peso) y de
+sus columnas, separando camelCase y snake_case y sin acentos. Las tablas se
+puntúan con BM25; los términos del mensaje que no están en el vocabulario se
+aproximan a los más parecidos con un índice de trigramas (plurales, variantes
+como cliente / clientes / customer_id). Al resultado se agregan sus vecinas por
+clave foránea, necesarias para los JOIN.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .schema_digest import SchemeDigest
+
+# Parámetros habituales de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Peso de los términos del nombre de la tabla frente a los de sus columnas
+TABLE_NAME_WEIGHT = 3
+
+# Fracción de la mejor puntuación que debe alcanzar una tabla para elegirse:
+# descarta las que solo comparten columnas presentes en todo el esquema
+MIN_RELATIVE_SCORE = 0.15
+
+# Similitud mínima (Jaccard de trigramas) para aproximar un término desconocido
+TRIGRAM_THRESHOLD = 0.45
+TRIGRAM_MATCHES = 3
+TRIGRAM_MIN_LENGTH = 4
+
+_CAMEL_CASE = re.compile(r"([a-z0-9])([A-Z])")
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def terms(text: str) -> List[str]:
+    """Términos normalizados de un nombre o de un mensaje."""
+    text = _CAMEL_CASE.sub(r"\1 \2", text or "")
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return [term for term in _NON_ALPHANUMERIC.split(text) if len(term) > 1]
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"#{term}#"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SchemeIndex:
+    def __init__(self, digest: SchemeDigest):
+        self.tables = [table.name for table in digest.tables]
+        self._table_names = set(self.tables)
+        self._documents: List[Counter] = []
+        for table in digest.tables:
+            document = Counter()
+            for term in terms(table.name):
+                document[term] += TABLE_NAME_WEIGHT
+            for column in table.columns:
+                document.update(terms(column.name))
+            self._documents.append(document)
+
+        self._lengths = [sum(document.values()) for document in self._documents]
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for position, document in enumerate(self._documents):
+            for term, frequency in document.items():
+                self._postings[term].append((position, frequency))
+        total = len(self._documents)
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        for term in self._postings:
+            for trigram in trigrams(term):
+                self._trigrams[trigram].add(term)
+
+        # Vecinas por clave foránea en ambos sentidos
+        self._references: Dict[str, List[str]] = defaultdict(list)
+        self._referenced_by: Dict[str, List[str]] = defaultdict(list)
+        for relation in digest.relationships:
+            if relation.ref_table != relation.table:
+                self._references[relation.table].append(relation.ref_table)
+                self._referenced_by[relation.ref_table].append(relation.table)
+
+    def _expand(self, query_terms: Iterable[str]) -> Dict[str, float]:
+        """Términos del índice que corresponden a la consulta, con su peso."""
+        weights: Dict[str, float] = {}
+        for term in query_terms:
+            if term in self._postings:
+                weights[term] = 1.0
+            # También con coincidencia exacta: cliente debe encontrar la tabla clientes
+            if len(term) < TRIGRAM_MIN_LENGTH:
+                continue
+            query_trigrams = trigrams(term)
+            candidates = set()
+            for trigram in query_trigrams:
+                candidates |= self._trigrams.get(trigram, set())
+            scored = []
+            for candidate in candidates:
+                candidate_trigrams = trigrams(candidate)
+                similarity = len(query_trigrams & candidate_trigrams) / len(query_trigrams | candidate_trigrams)
+                if similarity >= TRIGRAM_THRESHOLD:
+                    scored.append((similarity, candidate))
+            for similarity, candidate in sorted(scored, reverse=True)[:TRIGRAM_MATCHES]:
+                weights[candidate] = max(weights.get(candidate, 0.0), similarity)
+        return weights
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """Tablas con puntuación BM25 mayor que cero, de mayor a menor (a igualdad, por nombre)."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in self._expand(terms(query)).items():
+            idf = self._idf[term]
+            for position, frequency in self._postings[term]:
+                length_norm = 1 - BM25_B + BM25_B * self._lengths[position] / self._average_length
+                scores[position] += weight * idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.tables[item[0]]))
+        return [(self.tables[position], score) for position, score in ranked]
+
+    def select(self, query: str, max_tables: int, max_neighbours: int) -> List[str]:
+        """
+        Tablas relevantes para la consulta (hasta max_tables) más sus vecinas por
+        clave foránea (hasta max_neighbours): primero las que referencian y luego
+        las que las referencian con puntuación suficiente. Si nada
+        coincide se eligen las tablas con más relaciones.
+        """
+        ranked = self.search(query)
+        scores = dict(ranked)
+        cutoff = ranked[0][1] * MIN_RELATIVE_SCORE if ranked else 0.0
+        selected = [table for table, score in ranked[:max_tables] if score >= cutoff]
+        if not selected:
+            selected = sorted(
+                self.tables,
+                key=lambda table: len(self._references[table]) + len(self._referenced_by[table]),
+                reverse=True,
+            )[:max_tables]
+
+        chosen = set(selected)
+        neighbours: List[str] = []
+        for table in selected:
+            for neighbour in self._references[table]:
+                # Las tablas referenciadas que no están en el esquema (otro esquema de la base) se omiten
+                if neighbour not in chosen and neighbour in self._table_names:
+                    chosen.add(neighbour)
+                    neighbours.append(neighbour)
+        # De las que las referencian solo las que también superan el corte (quedaron
+        # fuera por max_tables): una tabla central puede estar referenciada por cientos
+        incoming = sorted(
+            {neighbour for table in selected for neighbour in self._referenced_by[table] if neighbour in scores and scores[neighbour] >= cutoff} - chosen,
+            key=lambda table: (-scores[table], table),
+        )
+        neighbours.extend(incoming)
+        return selected + neighbours[:max_neighbours]
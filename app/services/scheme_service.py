@@ -1,25 +1,71 @@
+from typing import Hashable, Optional, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas.scheme import MultiScheme, SchemeBase, SchemeUpdate, DeleteScheme
 from app.repositories.scheme_repository import SchemeRepository
+from app.repositories.async_base import AsyncRepository
+from .prompt_sys_manager import PromptSysManager
+from .schema_digest import SchemaDigestService
+from app.utils.singleton import singleton
 
+@singleton
 class SchemeService:
     def __init__(self):
         self.repository = SchemeRepository()
+        self.async_repository = AsyncRepository(self.repository)
+        self.digest_service = SchemaDigestService()
     
     def get(self, db: Session, *, id: int) -> SchemeBase:
         return self.repository.get(db, id=id)
 
+    async def get_async(self, db: AsyncSession, *, id: int) -> SchemeBase:
+        return await self.async_repository.get(db, id=id)
+
     def get_by_user_id(self, db: Session, *, user_id: str) -> MultiScheme:
         return self.repository.get_by_user_id(db, user_id=user_id)
+
+    async def get_by_user_id_async(self, db: AsyncSession, *, user_id: str) -> MultiScheme:
+        return await self.async_repository.get_by_user_id(db, user_id=user_id)
+
+    def get_by_user_id_keyset(self, db: Session, *, user_id: str, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiScheme:
+        return self.repository.get_by_user_id_keyset(db, user_id=user_id, limit=limit, cursor=cursor, total_mode=total_mode)
+
+    async def get_by_user_id_keyset_async(self, db: AsyncSession, *, user_id: str, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiScheme:
+        return await self.async_repository.get_by_user_id_keyset(db, user_id=user_id, limit=limit, cursor=cursor, total_mode=total_mode)
     
     def get_by_chat_id(self, db: Session, *, chat_id: str, limit: int = 10, skip: int = 0) -> MultiScheme:
         return self.repository.get_by_chat_id(db, chat_id=chat_id, limit=limit, skip=skip)
+
+    async def get_by_chat_id_async(self, db: Session, *, chat_id: str, limit: int = 10, skip: int = 0) -> MultiScheme:
+        return await self.async_repository.get_by_chat_id(db, chat_id=chat_id, limit=limit, skip=skip)
     
     def get_multi(self, db: Session, *, limit = 100, skip = 0) -> MultiScheme:
         return self.repository.get_multi(db, limit=limit, skip=skip)
+
+    def get_multi_raw(self, db: Session, *, limit: int = 100, skip: int = 0) -> str:
+        return self.repository.get_multi_raw(db, limit=limit, skip=skip)
+
+    def get_multi_keyset(self, db: Session, *, limit: int = 100, cursor: Optional[str] = None, total_mode: str = "none") -> MultiScheme:
+        return self.repository.get_multi_keyset(db, limit=limit, cursor=cursor, total_mode=total_mode)
     
     def create(self, db: Session, *, obj_in) -> SchemeBase:
-        return self.repository.create(db, obj_in=obj_in)
+        scheme = self.repository.create(db, obj_in=obj_in)
+        # El DDL se analiza una sola vez, al guardarlo
+        self.digest_service.refresh(db, scheme_id=scheme.id, content=scheme.content)
+        return scheme
+
+    async def create_async(self, db: AsyncSession, *, obj_in) -> SchemeBase:
+        scheme = await self.async_repository.create(db, obj_in=obj_in)
+        await self.digest_service.refresh_async(db, scheme_id=scheme.id, content=scheme.content)
+        return scheme
+
+    async def prompt_text_async(self, db: AsyncSession, *, scheme: SchemeBase, query: Optional[str] = None) -> Tuple[str, Hashable]:
+        """
+        Esquema tal como se envía en el prompt: su resumen estructurado o el DDL.
+        En esquemas grandes solo las tablas relevantes para query. Devuelve
+        también la versión del texto, para la caché de prompts compilados.
+        """
+        return await self.digest_service.prompt_text_async(db, scheme=scheme, query=query)
     
     def update(self, db: Session, *, obj_in: SchemeUpdate) -> SchemeBase:
         db_obj = self.get(db, id=obj_in.id)
@@ -27,11 +73,39 @@ class SchemeService:
             raise Exception("Scheme not found")
         
         # Update the fields of db_obj with the values from obj_in
-        return self.repository.update(db, db_obj=db_obj, obj_in=obj_in)
+        scheme = self.repository.update(db, db_obj=db_obj, obj_in=obj_in)
+        if obj_in.content is not None:
+            self.digest_service.refresh(db, scheme_id=obj_in.id, content=obj_in.content)
+        PromptSysManager.invalidate_scheme(obj_in.id)
+        return scheme
+
+    async def update_async(self, db: AsyncSession, *, obj_in: SchemeUpdate) -> SchemeBase:
+        db_obj = await self.get_async(db, id=obj_in.id)
+        if not db_obj:
+            raise Exception("Scheme not found")
+
+        scheme = await self.async_repository.update(db, db_obj=db_obj, obj_in=obj_in)
+        if obj_in.content is not None:
+            await self.digest_service.refresh_async(db, scheme_id=obj_in.id, content=obj_in.content)
+        PromptSysManager.invalidate_scheme(obj_in.id)
+        return scheme
 
     def remove(self, db: Session, *, id: int) -> DeleteScheme:
         db_obj = self.get(db, id=id)
         if not db_obj:
             raise Exception("Scheme not found")
         
-        return self.repository.remove(db, db_obj=db_obj)
+        deleted = self.repository.remove(db, id=id)
+        PromptSysManager.invalidate_scheme(id)
+        self.digest_service.invalidate(id)
+        return deleted
+
+    async def remove_async(self, db: AsyncSession, *, id: int) -> DeleteScheme:
+        db_obj = await self.get_async(db, id=id)
+        if not db_obj:
+            raise Exception("Scheme not found")
+
+        deleted = await self.async_repository.remove(db, id=id)
+        PromptSysManager.invalidate_scheme(id)
+        self.digest_service.invalidate(id)
+        return deleted
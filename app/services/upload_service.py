@@ -0,0 +1,353 @@
+"""
+Subida de archivos por streaming.
+
+El cuerpo multipart se analiza a medida que llega (sin el UploadFile de
+FastAPI, que guarda el archivo entero antes de llamar al handler): los datos de
+cada archivo se acumulan en bloques de UPLOAD_CHUNK_SIZE que se escriben a disco
+y se agregan al hash SHA-256 en el threadpool. MAX_UPLOAD_SIZE se comprueba con
+cada bloque, así que una subida demasiado grande se corta en cuanto lo supera.
+
+Los archivos se guardan por contenido (UPLOAD_FOLDER/attachments/<sha256>): dos
+subidas del mismo archivo comparten el mismo archivo en disco. Cada archivo
+recibido queda en el directorio temporal hasta que la subida se valida y se
+registra; si falla, se borra y no queda ningún archivo sin adjunto.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.models.schemas.attachment import AttachmentBase, AttachmentCreate
+from app.utils.singleton import singleton
+from .attachment_service import AttachmentService
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # Versiones anteriores de python-multipart
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Tamaño máximo de los campos de texto del formulario
+MAX_FIELD_SIZE = 64 * 1024
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# URL con la que se registran los archivos subidos
+ATTACHMENT_URL_PREFIX = "/v1/attachments/files/"
+
+
+def attachment_digest(url: str) -> Optional[str]:
+    """Hash del archivo de un adjunto subido a este servidor, o None si es una URL externa."""
+    if not url or not url.startswith(ATTACHMENT_URL_PREFIX):
+        return None
+    digest = url[len(ATTACHMENT_URL_PREFIX):]
+    return digest if DIGEST_PATTERN.match(digest) else None
+
+
+class UploadError(Exception):
+    """Cuerpo multipart inválido o incompleto."""
+
+
+class UploadTooLargeError(UploadError):
+    def __init__(self, max_size: int):
+        super().__init__(f"File exceeds the maximum upload size of {max_size} bytes")
+        self.max_size = max_size
+
+
+@dataclass
+class StoredFile:
+    digest: str
+    size: int
+    filename: str
+    content_type: Optional[str]
+    path: str
+    # Copia recibida, hasta que UploadStorage.store() la mueve a path
+    temp_path: Optional[str] = None
+
+
+class ChunkedFileWriter:
+    """
+    Escribe un archivo en bloques de tamaño fijo calculando su hash, en un
+    archivo temporal que UploadStorage.store() mueve luego a su ruta por contenido.
+    """
+    def __init__(self, storage: "UploadStorage", filename: str, content_type: Optional[str]):
+        self.storage = storage
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._temp_path = os.path.join(storage.temp_dir, uuid.uuid4().hex)
+        self._file = open(self._temp_path, "wb")
+
+    def feed(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.storage.max_size:
+            raise UploadTooLargeError(self.storage.max_size)
+        self._buffer += data
+
+    def has_full_chunk(self) -> bool:
+        return len(self._buffer) >= self.storage.chunk_size
+
+    def flush_chunks(self, final: bool = False) -> None:
+        """Escribe los bloques completos (o todo lo pendiente si final). Se ejecuta en el threadpool."""
+        chunk_size = self.storage.chunk_size
+        while len(self._buffer) >= chunk_size or (final and self._buffer):
+            chunk = bytes(self._buffer[:chunk_size])
+            del self._buffer[:chunk_size]
+            self._hash.update(chunk)
+            self._file.write(chunk)
+
+    def finish(self) -> StoredFile:
+        """Cierra el archivo temporal y calcula su hash. Se ejecuta en el threadpool."""
+        self.flush_chunks(final=True)
+        self._file.close()
+        digest = self._hash.hexdigest()
+        return StoredFile(
+            digest=digest, size=self.size, filename=self.filename, content_type=self.content_type,
+            path=self.storage.path_for(digest), temp_path=self._temp_path,
+        )
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+class UploadStorage:
+    def __init__(self, root: str, max_size: int, chunk_size: int):
+        """
+        Args:
+            root: Directorio donde se guardan los archivos
+            max_size: Tamaño máximo de cada archivo, en bytes
+            chunk_size: Tamaño de los bloques que se escriben a disco
+        """
+        self.root = root
+        self.temp_dir = os.path.join(root, "tmp")
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest)
+
+    def find(self, digest: str) -> Optional[str]:
+        """Ruta del archivo con ese hash, o None si no existe (o el hash no es válido)."""
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        path = self.path_for(digest)
+        return path if os.path.isfile(path) else None
+
+    def writer(self, filename: str, content_type: Optional[str]) -> ChunkedFileWriter:
+        return ChunkedFileWriter(self, filename, content_type)
+
+    def store(self, stored: StoredFile) -> None:
+        """Mueve un archivo recibido a su ruta por contenido."""
+        if stored.temp_path is None:
+            return
+        if os.path.exists(stored.path):
+            # Mismo contenido ya guardado: se descarta la copia
+            os.remove(stored.temp_path)
+        else:
+            os.replace(stored.temp_path, stored.path)
+        stored.temp_path = None
+
+    def discard(self, stored: StoredFile) -> None:
+        """Borra un archivo recibido que no llegó a guardarse."""
+        if stored.temp_path is not None and os.path.exists(stored.temp_path):
+            os.remove(stored.temp_path)
+        stored.temp_path = None
+
+
+@dataclass
+class _Part:
+    headers: Dict[bytes, bytes] = field(default_factory=dict)
+    name: str = ""
+    writer: Optional[ChunkedFileWriter] = None
+    value: bytearray = field(default_factory=bytearray)
+
+
+class MultipartReceiver:
+    """
+    Analiza un cuerpo multipart/form-data por fragmentos. Los archivos van a
+    ChunkedFileWriter y los campos de texto se guardan en memoria.
+
+    Los archivos de files quedan en el directorio temporal: quien los recibe
+    los guarda con UploadStorage.store() y llama a discard() con los demás.
+    """
+    def __init__(self, storage: UploadStorage, content_type: str):
+        media_type, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise UploadError("Expected a multipart/form-data body")
+
+        self.storage = storage
+        self.fields: Dict[str, str] = {}
+        self.files: List[StoredFile] = []
+        self._writers: List[ChunkedFileWriter] = []
+        self._finished: List[ChunkedFileWriter] = []
+        self._part: Optional[_Part] = None
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._error: Optional[Exception] = None
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    async def receive(self, stream: AsyncIterator[bytes]) -> None:
+        try:
+            async for chunk in stream:
+                self._write(chunk)
+                await self._flush()
+            self._write(None)
+            if self._part is not None:
+                raise UploadError("Incomplete multipart body")
+            await self._flush()
+        except BaseException:
+            await asyncio.to_thread(self.discard)
+            raise
+
+    def _write(self, chunk: Optional[bytes]) -> None:
+        """Pasa un fragmento al parser (None para terminar)."""
+        try:
+            if chunk is None:
+                self._parser.finalize()
+            else:
+                self._parser.write(chunk)
+        except ValueError as e:
+            # Los errores de python-multipart derivan de ValueError
+            raise UploadError("Invalid multipart body") from e
+        if self._error is not None:
+            raise self._error
+
+    async def _flush(self) -> None:
+        """Escribe los bloques completos y cierra los archivos terminados, fuera del event loop."""
+        part = self._part
+        if part is not None and part.writer is not None and part.writer.has_full_chunk():
+            await asyncio.to_thread(part.writer.flush_chunks)
+        while self._finished:
+            writer = self._finished.pop(0)
+            self.files.append(await asyncio.to_thread(writer.finish))
+            self._writers.remove(writer)
+
+    def discard(self) -> None:
+        """Borra los archivos que no se guardaron, terminados o no."""
+        for writer in self._writers:
+            writer.abort()
+        self._writers.clear()
+        for stored in self.files:
+            self.storage.discard(stored)
+
+    # Callbacks del parser (síncronos)
+
+    def _on_part_begin(self) -> None:
+        self._part = _Part()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._part.headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        part = self._part
+        _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+        part.name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" in options:
+            filename = os.path.basename(options[b"filename"].decode("utf-8", errors="replace"))
+            content_type = part.headers.get(b"content-type")
+            part.writer = self.storage.writer(filename, content_type.decode("latin-1") if content_type else None)
+            self._writers.append(part.writer)
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._error is not None:
+            return
+        part = self._part
+        try:
+            if part.writer is not None:
+                part.writer.feed(data[start:end])
+            else:
+                part.value += data[start:end]
+                if len(part.value) > MAX_FIELD_SIZE:
+                    raise UploadError(f"Form field '{part.name}' is too large")
+        except UploadError as e:
+            self._error = e
+
+    def _on_part_end(self) -> None:
+        part = self._part
+        if part.writer is not None:
+            self._finished.append(part.writer)
+        else:
+            self.fields[part.name] = part.value.decode("utf-8", errors="replace")
+        self._part = None
+
+
+@singleton
+class UploadService:
+    def __init__(self):
+        self.storage = UploadStorage(
+            root=os.path.join(settings.UPLOAD_FOLDER, "attachments"),
+            max_size=settings.MAX_UPLOAD_SIZE,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        )
+        self.attachment_service = AttachmentService()
+
+    async def receive(self, stream: AsyncIterator[bytes], content_type: str) -> MultipartReceiver:
+        """Recibe el cuerpo multipart; sus archivos quedan en el directorio temporal."""
+        receiver = MultipartReceiver(self.storage, content_type)
+        await receiver.receive(stream)
+        return receiver
+
+    async def upload_attachment(self, db: AsyncSession, *, stream: AsyncIterator[bytes], content_type: str) -> AttachmentBase:
+        """
+        Guarda el archivo del campo 'file' y lo registra como adjunto del mensaje
+        indicado en el campo 'message_id'. El archivo solo se mueve a su ruta
+        por contenido después de validar los campos y registrar el adjunto.
+        """
+        receiver = await self.receive(stream, content_type)
+        try:
+            message_id = receiver.fields.get("message_id")
+            if not message_id:
+                raise UploadError("Message ID is required")
+            try:
+                # AttachmentCreate exige un UUID4: otra versión fallaría al validar con un 500
+                valid = uuid.UUID(message_id).version == 4
+            except ValueError:
+                valid = False
+            if not valid:
+                raise UploadError("Invalid message ID")
+            if len(receiver.files) != 1:
+                raise UploadError("Exactly one file is required")
+
+            stored = receiver.files[0]
+            attachment = await self.attachment_service.create_async(
+                db,
+                obj_in=AttachmentCreate(
+                    message_id=message_id,
+                    url=f"{ATTACHMENT_URL_PREFIX}{stored.digest}",
+                    filename=stored.filename,
+                )
+            )
+            await asyncio.to_thread(self.storage.store, stored)
+            return attachment
+        finally:
+            await asyncio.to_thread(receiver.discard)
+
+    def find(self, digest: str) -> Optional[str]:
+        return self.storage.find(digest)
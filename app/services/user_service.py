@@ -1,17 +1,28 @@
 from typing import List, Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.schemas.user import MultiUser, UserBase
 from app.repositories.user_repository import UserRepository
+from app.repositories.async_base import AsyncRepository
+from app.utils.singleton import singleton
 
+@singleton
 class UserService:
     def __init__(self):
         self.repository = UserRepository()
+        self.async_repository = AsyncRepository(self.repository)
     
     def get(self, db: Session, *, id: int) -> UserBase:
         return self.repository.get(db, id=id)
 
+    async def get_async(self, db: AsyncSession, *, id: int) -> UserBase:
+        return await self.async_repository.get(db, id=id)
+
     def get_by_email(self, db: Session, *, email: str) -> UserBase:
         return self.repository.get_by_email(db, email=email)
+
+    async def get_by_email_async(self, db: AsyncSession, *, email: str) -> UserBase:
+        return await self.async_repository.get_by_email(db, email=email)
     
     def get_multi(self, db: Session, *, limit = 100, skip = 0) -> MultiUser:
         return self.repository.get_multi(db, limit=limit, skip=skip)
\ No newline at end of file
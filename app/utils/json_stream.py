@@ -0,0 +1,172 @@
+from typing import Dict, List, Optional, Tuple
+
+# Estados del analizador
+_BEFORE_OBJECT = 0
+_EXPECT_KEY = 1
+_IN_KEY = 2
+_EXPECT_COLON = 3
+_EXPECT_VALUE = 4
+_IN_STRING_VALUE = 5
+_IN_OTHER_VALUE = 6
+_AFTER_VALUE = 7
+_DONE = 8
+
+# Marca el cierre de una cadena JSON
+_END = object()
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JsonFieldStreamParser:
+    """
+    Analizador incremental para el objeto JSON que devuelve el modelo.
+
+    Recibe el texto por fragmentos (tal como llega del stream) y emite, para
+    cada campo de texto de primer nivel que interesa, el trozo de valor ya
+    decodificado. Los campos no mapeados y los valores que no son texto se
+    ignoran. El resultado final debe validarse igualmente con json.loads.
+    """
+    def __init__(self, fields: Dict[str, str]):
+        """
+        Args:
+            fields: Mapeo de la clave JSON al nombre con el que se emite el campo
+        """
+        self.fields = fields
+        self.values: Dict[str, str] = {}
+        self._state = _BEFORE_OBJECT
+        self._key: List[str] = []
+        self._field: Optional[str] = None
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._depth = 0
+        self._in_nested_string = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Procesa un fragmento de texto.
+
+        Returns:
+            Lista de tuplas (campo, texto) con lo decodificado en este fragmento
+        """
+        events: List[Tuple[str, str]] = []
+        buffer: List[str] = []
+
+        for char in chunk:
+            state = self._state
+
+            if state == _IN_STRING_VALUE:
+                decoded = self._read_string_char(char)
+                if decoded is None:
+                    continue
+                if decoded is _END:
+                    self._flush(buffer, events)
+                    self._field = None
+                    self._state = _AFTER_VALUE
+                elif self._field:
+                    buffer.append(decoded)
+            elif state == _IN_KEY:
+                decoded = self._read_string_char(char)
+                if decoded is None:
+                    continue
+                if decoded is _END:
+                    self._state = _EXPECT_COLON
+                else:
+                    self._key.append(decoded)
+            elif state == _BEFORE_OBJECT:
+                if char == '{':
+                    self._state = _EXPECT_KEY
+            elif state == _EXPECT_KEY:
+                if char == '"':
+                    self._key = []
+                    self._state = _IN_KEY
+                elif char == '}':
+                    self._state = _DONE
+            elif state == _EXPECT_COLON:
+                if char == ':':
+                    self._state = _EXPECT_VALUE
+            elif state == _EXPECT_VALUE:
+                if char.isspace():
+                    continue
+                if char == '"':
+                    self._field = self.fields.get("".join(self._key))
+                    if self._field:
+                        self.values.setdefault(self._field, "")
+                    self._state = _IN_STRING_VALUE
+                else:
+                    self._depth = 1 if char in '{[' else 0
+                    self._state = _IN_OTHER_VALUE
+                    if self._depth == 0 and char in ',}':
+                        self._end_other_value(char)
+            elif state == _IN_OTHER_VALUE:
+                self._skip_other_value(char)
+            elif state == _AFTER_VALUE:
+                if char == ',':
+                    self._state = _EXPECT_KEY
+                elif char == '}':
+                    self._state = _DONE
+
+        self._flush(buffer, events)
+        return events
+
+    def _flush(self, buffer: List[str], events: List[Tuple[str, str]]):
+        if buffer and self._field:
+            text = "".join(buffer)
+            self.values[self._field] += text
+            events.append((self._field, text))
+        buffer.clear()
+
+    def _read_string_char(self, char: str):
+        """Decodifica un carácter dentro de una cadena JSON; None si aún no hay salida."""
+        if self._unicode is not None:
+            self._unicode += char
+            if len(self._unicode) < 4:
+                return None
+            code = int(self._unicode, 16)
+            self._unicode = None
+            if 0xD800 <= code <= 0xDBFF:
+                self._high_surrogate = code
+                return None
+            if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+                code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            return chr(code)
+
+        if self._escape:
+            self._escape = False
+            if char == 'u':
+                self._unicode = ""
+                return None
+            return _ESCAPES.get(char, char)
+
+        if char == '\\':
+            self._escape = True
+            return None
+        if char == '"':
+            return _END
+        return char
+
+    def _skip_other_value(self, char: str):
+        """Avanza sobre números, literales, objetos o listas sin emitir nada."""
+        if self._in_nested_string:
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_nested_string = False
+            return
+
+        if char == '"' and self._depth > 0:
+            self._in_nested_string = True
+        elif char in '{[':
+            self._depth += 1
+        elif char in '}]' and self._depth > 0:
+            self._depth -= 1
+            if self._depth == 0:
+                self._state = _AFTER_VALUE
+        elif self._depth == 0 and char in ',}':
+            self._end_other_value(char)
+
+    def _end_other_value(self, char: str):
+        self._state = _EXPECT_KEY if char == ',' else _DONE
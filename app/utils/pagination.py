@@ -0,0 +1,46 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+# Modos de cálculo del total en la paginación por cursor
+TOTAL_MODES = ("none", "exact", "estimate")
+
+
+def encode_cursor(created_at: str, id: str) -> str:
+    """Codifica la posición (created_at, id) del último registro de la página."""
+    raw = json.dumps({"created_at": created_at, "id": str(id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[Optional[datetime], Optional[UUID]]:
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Un cursor vacío o None corresponde a la primera página.
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    if not cursor:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["created_at"]), UUID(data["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def validate_limit(limit) -> int:
+    """Tamaño de página: un entero positivo (el procedimiento divide por él)."""
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+        raise ValueError(f"Invalid limit '{limit}', expected a positive integer")
+    return limit
+
+
+def validate_total_mode(total_mode: str) -> str:
+    if total_mode not in TOTAL_MODES:
+        raise ValueError(f"Invalid total mode '{total_mode}', expected one of {', '.join(TOTAL_MODES)}")
+    return total_mode
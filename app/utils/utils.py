@@ -1,3 +1,5 @@
+import json
+from typing import Any
 from app.models.schemas.message import ContentAi
 
 def content_ai_to_string(content_ai: ContentAi) -> str:
@@ -14,4 +16,34 @@ def content_ai_to_string(content_ai: ContentAi) -> str:
     if content_ai.content_executable_code:
         parts.append(f"Executable Code: {content_ai.content_executable_code}")
 
-    return "\n".join(parts) if parts else "No content available"
\ No newline at end of file
+    return "\n".join(parts) if parts else "No content available"
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """
+    Recorta un texto largo dejando constancia de cuántos caracteres se omitieron.
+    """
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n[... {len(text) - max_chars} caracteres omitidos ...]"
+
+def content_ai_to_summary(content_ai: ContentAi, max_chars: int) -> str:
+    """
+    Versión compacta de content_ai_to_string para mensajes antiguos del historial.
+    """
+    parts = []
+    if content_ai.content_analysis:
+        parts.append(f"Analysis: {truncate_text(content_ai.content_analysis, max_chars)}")
+    if content_ai.content_comment:
+        parts.append(f"Comment: {truncate_text(content_ai.content_comment, max_chars)}")
+    if content_ai.content_code:
+        parts.append(f"Code: {truncate_text(content_ai.content_code, max_chars)}")
+    if content_ai.content_executable_code:
+        parts.append("Executable Code: [omitido]")
+
+    return "\n".join(parts) if parts else "No content available"
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    Formatea un evento Server-Sent Events con datos en JSON.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,90 @@
+"""
+Compara el coste de serializar páginas de MultiMessage con la respuesta por
+defecto de FastAPI (jsonable_encoder + json.dumps) frente a FastJSONResponse
+(orjson / pydantic-core) y a model_dump_json.
+
+Uso:
+    python -m benchmarks.serialization [--sizes 10 100 1000] [--code-size 20000] [--repeat 5]
+"""
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from app.api.responses import FastJSONResponse, orjson
+from app.models.schemas.message import ContentAi, ContentUser, MessageBase, MultiMessage
+
+
+def build_page(size: int, code_size: int) -> MultiMessage:
+    """Página de mensajes alternando usuario / IA, con content_code de code_size caracteres."""
+    code = ("df = df.dropna(subset=['columna'])\n" * (code_size // 35 + 1))[:code_size]
+    data: List[MessageBase] = []
+    for i in range(size):
+        if i % 2:
+            content = ContentAi(
+                content_analysis="Análisis del conjunto de datos " * 20,
+                content_comment="Se eliminan los nulos y se normalizan las fechas.",
+                content_code=code,
+                content_executable_code=code,
+            )
+            role = "ai"
+        else:
+            content = ContentUser(content="Limpia las columnas con valores nulos")
+            role = "user"
+        data.append(MessageBase(
+            id=uuid.uuid4(),
+            created_at=datetime.now(timezone.utc),
+            role=role,
+            content=content,
+            attachments=[],
+        ))
+    return MultiMessage(total=size, limit=size, offset=0, pages=1, data=data)
+
+
+def strategies(page: MultiMessage) -> Dict[str, Callable[[], bytes]]:
+    """
+    Cada estrategia reproduce lo que hace FastAPI con el response_model: primero
+    lo convierte a tipos JSON y después lo renderiza con la clase de respuesta.
+    """
+    result = {
+        "jsonable_encoder + json.dumps": lambda: json.dumps(
+            jsonable_encoder(page), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8"),
+        "model_dump(json) + FastJSONResponse": lambda: FastJSONResponse(page.model_dump(mode="json")).body,
+        "model_dump_json": lambda: page.model_dump_json().encode("utf-8"),
+    }
+    if orjson is not None:
+        result["model_dump + orjson"] = lambda: orjson.dumps(page.model_dump())
+    return result
+
+
+def run(sizes: List[int], code_size: int, repeat: int) -> None:
+    backend = "orjson" if orjson is not None else "pydantic-core"
+    print(f"FastJSONResponse usa {backend}; content_code de {code_size} caracteres\n")
+    for size in sizes:
+        page = build_page(size, code_size)
+        number = max(1, 1000 // size)
+        print(f"MultiMessage con {size} mensajes ({number} iteraciones x {repeat} repeticiones)")
+        baseline = None
+        for name, serialize in strategies(page).items():
+            best = min(timeit.repeat(serialize, number=number, repeat=repeat)) / number
+            baseline = baseline or best
+            print(f"  {name:<38} {best * 1000:9.3f} ms  x{baseline / best:5.2f}  {len(serialize()) / 1024:9.1f} KiB")
+        print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de páginas de mensajes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--code-size", type=int, default=20_000, help="caracteres de content_code por mensaje de IA")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.code_size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+-- migrate: no-transaction
+-- Índices para las búsquedas por clave foránea. Los compuestos terminan en
+-- (createdAt DESC, id DESC) para servir también el orden de los listados y la
+-- paginación por cursor. CONCURRENTLY evita bloquear escrituras en tablas grandes.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_chatId_createdAt_id_idx
+    ON public.messages (chatId, createdAt DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_contentId_idx
+    ON public.messages (contentId);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS attachments_messageId_idx
+    ON public.attachments (messageId);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chats_userId_createdAt_id_idx
+    ON public.chats (userId, createdAt DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chats_schemeId_createdAt_id_idx
+    ON public.chats (schemeId, createdAt DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS schemes_userId_createdAt_id_idx
+    ON public.schemes (userId, createdAt DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS schemes_createdAt_id_idx
+    ON public.schemes (createdAt DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS chats_createdAt_id_idx
+    ON public.chats (createdAt DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_createdAt_id_idx
+    ON public.messages (createdAt DESC, id DESC);
@@ -0,0 +1,232 @@
+-- Adjuntos por lotes: se eligen primero los mensajes de la página y luego se
+-- traen todos sus adjuntos con una sola agregación agrupada, en lugar de una
+-- subconsulta get_all_attachment_by_message_id por cada mensaje.
+
+CREATE OR REPLACE FUNCTION public.get_attachments_by_message_ids(
+    p_message_ids uuid[]
+)
+RETURNS json AS $$
+BEGIN
+    RETURN (
+        SELECT COALESCE(json_object_agg(g.messageId, g.attachments), '{}'::json)
+        FROM (
+            SELECT
+                a.messageId,
+                json_agg(
+                    json_build_object(
+                        'id', a.id,
+                        'message_id', a.messageId,
+                        'url', a.url,
+                        'filename', a.filename,
+                        'created_at', a.createdAt
+                    )
+                    ORDER BY a.createdAt, a.id
+                ) AS attachments
+            FROM public.attachments a
+            WHERE a.messageId = ANY(p_message_ids)
+            GROUP BY a.messageId
+        ) g
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.create_attachments_for_message(
+    p_message_id uuid,
+    p_attachments json
+)
+RETURNS json AS $$
+DECLARE
+    v_result json;
+BEGIN
+    -- p_attachments: [{"url": ..., "filename": ...}, ...]
+    -- Un WITH con INSERT solo se admite como sentencia de primer nivel, no dentro de RETURN (...)
+    WITH inserted AS (
+        INSERT INTO public.attachments (messageId, url, filename)
+        SELECT p_message_id, r.url, r.filename
+        FROM json_to_recordset(p_attachments) AS r(url text, filename text)
+        RETURNING id, messageId, url, filename, createdAt
+    )
+    SELECT COALESCE(
+        json_agg(
+            json_build_object(
+                'id', i.id,
+                'message_id', i.messageId,
+                'url', i.url,
+                'filename', i.filename,
+                'created_at', i.createdAt
+            )
+        ),
+        '[]'::json
+    )
+    INTO v_result
+    FROM inserted i;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_with_content_attachment_by_chatId(
+    p_chatId uuid,
+    p_limit integer DEFAULT 100,
+    p_offset integer DEFAULT 1
+)
+RETURNS json AS $$
+DECLARE
+    v_total integer;
+BEGIN
+    -- Obtener el total de registros filtrado por chatId
+    SELECT COUNT(*) INTO v_total
+    FROM public.messages
+    WHERE chatId = p_chatId;
+
+    RETURN (
+        WITH page AS (
+            -- Primero la página de mensajes (usa el índice chatId, createdAt, id)
+            SELECT u.id, u.chatId, u.createdAt, u.role, u.contentId
+            FROM public.messages u
+            WHERE u.chatId = p_chatId
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit OFFSET p_offset
+        ),
+        page_attachments AS (
+            -- Luego todos los adjuntos de la página en una sola agregación
+            SELECT
+                a.messageId,
+                json_agg(
+                    json_build_object(
+                        'id', a.id,
+                        'url', a.url,
+                        'filename', a.filename,
+                        'created_at', a.createdAt
+                    )
+                    ORDER BY a.createdAt, a.id
+                ) AS attachments
+            FROM public.attachments a
+            WHERE a.messageId IN (SELECT id FROM page)
+            GROUP BY a.messageId
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'offset', p_offset,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', p.id,
+                            'chat_id', p.chatId,
+                            'created_at', p.createdAt,
+                            'role', p.role,
+                            'content', CASE WHEN p.role = 'user'
+                                THEN json_build_object('content', cu.content)
+                                ELSE json_build_object(
+                                    'content_analysis', ca.contentAnalysis,
+                                    'content_comment', ca.contentComment,
+                                    'content_code', ca.contentCode,
+                                    'content_executable_code', ca.contentExecutableCode
+                                )
+                            END,
+                            'attachments', pa.attachments
+                        )
+                        ORDER BY p.createdAt DESC, p.id DESC
+                    )
+                    FROM page p
+                    LEFT JOIN public.messagesContent_user cu ON p.role = 'user' AND cu.id = p.contentId
+                    LEFT JOIN public.messagesContent_ai ca ON p.role = 'ai' AND ca.id = p.contentId
+                    LEFT JOIN page_attachments pa ON pa.messageId = p.id
+                ),
+                '[]'::json
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_by_chat_id_keyset(
+    p_chatId uuid,
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    IF p_total_mode <> 'none' THEN
+        SELECT COUNT(*) INTO v_total FROM public.messages WHERE chatId = p_chatId;
+    END IF;
+
+    RETURN (
+        WITH page AS (
+            SELECT u.id, u.chatId, u.createdAt, u.role, u.contentId
+            FROM public.messages u
+            WHERE u.chatId = p_chatId
+              AND (p_cursor_created_at IS NULL
+                   OR (u.createdAt, u.id) < (p_cursor_created_at, p_cursor_id))
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS rn
+            FROM page
+        ),
+        page_attachments AS (
+            SELECT
+                a.messageId,
+                json_agg(
+                    json_build_object(
+                        'id', a.id,
+                        'url', a.url,
+                        'filename', a.filename,
+                        'created_at', a.createdAt
+                    )
+                    ORDER BY a.createdAt, a.id
+                ) AS attachments
+            FROM public.attachments a
+            WHERE a.messageId IN (SELECT id FROM numbered WHERE rn <= p_limit)
+            GROUP BY a.messageId
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', n.id,
+                            'chat_id', n.chatId,
+                            'created_at', n.createdAt,
+                            'role', n.role,
+                            'content', CASE WHEN n.role = 'user'
+                                THEN json_build_object('content', cu.content)
+                                ELSE json_build_object(
+                                    'content_analysis', ca.contentAnalysis,
+                                    'content_comment', ca.contentComment,
+                                    'content_code', ca.contentCode,
+                                    'content_executable_code', ca.contentExecutableCode
+                                )
+                            END,
+                            'attachments', pa.attachments
+                        )
+                        ORDER BY n.rn
+                    )
+                    FROM numbered n
+                    LEFT JOIN public.messagesContent_user cu ON n.role = 'user' AND cu.id = n.contentId
+                    LEFT JOIN public.messagesContent_ai ca ON n.role = 'ai' AND ca.id = n.contentId
+                    LEFT JOIN page_attachments pa ON pa.messageId = n.id
+                    WHERE n.rn <= p_limit
+                ),
+                '[]'::json
+            ),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM numbered
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM numbered WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,465 @@
+-- Contenido de mensajes en línea: las columnas de contenido pasan a vivir en
+-- public.messages para que leer o escribir un mensaje toque una sola tabla.
+--
+-- Despliegue:
+--   1. Aplicar esta migración. create_message sigue escribiendo en las tablas
+--      messagesContent_* y además copia el contenido a las columnas nuevas.
+--   2. Rellenar los mensajes existentes con
+--      'python -m app.db.backfill_message_content'.
+--   3. Activar MESSAGE_CONTENT_INLINE para que el repositorio use los
+--      procedimientos *_inline.
+-- Activar MESSAGE_CONTENT_INLINE es un cambio sin vuelta atrás: create_message_inline
+-- ya no escribe en messagesContent_*, así que los mensajes creados desde
+-- entonces no tienen contentId. Si se vuelve a desactivar, los procedimientos
+-- anteriores listan su contenido como null y get_message_by_id no los
+-- encuentra. Las tablas messagesContent_* se conservan solo con los mensajes
+-- anteriores al cambio.
+
+ALTER TABLE public.messages
+    ADD COLUMN IF NOT EXISTS content text NULL DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS contentAnalysis text NULL DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS contentComment text NULL DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS contentCode text NULL DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS contentExecutableCode text NULL DEFAULT NULL,
+    ADD COLUMN IF NOT EXISTS contentInline boolean NOT NULL DEFAULT false;
+
+CREATE OR REPLACE FUNCTION public.message_inline_content(
+    m public.messages
+)
+RETURNS json AS $$
+    SELECT CASE WHEN m.role = 'user'
+        THEN json_build_object('content', m.content)
+        ELSE json_build_object(
+            'content_analysis', m.contentAnalysis,
+            'content_comment', m.contentComment,
+            'content_code', m.contentCode,
+            'content_executable_code', m.contentExecutableCode
+        )
+    END;
+$$ LANGUAGE sql STABLE;
+
+-- Escritura doble mientras dura la transición
+CREATE OR REPLACE FUNCTION create_message(
+    p_chat_id uuid,
+    p_role text,
+    p_content text DEFAULT NULL,
+    p_content_analysis text DEFAULT NULL,
+    p_content_comment text DEFAULT NULL,
+    p_content_code text DEFAULT NULL,
+    p_content_executable_code text DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_message_id uuid;
+    v_message_createdAt timestamp with time zone;
+    v_content_id uuid;
+BEGIN
+    IF p_role = 'ai' THEN
+        INSERT INTO public.messagesContent_ai(
+            contentAnalysis,
+            contentComment,
+            contentCode,
+            contentExecutableCode
+        )
+        VALUES (
+            p_content_analysis,
+            p_content_comment,
+            p_content_code,
+            p_content_executable_code
+        )
+        RETURNING id INTO v_content_id;
+    ELSE
+        INSERT INTO public.messagesContent_user(
+            content
+        )
+        VALUES (
+            p_content
+        )
+        RETURNING id INTO v_content_id;
+    END IF;
+
+    IF v_content_id IS NULL THEN
+        RAISE EXCEPTION 'Failed to create message content';
+    END IF;
+
+    INSERT INTO public.messagesContent(id) VALUES (v_content_id);
+
+    INSERT INTO public.messages(
+        chatId,
+        role,
+        contentId,
+        content,
+        contentAnalysis,
+        contentComment,
+        contentCode,
+        contentExecutableCode,
+        contentInline
+    )
+    VALUES (
+        p_chat_id,
+        p_role,
+        v_content_id,
+        CASE WHEN p_role = 'ai' THEN NULL ELSE p_content END,
+        CASE WHEN p_role = 'ai' THEN p_content_analysis END,
+        CASE WHEN p_role = 'ai' THEN p_content_comment END,
+        CASE WHEN p_role = 'ai' THEN p_content_code END,
+        CASE WHEN p_role = 'ai' THEN p_content_executable_code END,
+        true
+    )
+    RETURNING id, createdAt INTO v_message_id, v_message_createdAt;
+
+    RETURN json_build_object('id', v_message_id, 'created_at', v_message_createdAt);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Copia el contenido de un lote de mensajes antiguos y devuelve cuántos se
+-- actualizaron; 0 indica que el relleno terminó.
+CREATE OR REPLACE FUNCTION public.backfill_messages_inline_content(
+    p_batch_size integer DEFAULT 1000
+)
+RETURNS integer AS $$
+DECLARE
+    v_count integer;
+BEGIN
+    WITH batch AS (
+        SELECT id, role, contentId
+        FROM public.messages
+        WHERE NOT contentInline
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE public.messages m
+    SET content = cu.content,
+        contentAnalysis = ca.contentAnalysis,
+        contentComment = ca.contentComment,
+        contentCode = ca.contentCode,
+        contentExecutableCode = ca.contentExecutableCode,
+        contentInline = true
+    FROM batch b
+    LEFT JOIN public.messagesContent_user cu ON b.role = 'user' AND cu.id = b.contentId
+    LEFT JOIN public.messagesContent_ai ca ON b.role = 'ai' AND ca.id = b.contentId
+    WHERE m.id = b.id;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.pending_messages_inline_content()
+RETURNS bigint AS $$
+    SELECT COUNT(*) FROM public.messages WHERE NOT contentInline;
+$$ LANGUAGE sql STABLE;
+
+-- Procedimientos del almacenamiento en línea (MESSAGE_CONTENT_INLINE)
+
+CREATE OR REPLACE FUNCTION create_message_inline(
+    p_chat_id uuid,
+    p_role text,
+    p_content text DEFAULT NULL,
+    p_content_analysis text DEFAULT NULL,
+    p_content_comment text DEFAULT NULL,
+    p_content_code text DEFAULT NULL,
+    p_content_executable_code text DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_message_id uuid;
+    v_message_createdAt timestamp with time zone;
+BEGIN
+    INSERT INTO public.messages(
+        chatId,
+        role,
+        content,
+        contentAnalysis,
+        contentComment,
+        contentCode,
+        contentExecutableCode,
+        contentInline
+    )
+    VALUES (
+        p_chat_id,
+        p_role,
+        CASE WHEN p_role = 'ai' THEN NULL ELSE p_content END,
+        CASE WHEN p_role = 'ai' THEN p_content_analysis END,
+        CASE WHEN p_role = 'ai' THEN p_content_comment END,
+        CASE WHEN p_role = 'ai' THEN p_content_code END,
+        CASE WHEN p_role = 'ai' THEN p_content_executable_code END,
+        true
+    )
+    RETURNING id, createdAt INTO v_message_id, v_message_createdAt;
+
+    RETURN json_build_object('id', v_message_id, 'created_at', v_message_createdAt);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_message_by_id_inline(
+    p_id uuid
+)
+RETURNS json AS $$
+DECLARE
+    v_result json;
+BEGIN
+    SELECT json_build_object(
+        'id', u.id,
+        'chat_id', u.chatId,
+        'created_at', u.createdAt,
+        'role', u.role,
+        'content', public.message_inline_content(u),
+        'attachments', NULL
+    )
+    INTO v_result
+    FROM public.messages u
+    WHERE u.id = p_id;
+
+    IF v_result IS NULL THEN
+        RAISE EXCEPTION 'Message with ID % not found', p_id;
+    END IF;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_with_content_inline(
+    p_limit integer DEFAULT 100,
+    p_offset integer DEFAULT 0
+)
+RETURNS json AS $$
+DECLARE
+    v_total integer;
+BEGIN
+    SELECT COUNT(*) INTO v_total FROM public.messages;
+
+    RETURN (
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'offset', p_offset,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', p.id,
+                            'chat_id', p.chatId,
+                            'created_at', p.createdAt,
+                            'role', p.role,
+                            'content', p.contentJson,
+                            'attachments', NULL
+                        )
+                        ORDER BY p.createdAt, p.id
+                    )
+                    FROM (
+                        SELECT u.id, u.chatId, u.createdAt, u.role, public.message_inline_content(u) AS contentJson
+                        FROM public.messages u
+                        ORDER BY u.createdAt, u.id
+                        LIMIT p_limit OFFSET p_offset
+                    ) p
+                ),
+                '[]'::json
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_with_content_attachment_by_chatId_inline(
+    p_chatId uuid,
+    p_limit integer DEFAULT 100,
+    p_offset integer DEFAULT 1
+)
+RETURNS json AS $$
+DECLARE
+    v_total integer;
+BEGIN
+    SELECT COUNT(*) INTO v_total
+    FROM public.messages
+    WHERE chatId = p_chatId;
+
+    RETURN (
+        WITH page AS (
+            SELECT u.id, u.chatId, u.createdAt, u.role, public.message_inline_content(u) AS contentJson
+            FROM public.messages u
+            WHERE u.chatId = p_chatId
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit OFFSET p_offset
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'offset', p_offset,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', p.id,
+                            'chat_id', p.chatId,
+                            'created_at', p.createdAt,
+                            'role', p.role,
+                            'content', p.contentJson,
+                            'attachments', a.attachments -> (p.id::text)
+                        )
+                        ORDER BY p.createdAt DESC, p.id DESC
+                    )
+                    FROM page p
+                    CROSS JOIN (
+                        SELECT public.get_attachments_by_message_ids(ARRAY(SELECT id FROM page)) AS attachments
+                    ) a
+                ),
+                '[]'::json
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_full_messages_with_content_by_chatId_inline(
+    p_chatId uuid
+)
+RETURNS json AS $$
+BEGIN
+    RETURN (
+        SELECT json_build_object(
+            'data', COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', u.id,
+                            'chat_id', u.chatId,
+                            'created_at', u.createdAt,
+                            'role', u.role,
+                            'content', public.message_inline_content(u)
+                        )
+                        ORDER BY u.createdAt, u.id
+                    )
+                    FROM public.messages u
+                    WHERE u.chatId = p_chatId
+                ),
+                '[]'::json
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_keyset_inline(
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    v_total := public.pagination_total('public.messages', p_total_mode);
+
+    RETURN (
+        WITH page AS (
+            SELECT u.*, row_number() OVER (ORDER BY u.createdAt DESC, u.id DESC) AS rn
+            FROM (
+                SELECT m.id, m.chatId, m.createdAt, m.role, public.message_inline_content(m) AS contentJson
+                FROM public.messages m
+                WHERE p_cursor_created_at IS NULL
+                   OR (m.createdAt, m.id) < (p_cursor_created_at, p_cursor_id)
+                ORDER BY m.createdAt DESC, m.id DESC
+                LIMIT p_limit + 1
+            ) u
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', p.id,
+                            'chat_id', p.chatId,
+                            'created_at', p.createdAt,
+                            'role', p.role,
+                            'content', p.contentJson,
+                            'attachments', NULL
+                        )
+                        ORDER BY p.rn
+                    )
+                    FROM page p
+                    WHERE p.rn <= p_limit
+                ),
+                '[]'::json
+            ),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM page
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM page WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_by_chat_id_keyset_inline(
+    p_chatId uuid,
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    IF p_total_mode <> 'none' THEN
+        SELECT COUNT(*) INTO v_total FROM public.messages WHERE chatId = p_chatId;
+    END IF;
+
+    RETURN (
+        WITH page AS (
+            SELECT u.*, row_number() OVER (ORDER BY u.createdAt DESC, u.id DESC) AS rn
+            FROM (
+                SELECT m.id, m.chatId, m.createdAt, m.role, public.message_inline_content(m) AS contentJson
+                FROM public.messages m
+                WHERE m.chatId = p_chatId
+                  AND (p_cursor_created_at IS NULL
+                       OR (m.createdAt, m.id) < (p_cursor_created_at, p_cursor_id))
+                ORDER BY m.createdAt DESC, m.id DESC
+                LIMIT p_limit + 1
+            ) u
+        ),
+        page_attachments AS (
+            SELECT public.get_attachments_by_message_ids(
+                ARRAY(SELECT id FROM page WHERE rn <= p_limit)
+            ) AS attachments
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE(
+                (
+                    SELECT json_agg(
+                        json_build_object(
+                            'id', p.id,
+                            'chat_id', p.chatId,
+                            'created_at', p.createdAt,
+                            'role', p.role,
+                            'content', p.contentJson,
+                            'attachments', pa.attachments -> (p.id::text)
+                        )
+                        ORDER BY p.rn
+                    )
+                    FROM page p
+                    CROSS JOIN page_attachments pa
+                    WHERE p.rn <= p_limit
+                ),
+                '[]'::json
+            ),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM page
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM page WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,151 @@
+-- Inserciones por lotes: cada procedimiento create_*s_many recibe un arreglo
+-- JSON de filas (con las claves de ordered_params) y las inserta con un solo
+-- INSERT de varias filas. Devuelve [{id, created_at}, ...] en el mismo orden
+-- que la entrada.
+--
+-- Los WITH con INSERT van como sentencia de primer nivel (SELECT ... INTO): dentro
+-- de RETURN (...) PostgreSQL los rechaza.
+--
+-- create_message_with_attachments guarda un mensaje y todos sus adjuntos en
+-- una sola llamada (y por lo tanto en una sola transacción).
+
+CREATE OR REPLACE FUNCTION public.create_attachments_many(
+    p_rows json
+)
+RETURNS json AS $$
+DECLARE
+    v_result json;
+BEGIN
+    WITH input AS (
+        SELECT extensions.uuid_generate_v4() AS id, e.ord, r.*
+        FROM json_array_elements(p_rows) WITH ORDINALITY AS e(value, ord)
+        CROSS JOIN LATERAL json_to_record(e.value) AS r(message_id uuid, url text, filename text)
+    ),
+    inserted AS (
+        INSERT INTO public.attachments (id, messageId, url, filename)
+        SELECT id, message_id, url, filename FROM input
+        RETURNING id, createdAt
+    )
+    SELECT COALESCE(
+        json_agg(json_build_object('id', i.id, 'created_at', i.createdAt) ORDER BY n.ord),
+        '[]'::json
+    )
+    INTO v_result
+    FROM inserted i
+    JOIN input n ON n.id = i.id;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.create_chats_many(
+    p_rows json
+)
+RETURNS json AS $$
+DECLARE
+    v_result json;
+BEGIN
+    WITH input AS (
+        SELECT extensions.uuid_generate_v4() AS id, e.ord, r.*
+        FROM json_array_elements(p_rows) WITH ORDINALITY AS e(value, ord)
+        CROSS JOIN LATERAL json_to_record(e.value) AS r(user_id uuid, scheme_id uuid, name_chat text)
+    ),
+    inserted AS (
+        INSERT INTO public.chats (id, userId, schemeId, nameChat)
+        SELECT id, user_id, scheme_id, name_chat FROM input
+        RETURNING id, createdAt
+    )
+    SELECT COALESCE(
+        json_agg(json_build_object('id', i.id, 'created_at', i.createdAt) ORDER BY n.ord),
+        '[]'::json
+    )
+    INTO v_result
+    FROM inserted i
+    JOIN input n ON n.id = i.id;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.create_schemes_many(
+    p_rows json
+)
+RETURNS json AS $$
+DECLARE
+    v_result json;
+BEGIN
+    WITH input AS (
+        SELECT extensions.uuid_generate_v4() AS id, e.ord, r.*
+        FROM json_array_elements(p_rows) WITH ORDINALITY AS e(value, ord)
+        CROSS JOIN LATERAL json_to_record(e.value) AS r(title text, content text, user_id uuid, attachment_url text)
+    ),
+    inserted AS (
+        INSERT INTO public.schemes (id, title, content, userId, attachmentUrl)
+        SELECT id, title, content, user_id, attachment_url FROM input
+        RETURNING id, createdAt
+    )
+    SELECT COALESCE(
+        json_agg(json_build_object('id', i.id, 'created_at', i.createdAt) ORDER BY n.ord),
+        '[]'::json
+    )
+    INTO v_result
+    FROM inserted i
+    JOIN input n ON n.id = i.id;
+
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.create_message_with_attachments(
+    p_chat_id uuid,
+    p_role text,
+    p_content text DEFAULT NULL,
+    p_content_analysis text DEFAULT NULL,
+    p_content_comment text DEFAULT NULL,
+    p_content_code text DEFAULT NULL,
+    p_content_executable_code text DEFAULT NULL,
+    p_attachments json DEFAULT '[]'::json
+)
+RETURNS json AS $$
+DECLARE
+    v_message json;
+BEGIN
+    v_message := create_message(
+        p_chat_id, p_role, p_content,
+        p_content_analysis, p_content_comment, p_content_code, p_content_executable_code
+    );
+
+    RETURN json_build_object(
+        'id', v_message->'id',
+        'created_at', v_message->'created_at',
+        'attachments', public.create_attachments_for_message((v_message->>'id')::uuid, p_attachments)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.create_message_with_attachments_inline(
+    p_chat_id uuid,
+    p_role text,
+    p_content text DEFAULT NULL,
+    p_content_analysis text DEFAULT NULL,
+    p_content_comment text DEFAULT NULL,
+    p_content_code text DEFAULT NULL,
+    p_content_executable_code text DEFAULT NULL,
+    p_attachments json DEFAULT '[]'::json
+)
+RETURNS json AS $$
+DECLARE
+    v_message json;
+BEGIN
+    v_message := create_message_inline(
+        p_chat_id, p_role, p_content,
+        p_content_analysis, p_content_comment, p_content_code, p_content_executable_code
+    );
+
+    RETURN json_build_object(
+        'id', v_message->'id',
+        'created_at', v_message->'created_at',
+        'attachments', public.create_attachments_for_message((v_message->>'id')::uuid, p_attachments)
+    );
+END;
+$$ LANGUAGE plpgsql;
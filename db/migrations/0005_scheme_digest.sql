@@ -0,0 +1,36 @@
+-- Resumen estructurado de cada esquema (tablas, columnas, claves y
+-- relaciones), calculado por la API al crear o actualizar el esquema y usado
+-- en el prompt en lugar del DDL. Incluye el hash del contenido del que se
+-- obtuvo (source_hash) para detectar resúmenes desactualizados.
+
+ALTER TABLE public.schemes ADD COLUMN IF NOT EXISTS digest jsonb NULL DEFAULT NULL;
+
+CREATE OR REPLACE FUNCTION public.set_scheme_digest(
+    p_id uuid,
+    p_digest json DEFAULT NULL
+)
+RETURNS json AS $$
+DECLARE
+    updated_id uuid;
+BEGIN
+    UPDATE public.schemes
+    SET digest = p_digest::jsonb
+    WHERE id = p_id
+    RETURNING id INTO updated_id;
+
+    IF updated_id IS NULL THEN
+        RAISE EXCEPTION 'Scheme with ID % not found', p_id;
+    END IF;
+
+    RETURN json_build_object('id', updated_id);
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_scheme_digest(
+    p_id uuid
+)
+RETURNS json AS $$
+BEGIN
+    RETURN (SELECT s.digest::json FROM public.schemes s WHERE s.id = p_id);
+END;
+$$ LANGUAGE plpgsql;
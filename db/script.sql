@@ -1165,4 +1165,360 @@ BEGIN
         )
     );
 END;
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+$$ LANGUAGE plpgsql;
+
+-- Paginación por cursor (keyset) sobre (createdAt, id), del más reciente al más antiguo.
+-- p_total_mode: 'none' no calcula el total, 'exact' usa COUNT(*) y 'estimate'
+-- usa la estimación del planificador (solo en los listados sin filtro).
+
+CREATE INDEX IF NOT EXISTS schemes_createdAt_id_idx ON public.schemes (createdAt DESC, id DESC);
+CREATE INDEX IF NOT EXISTS chats_createdAt_id_idx ON public.chats (createdAt DESC, id DESC);
+CREATE INDEX IF NOT EXISTS messages_createdAt_id_idx ON public.messages (createdAt DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION public.pagination_total(
+    p_table regclass,
+    p_total_mode text
+)
+RETURNS bigint AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    IF p_total_mode = 'exact' THEN
+        EXECUTE format('SELECT COUNT(*) FROM %s', p_table) INTO v_total;
+    ELSIF p_total_mode = 'estimate' THEN
+        SELECT GREATEST(reltuples, 0)::bigint INTO v_total FROM pg_class WHERE oid = p_table;
+    END IF;
+
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_schemes_keyset(
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    v_total := public.pagination_total('public.schemes', p_total_mode);
+
+    RETURN (
+        WITH page AS (
+            SELECT
+                u.id,
+                u.createdAt,
+                json_build_object(
+                    'id', u.id,
+                    'title', u.title,
+                    'content', u.content,
+                    'attachment_url', u.attachmentUrl,
+                    'created_at', u.createdAt
+                ) AS item
+            FROM public.schemes u
+            WHERE p_cursor_created_at IS NULL
+               OR (u.createdAt, u.id) < (p_cursor_created_at, p_cursor_id)
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS rn
+            FROM page
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE((SELECT json_agg(item ORDER BY rn) FROM numbered WHERE rn <= p_limit), '[]'::json),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM numbered
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM numbered WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_schemes_by_user_id_keyset(
+    p_user_id uuid,
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    IF p_total_mode <> 'none' THEN
+        SELECT COUNT(*) INTO v_total FROM public.schemes WHERE userId = p_user_id;
+    END IF;
+
+    RETURN (
+        WITH page AS (
+            SELECT
+                u.id,
+                u.createdAt,
+                json_build_object(
+                    'id', u.id,
+                    'title', u.title,
+                    'content', u.content,
+                    'attachment_url', u.attachmentUrl,
+                    'created_at', u.createdAt
+                ) AS item
+            FROM public.schemes u
+            WHERE u.userId = p_user_id
+              AND (p_cursor_created_at IS NULL
+                   OR (u.createdAt, u.id) < (p_cursor_created_at, p_cursor_id))
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS rn
+            FROM page
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE((SELECT json_agg(item ORDER BY rn) FROM numbered WHERE rn <= p_limit), '[]'::json),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM numbered
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM numbered WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_chats_keyset(
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    v_total := public.pagination_total('public.chats', p_total_mode);
+
+    RETURN (
+        WITH page AS (
+            SELECT
+                u.id,
+                u.createdAt,
+                json_build_object(
+                    'id', u.id,
+                    'user_id', u.userId,
+                    'scheme_id', u.schemeId,
+                    'name_chat', u.nameChat,
+                    'created_at', u.createdAt
+                ) AS item
+            FROM public.chats u
+            WHERE p_cursor_created_at IS NULL
+               OR (u.createdAt, u.id) < (p_cursor_created_at, p_cursor_id)
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS rn
+            FROM page
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE((SELECT json_agg(item ORDER BY rn) FROM numbered WHERE rn <= p_limit), '[]'::json),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM numbered
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM numbered WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_chats_by_user_id_keyset(
+    p_user_id uuid,
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    IF p_total_mode <> 'none' THEN
+        SELECT COUNT(*) INTO v_total FROM public.chats WHERE userId = p_user_id;
+    END IF;
+
+    RETURN (
+        WITH page AS (
+            SELECT
+                u.id,
+                u.createdAt,
+                json_build_object(
+                    'id', u.id,
+                    'user_id', u.userId,
+                    'scheme_id', u.schemeId,
+                    'name_chat', u.nameChat,
+                    'created_at', u.createdAt
+                ) AS item
+            FROM public.chats u
+            WHERE u.userId = p_user_id
+              AND (p_cursor_created_at IS NULL
+                   OR (u.createdAt, u.id) < (p_cursor_created_at, p_cursor_id))
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS rn
+            FROM page
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE((SELECT json_agg(item ORDER BY rn) FROM numbered WHERE rn <= p_limit), '[]'::json),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM numbered
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM numbered WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_keyset(
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    v_total := public.pagination_total('public.messages', p_total_mode);
+
+    RETURN (
+        WITH page AS (
+            SELECT
+                u.id,
+                u.createdAt,
+                json_build_object(
+                    'id', u.id,
+                    'chat_id', u.chatId,
+                    'created_at', u.createdAt,
+                    'role', u.role,
+                    'content', CASE WHEN u.role = 'user'
+                        THEN json_build_object('content', cu.content)
+                        ELSE json_build_object(
+                            'content_analysis', ca.contentAnalysis,
+                            'content_comment', ca.contentComment,
+                            'content_code', ca.contentCode,
+                            'content_executable_code', ca.contentExecutableCode
+                        )
+                    END,
+                    'attachments', NULL
+                ) AS item
+            FROM public.messages u
+            LEFT JOIN public.messagesContent_user cu ON u.role = 'user' AND cu.id = u.contentId
+            LEFT JOIN public.messagesContent_ai ca ON u.role = 'ai' AND ca.id = u.contentId
+            WHERE p_cursor_created_at IS NULL
+               OR (u.createdAt, u.id) < (p_cursor_created_at, p_cursor_id)
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS rn
+            FROM page
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE((SELECT json_agg(item ORDER BY rn) FROM numbered WHERE rn <= p_limit), '[]'::json),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM numbered
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM numbered WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.get_all_messages_by_chat_id_keyset(
+    p_chatId uuid,
+    p_limit integer DEFAULT 100,
+    p_cursor_created_at timestamp with time zone DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_total_mode text DEFAULT 'none'
+)
+RETURNS json AS $$
+DECLARE
+    v_total bigint;
+BEGIN
+    IF p_total_mode <> 'none' THEN
+        SELECT COUNT(*) INTO v_total FROM public.messages WHERE chatId = p_chatId;
+    END IF;
+
+    RETURN (
+        WITH page AS (
+            SELECT
+                u.id,
+                u.createdAt,
+                json_build_object(
+                    'id', u.id,
+                    'chat_id', u.chatId,
+                    'created_at', u.createdAt,
+                    'role', u.role,
+                    'content', CASE WHEN u.role = 'user'
+                        THEN json_build_object('content', cu.content)
+                        ELSE json_build_object(
+                            'content_analysis', ca.contentAnalysis,
+                            'content_comment', ca.contentComment,
+                            'content_code', ca.contentCode,
+                            'content_executable_code', ca.contentExecutableCode
+                        )
+                    END,
+                    'attachments', (
+                        SELECT get_all_attachment_by_message_id(u.id)
+                    )
+                ) AS item
+            FROM public.messages u
+            LEFT JOIN public.messagesContent_user cu ON u.role = 'user' AND cu.id = u.contentId
+            LEFT JOIN public.messagesContent_ai ca ON u.role = 'ai' AND ca.id = u.contentId
+            WHERE u.chatId = p_chatId
+              AND (p_cursor_created_at IS NULL
+                   OR (u.createdAt, u.id) < (p_cursor_created_at, p_cursor_id))
+            ORDER BY u.createdAt DESC, u.id DESC
+            LIMIT p_limit + 1
+        ),
+        numbered AS (
+            SELECT page.*, row_number() OVER (ORDER BY createdAt DESC, id DESC) AS rn
+            FROM page
+        )
+        SELECT json_build_object(
+            'total', v_total,
+            'limit', p_limit,
+            'pages', CEILING(v_total::numeric / p_limit),
+            'data', COALESCE((SELECT json_agg(item ORDER BY rn) FROM numbered WHERE rn <= p_limit), '[]'::json),
+            'next', (
+                SELECT json_build_object('created_at', createdAt, 'id', id)
+                FROM numbered
+                WHERE rn = p_limit AND EXISTS (SELECT 1 FROM numbered WHERE rn > p_limit)
+            )
+        )
+    );
+END;
+$$ LANGUAGE plpgsql;